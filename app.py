@@ -1,38 +1,70 @@
 # app.py
 import gradio as gr
 import pandas as pd
-import tempfile
 import os
 import logging
+import time
 from typing import Tuple, Any
 
 # Import project modules
-from wiki_fetcher import fetch_movie_plot
-from emotion_utils import chunk_text_spacy, classify_emotions, generate_insights
-from visuals import create_emotion_distribution_graph
-from report_generator import generate_pdf_report
+from wiki_fetcher import fetch_movie_plot, resolved_title, set_fetch_backend
+from emotion_utils import chunk_text, chunk_text_spacy, classify_emotions, classify_emotions_stream, generate_insights, warm_up, get_batcher, set_inference_runner
+from inference_scheduler import InferenceScheduler
+from worker_pool import DEFAULT_WORKERS, PoolBusyError, create_emotion_pool
+from catalog_index import open_catalog
+from recommender import load_arc_index
+from emotion_scores import concat_frames, get_emotion_scores
+import metrics
+from artifacts import (ARTIFACT_SWEEP_INTERVAL, ARTIFACT_TTL, AnalysisResult, ArtifactStore, chart_artifact, csv_artifact,
+                       report_artifact)
 
 logging.basicConfig(level=logging.INFO)
 
-# Ensure temporary file directory exists if needed (usually handled by tempfile)
-TEMP_DIR = "temp_outputs"
-os.makedirs(TEMP_DIR, exist_ok=True)
-
-# Global variable to store temporary file paths for cleanup if necessary
-# Gradio's File component handles temp files well, but manual cleanup might be a backup
-temp_files = []
-
-def cleanup_temp_files():
-    """Removes temporary files created during analysis."""
-    global temp_files
-    for file_path in temp_files:
-        if file_path and os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-                logging.info(f"Cleaned up temp file: {file_path}")
-            except OSError as e:
-                logging.error(f"Error removing temp file {file_path}: {e}")
-    temp_files = []
+# Serve inference from forked worker processes sharing the model weights loaded here.
+# Created first, before any other thread (async fetch loop, scheduler, sweeper, metrics
+# server) or forward pass in this process, so the fork of its fork server is clean.
+inference_pool = None
+if DEFAULT_WORKERS > 0:
+    inference_pool = create_emotion_pool(DEFAULT_WORKERS)
+    if inference_pool is not None:
+        set_inference_runner(inference_pool)
+
+# Use the pooled, rate-limited asyncio client so concurrent users share connections and in-flight fetches
+if os.environ.get("CINEMOOD_WIKI_CLIENT") == "async":
+    from async_wiki import AsyncWikiBackend
+    set_fetch_backend(AsyncWikiBackend())
+
+# Otherwise micro-batch sentences from all concurrent requests through one model instance
+inference_scheduler = None
+if inference_pool is None and os.environ.get("CINEMOOD_SCHEDULER", "1") == "1":
+    inference_scheduler = InferenceScheduler(lambda sentences: get_batcher()(sentences))
+    set_inference_runner(inference_scheduler)
+
+# Precomputed analyses of well-known films (built with `python catalog_index.py build`), memory-mapped
+catalog = open_catalog()
+
+# Arc signatures of every known film for recommendations; live analyses of titles are added as they finish
+arc_index = load_arc_index(catalog=catalog)
+RECOMMENDATION_COUNT = 10
+
+# Rows of the table shown while classification streams in (the latest ones); the full table follows at the end
+STREAM_PREVIEW_ROWS = int(os.environ.get("CINEMOOD_STREAM_PREVIEW_ROWS", "200"))
+
+# Downloads are built on request, shared between identical analyses and kept per session
+# within a TTL and disk quota; the sweeper expires them in the background
+artifact_store = ArtifactStore()
+artifact_store.start_sweeper()
+
+def running_distribution_text(counts: pd.Series, total_scenes: int, time_to_first_row: float | None) -> str:
+    """Status line shown while classification streams in: progress plus the emotion distribution so far."""
+    classified = int(counts.sum())
+    shares = counts[counts > 0].sort_values(ascending=False) / max(1, classified)
+    distribution = ", ".join(f"{emotion} {share:.0%}" for emotion, share in shares.items())
+    status = f"Analyzing emotions... {classified}/{total_scenes} scenes classified.\n\n"
+    status += f"Running distribution: {distribution}"
+    if time_to_first_row is not None:
+        status += f"\n\n(First results after {time_to_first_row:.2f}s)"
+    return status
 
 
 def process_analysis(movie_title: str | None, custom_plot: str | None) -> Tuple[Any, ...]:
@@ -40,18 +72,39 @@ def process_analysis(movie_title: str | None, custom_plot: str | None) -> Tuple[
     Core function to perform the full movie emotion analysis.
     Takes either a movie title or a custom plot, analyzes it,
     and returns results formatted for Gradio outputs.
-    """
-    global temp_files
-    cleanup_temp_files() # Clean up files from previous run
 
+    Only fetching, inference and insights happen here. The finished analysis
+    is returned as the session's AnalysisResult; the graph and the CSV/PNG/PDF
+    downloads are built from it afterwards, on demand.
+    """
     plot_text = None
     display_title = "Custom Plot" # Default title for display
+    trace = metrics.Trace("analysis")
 
     if custom_plot and custom_plot.strip():
         logging.info("Processing custom plot text.")
         plot_text = custom_plot.strip()
     elif movie_title and movie_title.strip():
         display_title = movie_title.strip()
+        if catalog is not None:
+            with trace.span("catalog_lookup", title=display_title) as stage:
+                entry = catalog.get(display_title)
+                stage.set(hit=entry is not None)
+            if entry is not None:
+                # Precomputed: no Wikipedia request and no inference
+                logging.info(f"Serving '{display_title}' from the catalog index.")
+                _finish_trace(trace, "catalog", title=entry.title, sentences=len(entry.analysis_df))
+                yield (
+                    gr.update(value=entry.plot_text),
+                    gr.update(value=entry.analysis_df),
+                    gr.update(value=entry.insights),
+                    gr.update(value=None), # emotion_graph, rendered by show_graph
+                    gr.update(value=None, visible=False),
+                    gr.update(value=None, visible=False),
+                    gr.update(value=None, visible=False),
+                    AnalysisResult(entry.title, entry.plot_text, entry.analysis_df, entry.insights, entry.digest)
+                )
+                return
         logging.info(f"Fetching plot for title: {display_title}")
         # Display status to user
         yield ( # Yield intermediate status updates
@@ -62,106 +115,199 @@ def process_analysis(movie_title: str | None, custom_plot: str | None) -> Tuple[
             gr.update(value=None, visible=False), # download_csv
             gr.update(value=None, visible=False), # download_png
             gr.update(value=None, visible=False), # download_pdf
+            None, # analysis_state
         )
-        plot_text = fetch_movie_plot(display_title)
+        with trace.span("fetch", title=display_title) as stage:
+            plot_text = fetch_movie_plot(display_title)
+            stage.set(chars=len(plot_text or ""))
         if not plot_text:
             logging.warning(f"Could not fetch plot for {display_title}.")
+            _finish_trace(trace, "not_found")
             yield (
                 gr.update(value=f"Could not find plot for '{display_title}' on Wikipedia. Please try a different title or paste the plot manually.", interactive=False),
-                None, "Plot not found.", None, None, None, None
+                None, "Plot not found.", None, None, None, None, None
             )
             return
         logging.info(f"Plot fetched successfully for {display_title}.")
     else:
         logging.warning("No movie title or custom plot provided.")
+        _finish_trace(trace, "no_input")
         yield (
             gr.update(value="Please enter a movie title or paste a plot.", interactive=False),
-            None, "No input provided.", None, None, None, None
+            None, "No input provided.", None, None, None, None, None
         )
         return
 
     # --- Start Analysis ---
     yield ( # Update status
         gr.update(value=plot_text[:1000] + "..." if len(plot_text) > 1000 else plot_text, interactive=False), # Show fetched plot
-        None, "Analyzing emotions...", None, None, None, None
+        None, "Analyzing emotions...", None,
+        gr.update(value=None, visible=False), gr.update(value=None, visible=False), gr.update(value=None, visible=False),
+        None
     )
 
     # 1. Chunk the text
     # chunks = chunk_text_nltk(plot_text) # Use NLTK
-    chunks = chunk_text_spacy(plot_text) # Use SpaCy
+    with trace.span("chunk") as stage:
+        chunks = chunk_text(plot_text) # SpaCy sentences, or token-sized scenes with CINEMOOD_CHUNKING=scene
+        stage.set(chunks=len(chunks))
     if not chunks:
         logging.error("Text chunking resulted in empty list.")
+        _finish_trace(trace, "no_chunks")
         yield (
              gr.update(value=plot_text, interactive=False),
-             None, "Error: Could not break the plot into analysable chunks.", None, None, None, None
+             None, "Error: Could not break the plot into analysable chunks.", None, None, None, None, None
         )
         return
 
-    # 2. Classify Emotions
-    analysis_df = classify_emotions(chunks)
+    # 2. Classify Emotions, streaming each finished slice to the table
+    # Artifacts (graph, CSV, PDF) are never built here; see the prepare_* handlers
+    classify_started = time.perf_counter()
+    time_to_first_row = None
+    # Slices are only collected while streaming; each update shows the latest rows and running
+    # counts, so the work per slice stays constant and the full table is built once at the end
+    partial_frames = []
+    preview_frames = []
+    emotion_counts = pd.Series(dtype="int64")
+    try:
+        for slice_df in classify_emotions_stream(chunks):
+            if time_to_first_row is None:
+                time_to_first_row = time.perf_counter() - classify_started
+                logging.info(f"Time to first classified row: {time_to_first_row:.3f}s")
+            partial_frames.append(slice_df)
+            emotion_counts = emotion_counts.add(slice_df['Emotion'].value_counts(), fill_value=0)
+            preview_frames.append(slice_df)
+            while len(preview_frames) > 1 and sum(map(len, preview_frames[1:])) >= STREAM_PREVIEW_ROWS:
+                preview_frames.pop(0)
+            yield (
+                gr.update(), # Keep the plot text as is
+                gr.update(value=pd.concat(preview_frames, ignore_index=True).tail(STREAM_PREVIEW_ROWS)),
+                gr.update(value=running_distribution_text(emotion_counts, len(chunks), time_to_first_row)),
+                None, None, None, None, None
+            )
+    except PoolBusyError as e:
+        # Backpressure from the inference workers: fail fast instead of queueing without bound
+        logging.warning(f"Analysis rejected: {e}")
+        _finish_trace(trace, "busy")
+        yield (
+            gr.update(value=plot_text, interactive=False),
+            None, "The server is busy analysing other plots. Please try again in a moment.", None, None, None, None, None
+        )
+        return
+    except Exception:
+        # Already logged; the rows streamed so far are incomplete, so they are neither indexed nor saved
+        partial_frames = []
+    analysis_df = concat_frames(partial_frames)
+    classify_seconds = time.perf_counter() - classify_started
+    logging.info(f"Classified {len(analysis_df)} scenes in {classify_seconds:.3f}s.")
+    # Wall time including UI updates between slices; the inference-only time is in cinemood_span_seconds{span="classify"}
+    trace.record("classify", classify_started, classify_seconds, sentences=len(analysis_df),
+                 first_row_s=round(time_to_first_row, 4) if time_to_first_row is not None else None)
     if analysis_df.empty:
          logging.error("Emotion classification failed or returned empty results.")
+         _finish_trace(trace, "classify_failed")
          yield (
              gr.update(value=plot_text, interactive=False),
-             None, "Error: Failed to classify emotions for the provided plot.", None, None, None, None
+             None, "Error: Failed to classify emotions for the provided plot.", None, None, None, None, None
          )
          return
 
     # 3. Generate Insights
-    insights = generate_insights(analysis_df)
-
-    # 4. Create Visualization
-    plot_buffer = create_emotion_distribution_graph(analysis_df)
-
-    # --- Prepare Outputs for Gradio ---
-    graph_path_or_obj = None
-    png_path = None
-    if plot_buffer:
-        try:
-            # Save buffer to a temporary PNG file for display and download
-            with tempfile.NamedTemporaryFile(dir=TEMP_DIR, delete=False, suffix=".png") as temp_png:
-                temp_png.write(plot_buffer.getvalue())
-                png_path = temp_png.name
-                graph_path_or_obj = png_path # Use the file path for gr.Image
-                temp_files.append(png_path) # Track for cleanup
-                logging.info(f"Graph saved to temporary file: {png_path}")
-        except Exception as e:
-            logging.error(f"Error saving graph to temporary file: {e}")
-            graph_path_or_obj = None # Fallback if saving fails
-
-    # 5. Generate Files for Download
-    csv_path = None
-    pdf_path = None
-    try:
-        # Save CSV
-        with tempfile.NamedTemporaryFile(dir=TEMP_DIR, delete=False, suffix=".csv") as temp_csv:
-            analysis_df.to_csv(temp_csv.name, index=False)
-            csv_path = temp_csv.name
-            temp_files.append(csv_path)
-            logging.info(f"CSV analysis saved to temporary file: {csv_path}")
-
-        # Save PDF (using the buffer from graph generation)
-        pdf_path = generate_pdf_report(display_title, plot_text, analysis_df, insights, plot_buffer)
-        if pdf_path:
-            temp_files.append(pdf_path) # Track for cleanup
-            logging.info(f"PDF report saved to temporary file: {pdf_path}")
-
-    except Exception as e:
-        logging.error(f"Error generating download files: {e}")
-        # Don't crash, just might not have download links
-
-    # Final yield with all results
+    with trace.span("insights"):
+        insights = generate_insights(analysis_df)
+    _finish_trace(trace, "ok", title=display_title, sentences=len(analysis_df))
+    if movie_title and movie_title.strip():
+        # Keyed by the resolved page title, so misspellings of one film replace a single entry
+        arc_index.add(resolved_title(display_title), get_emotion_scores(analysis_df))
+
+    # Final yield: the graph and downloads follow from the session state
     yield (
         gr.update(value=plot_text),
         gr.update(value=analysis_df),
         gr.update(value=insights),
-        gr.update(value=graph_path_or_obj), # Display the graph via file path
-        gr.update(value=csv_path, visible=csv_path is not None), # Show download button if file exists
-        gr.update(value=png_path, visible=png_path is not None), # Use the same graph path for PNG download
-        gr.update(value=pdf_path, visible=pdf_path is not None)  # Show download button if file exists
+        gr.update(value=None), # emotion_graph, rendered by show_graph
+        gr.update(value=None, visible=False),
+        gr.update(value=None, visible=False),
+        gr.update(value=None, visible=False),
+        AnalysisResult.create(display_title, plot_text, analysis_df, insights)
     )
 
 
+def _finish_trace(trace: metrics.Trace, status: str, **attrs) -> None:
+    metrics.ANALYSES.inc(1, status)
+    path = trace.finish(status=status, **attrs)
+    if path:
+        logging.info(f"Analysis trace written to {path}")
+
+
+def show_graph(result: AnalysisResult | None, request: gr.Request) -> Any:
+    """Renders (or reuses) the distribution chart once an analysis has finished."""
+    if result is None:
+        return gr.update(value=None)
+    return gr.update(value=chart_artifact(artifact_store, result, request.session_hash))
+
+
+def _prepare_download(result: AnalysisResult | None, request: gr.Request, build) -> Any:
+    """Builds one download for the session's analysis and reveals its file component."""
+    if result is None:
+        gr.Warning("Run an analysis first.")
+        return gr.update(value=None, visible=False)
+    try:
+        path = build(artifact_store, result, request.session_hash)
+    except Exception as e:
+        logging.error(f"Error generating download file: {e}")
+        path = None
+    return gr.update(value=path, visible=path is not None)
+
+
+def prepare_csv(result: AnalysisResult | None, request: gr.Request) -> Any:
+    return _prepare_download(result, request, csv_artifact)
+
+
+def prepare_png(result: AnalysisResult | None, request: gr.Request) -> Any:
+    return _prepare_download(result, request, chart_artifact)
+
+
+def prepare_pdf(result: AnalysisResult | None, request: gr.Request) -> Any:
+    return _prepare_download(result, request, report_artifact)
+
+
+def _recommendation_table(matches: list[tuple[str, float]]) -> pd.DataFrame:
+    return pd.DataFrame({"Film": [title for title, _ in matches],
+                         "Arc distance": [round(distance, 4) for _, distance in matches]})
+
+
+def recommend_by_mood(mood_text: str | None) -> Any:
+    """Films whose emotional arc is closest to the user's own words, run through the same classifier."""
+    if not mood_text or not mood_text.strip():
+        gr.Warning("Tell us how you feel first.")
+        return None
+    if not len(arc_index):
+        gr.Warning("No films have been analysed yet; analyse a few titles first.")
+        return None
+    analysis_df = classify_emotions(chunk_text_spacy(mood_text.strip()))
+    if analysis_df.empty:
+        gr.Warning("Could not read the emotions in that text.")
+        return None
+    return _recommendation_table(arc_index.search(get_emotion_scores(analysis_df), RECOMMENDATION_COUNT))
+
+
+def recommend_similar(result: AnalysisResult | None) -> Any:
+    """Films whose emotional arc is closest to the analysed one."""
+    if result is None:
+        gr.Warning("Run an analysis first.")
+        return None
+    matches = arc_index.search(get_emotion_scores(result.analysis_df), RECOMMENDATION_COUNT, exclude=resolved_title(result.title))
+    return _recommendation_table(matches)
+
+
+def release_session(request: gr.Request) -> None:
+    """Called when a browser session closes: its downloads no longer need to be kept."""
+    artifact_store.release_session(request.session_hash)
+    usage = artifact_store.disk_usage()
+    logging.info(f"Session closed; artifact store holds {usage['files']} files, {usage['bytes']} / {usage['max_bytes']} bytes.")
+
+
 # --- Gradio Interface ---
 css = """
 body { font-family: sans-serif; }
@@ -170,7 +316,9 @@ body { font-family: sans-serif; }
 footer {display: none !important;}
 """
 
-with gr.Blocks(css=css, title="Cinemood: Movie Emotion Analyzer") as app:
+# Gradio keeps its own copy of every served chart/CSV/PDF; expire those like the artifact store's files
+with gr.Blocks(css=css, title="Cinemood: Movie Emotion Analyzer",
+               delete_cache=(int(ARTIFACT_SWEEP_INTERVAL), int(ARTIFACT_TTL))) as app:
     gr.Markdown("# 🎬 Cinemood: Movie Emotion Analyzer")
     gr.Markdown("Analyze the emotional arc of a movie plot fetched from Wikipedia or your own custom text.")
 
@@ -183,9 +331,18 @@ with gr.Blocks(css=css, title="Cinemood: Movie Emotion Analyzer") as app:
                 with gr.TabItem("Analyze Custom Plot"):
                     custom_plot_input = gr.Textbox(label="Paste Movie Plot Here", lines=10, placeholder="Paste the movie plot summary text here...")
                     analyze_button_custom = gr.Button("Analyze Custom Plot", variant="primary")
+                with gr.TabItem("Recommend by Mood"):
+                    mood_input = gr.Textbox(label="How are you feeling?", lines=4, placeholder="e.g., Tired after a long week, I want something that starts dark and ends hopeful.")
+                    recommend_mood_button = gr.Button("Recommend Films", variant="primary")
+
+            recommend_similar_button = gr.Button("Find Films With a Similar Arc")
 
             gr.Markdown("---")
             gr.Markdown("### Download Results")
+            with gr.Row():
+                 prepare_csv_button = gr.Button("Prepare CSV")
+                 prepare_png_button = gr.Button("Prepare Graph (PNG)")
+                 prepare_pdf_button = gr.Button("Prepare Report (PDF)")
             with gr.Row():
                  download_csv = gr.File(label="Download Analysis (CSV)", visible=False, interactive=False)
                  download_png = gr.File(label="Download Graph (PNG)", visible=False, interactive=False)
@@ -198,8 +355,12 @@ with gr.Blocks(css=css, title="Cinemood: Movie Emotion Analyzer") as app:
             insights_display = gr.Textbox(label="Storytelling Insights", lines=4, interactive=False)
             emotion_graph = gr.Image(label="Emotion Distribution Graph", type="filepath", interactive=False) # Use filepath type
             emotion_table = gr.DataFrame(label="Scene-by-Scene Emotion Analysis", interactive=False)
+            recommendations_table = gr.DataFrame(label="Recommended Films", interactive=False)
 
 
+    # The finished analysis of this browser session; downloads are built from it on request
+    analysis_state = gr.State(None)
+
     # Define outputs list (must match the order yielded by process_analysis)
     outputs = [
         plot_display,
@@ -208,7 +369,8 @@ with gr.Blocks(css=css, title="Cinemood: Movie Emotion Analyzer") as app:
         emotion_graph,
         download_csv,
         download_png,
-        download_pdf
+        download_pdf,
+        analysis_state
     ]
 
     # Connect buttons to the processing function
@@ -217,14 +379,22 @@ with gr.Blocks(css=css, title="Cinemood: Movie Emotion Analyzer") as app:
         inputs=[movie_title_input, gr.State(None)], # Pass None for custom_plot
         outputs=outputs,
         show_progress="full" # Show Gradio's progress indicator
-    )
+    ).then(show_graph, inputs=analysis_state, outputs=emotion_graph) # Chart renders after the analysis is returned
 
     analyze_button_custom.click(
         fn=process_analysis,
         inputs=[gr.State(None), custom_plot_input], # Pass None for movie_title
         outputs=outputs,
         show_progress="full" # Show Gradio's progress indicator
-    )
+    ).then(show_graph, inputs=analysis_state, outputs=emotion_graph) # Chart renders after the analysis is returned
+
+    # Downloads are only produced when asked for
+    prepare_csv_button.click(fn=prepare_csv, inputs=analysis_state, outputs=download_csv)
+    prepare_png_button.click(fn=prepare_png, inputs=analysis_state, outputs=download_png)
+    prepare_pdf_button.click(fn=prepare_pdf, inputs=analysis_state, outputs=download_pdf)
+
+    recommend_mood_button.click(fn=recommend_by_mood, inputs=mood_input, outputs=recommendations_table)
+    recommend_similar_button.click(fn=recommend_similar, inputs=analysis_state, outputs=recommendations_table)
 
     # Add example usage
     gr.Examples(
@@ -240,12 +410,22 @@ with gr.Blocks(css=css, title="Cinemood: Movie Emotion Analyzer") as app:
         label="Example Movie Titles (Click to Run)"
     )
 
-    # Add cleanup hook (optional, Gradio often handles temp files well)
-    # app.unload(cleanup_temp_files) # Register cleanup function on app close/reload
+    # Release this session's downloads when the browser tab closes
+    app.unload(release_session)
 
 # --- Run the App ---
 if __name__ == "__main__":
+    # Load models and run a dummy forward pass in the background so the first click is fast
+    if os.environ.get("CINEMOOD_WARMUP", "1") == "1":
+        # With worker processes the forward pass runs in the workers, keeping this process fork-safe
+        warm_up(background=True, forward_pass=inference_pool is None)
+    if metrics.ENABLED:
+        metrics.start_metrics_server() # Prometheus scrape target next to the Gradio server
+    usage = artifact_store.disk_usage()
+    logging.info(f"Artifact store at {artifact_store.root}: {usage['files']} files, {usage['bytes']} / {usage['max_bytes']} bytes.")
+    if inference_pool is not None:
+        # As many concurrent analyses as the pool keeps tasks in flight; beyond that Gradio queues
+        # a bounded number of requests and turns the rest away
+        app.queue(default_concurrency_limit=inference_pool.max_in_flight, max_size=4 * inference_pool.max_in_flight)
     # Set share=True to get a public link (requires Gradio account or tunneling)
-    app.launch(debug=True, share=True) # debug=True provides more logs
-    # Clean up any remaining temp files on exit (might not always run on forced exit)
-    cleanup_temp_files() 
\ No newline at end of file
+    app.launch(debug=True, share=True, allowed_paths=[artifact_store.root]) # debug=True provides more logs
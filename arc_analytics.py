@@ -0,0 +1,276 @@
+# arc_analytics.py
+import numpy as np
+
+from emotion_scores import EMOTION_LABELS, EmotionScores
+
+# Emotions whose probability mass counts as narrative tension / negative valence
+NEGATIVE_EMOTIONS = ("anger", "disgust", "fear", "sadness")
+POSITIVE_EMOTIONS = ("joy",)
+NEGATIVE_COLUMNS = np.array([EMOTION_LABELS.index(label) for label in NEGATIVE_EMOTIONS])
+POSITIVE_COLUMNS = np.array([EMOTION_LABELS.index(label) for label in POSITIVE_EMOTIONS])
+
+# Smoothing window as a fraction of a film's length when no explicit window is given
+DEFAULT_WINDOW_FRACTION = 0.1
+# Dominant score above which a scene counts as emotionally intense
+HIGH_INTENSITY_THRESHOLD = 0.7
+# Points each film's valence arc is resampled to for shape features
+ARC_SAMPLES = 30
+# Minimum change in mean valence between thirds that counts as a rise or fall
+SHAPE_EPSILON = 0.05
+
+ARC_SHAPES = {
+    (1, 1): "rags to riches (steady rise)",
+    (-1, -1): "tragedy (steady fall)",
+    (-1, 1): "man in a hole (fall then rise)",
+    (1, -1): "Icarus (rise then fall)",
+}
+
+
+def single_offsets(n_scenes: int) -> np.ndarray:
+    """Offsets describing one film of `n_scenes` scenes."""
+    return np.array([0, n_scenes], dtype=np.intp)
+
+
+def stack_corpus(films: list[EmotionScores]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Stacks several films into one (total scenes x emotions) matrix plus CSR-style offsets.
+
+    Film f occupies rows offsets[f]:offsets[f + 1].
+    """
+    lengths = np.array([len(film) for film in films], dtype=np.intp)
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.intp)
+    if not films:
+        return np.zeros((0, len(EMOTION_LABELS)), dtype=np.float32), offsets
+    return np.concatenate([film.matrix for film in films]), offsets
+
+
+def film_ids(offsets: np.ndarray) -> np.ndarray:
+    """Film index of every scene row."""
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def _segment_sum(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Per-film sums along axis 0 (empty films sum to zero)."""
+    cumulative = np.concatenate([np.zeros((1,) + values.shape[1:], dtype=np.float64),
+                                 np.cumsum(values, axis=0, dtype=np.float64)])
+    return cumulative[offsets[1:]] - cumulative[offsets[:-1]]
+
+
+def _segment_argmax(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Row index (relative to each film's start) of each film's maximum; -1 for empty films."""
+    ids = film_ids(offsets)
+    order = np.lexsort((-values, ids)) # Sorted by film, then by descending value
+    lengths = np.diff(offsets)
+    result = np.full(len(lengths), -1, dtype=np.intp)
+    non_empty = lengths > 0
+    result[non_empty] = order[offsets[:-1][non_empty]] - offsets[:-1][non_empty]
+    return result
+
+
+def dominant_index(matrix: np.ndarray) -> np.ndarray:
+    """Dominant emotion column per scene (-1 for unclassified all-zero rows)."""
+    if not len(matrix):
+        return np.zeros(0, dtype=np.intp)
+    index = matrix.argmax(axis=1)
+    index[matrix.max(axis=1) <= 0] = -1
+    return index
+
+
+def emotion_counts(dominant: np.ndarray, offsets: np.ndarray, n_labels: int = len(EMOTION_LABELS)) -> np.ndarray:
+    """(films x emotions) number of scenes per dominant emotion; unclassified scenes are not counted."""
+    ids = film_ids(offsets)
+    known = dominant >= 0
+    flat = ids[known] * n_labels + dominant[known]
+    return np.bincount(flat, minlength=(len(offsets) - 1) * n_labels).reshape(-1, n_labels)
+
+
+def transition_matrices(dominant: np.ndarray, offsets: np.ndarray, n_labels: int = len(EMOTION_LABELS)) -> np.ndarray:
+    """
+    (films x emotions x emotions) counts of dominant-emotion transitions between consecutive scenes.
+
+    Entry [f, a, b] counts scenes of emotion a followed by a scene of emotion b
+    within film f; transitions across film boundaries are excluded.
+    """
+    n_films = len(offsets) - 1
+    if len(dominant) < 2:
+        return np.zeros((n_films, n_labels, n_labels), dtype=np.int64)
+    ids = film_ids(offsets)
+    valid = (ids[:-1] == ids[1:]) & (dominant[:-1] >= 0) & (dominant[1:] >= 0)
+    flat = (ids[:-1][valid] * n_labels + dominant[:-1][valid]) * n_labels + dominant[1:][valid]
+    counts = np.bincount(flat, minlength=n_films * n_labels * n_labels)
+    return counts.reshape(n_films, n_labels, n_labels)
+
+
+def smoothed_arcs(values: np.ndarray, offsets: np.ndarray, window: int | None = None) -> np.ndarray:
+    """
+    Centered rolling mean of every column, computed per film without crossing film boundaries.
+
+    Args:
+        values: (scenes,) or (scenes x k) array.
+        offsets: Film offsets.
+        window: Window length in scenes; None uses DEFAULT_WINDOW_FRACTION of each film's length.
+    """
+    squeeze = values.ndim == 1
+    values = values[:, None] if squeeze else values
+    if not len(values):
+        return values[:, 0] if squeeze else values
+    ids = film_ids(offsets)
+    lengths = np.diff(offsets)
+    if window is None:
+        half = np.maximum(0, np.round(lengths * DEFAULT_WINDOW_FRACTION / 2)).astype(np.intp)[ids]
+    else:
+        half = np.full(len(values), max(0, window // 2), dtype=np.intp)
+    rows = np.arange(len(values))
+    low = np.maximum(offsets[:-1][ids], rows - half)
+    high = np.minimum(offsets[1:][ids], rows + half + 1)
+    cumulative = np.concatenate([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0, dtype=np.float64)])
+    smoothed = ((cumulative[high] - cumulative[low]) / (high - low)[:, None]).astype(np.float32)
+    return smoothed[:, 0] if squeeze else smoothed
+
+
+def valence(matrix: np.ndarray) -> np.ndarray:
+    """Positive minus negative probability mass per scene, in [-1, 1]."""
+    return matrix[:, POSITIVE_COLUMNS].sum(axis=1) - matrix[:, NEGATIVE_COLUMNS].sum(axis=1)
+
+
+def tension(matrix: np.ndarray) -> np.ndarray:
+    """Negative-emotion probability mass per scene, in [0, 1]."""
+    return matrix[:, NEGATIVE_COLUMNS].sum(axis=1)
+
+
+def intensity_stats(matrix: np.ndarray, offsets: np.ndarray) -> dict[str, np.ndarray]:
+    """Per-film mean/std of the dominant score and the share of high-intensity scenes."""
+    lengths = np.diff(offsets).astype(np.float64)
+    safe = np.maximum(lengths, 1)
+    dominant_score = matrix.max(axis=1) if len(matrix) else np.zeros(0, dtype=np.float32)
+    total = _segment_sum(dominant_score, offsets)
+    total_sq = _segment_sum(dominant_score.astype(np.float64) ** 2, offsets)
+    mean = total / safe
+    return {
+        "mean_intensity": mean,
+        "std_intensity": np.sqrt(np.maximum(total_sq / safe - mean ** 2, 0)),
+        "high_intensity_share": _segment_sum((dominant_score > HIGH_INTENSITY_THRESHOLD).astype(np.float64), offsets) / safe,
+    }
+
+
+def resample_arcs(values: np.ndarray, offsets: np.ndarray, samples: int = ARC_SAMPLES) -> np.ndarray:
+    """(films x samples) values picked at evenly spaced relative positions of each film (0 for empty films)."""
+    lengths = np.diff(offsets)
+    positions = np.linspace(0.0, 1.0, samples)
+    index = offsets[:-1, None] + np.round(positions[None, :] * np.maximum(lengths - 1, 0)[:, None]).astype(np.intp)
+    if not len(values):
+        return np.zeros((len(lengths), samples), dtype=np.float32)
+    sampled = values[np.minimum(index, len(values) - 1)]
+    sampled[lengths == 0] = 0
+    return sampled
+
+
+def arc_shape_features(smoothed_valence: np.ndarray, offsets: np.ndarray, samples: int = ARC_SAMPLES) -> dict[str, np.ndarray]:
+    """
+    Shape descriptors of each film's smoothed valence arc.
+
+    Returns start/end valence, overall change, relative positions of the
+    lowest and highest points, and a shape code per film: the sign of the
+    change between the mean valence of the first/second and second/third thirds.
+    """
+    arcs = resample_arcs(smoothed_valence, offsets, samples)
+    thirds = np.array_split(np.arange(samples), 3)
+    means = np.stack([arcs[:, part].mean(axis=1) for part in thirds], axis=1)
+    steps = np.diff(means, axis=1)
+    signs = np.where(np.abs(steps) < SHAPE_EPSILON, 0, np.sign(steps)).astype(np.int8)
+    return {
+        "start_valence": arcs[:, 0],
+        "end_valence": arcs[:, -1],
+        "valence_change": arcs[:, -1] - arcs[:, 0],
+        "low_point": arcs.argmin(axis=1) / max(samples - 1, 1),
+        "high_point": arcs.argmax(axis=1) / max(samples - 1, 1),
+        "shape_signs": signs,
+        "resampled_valence": arcs,
+    }
+
+
+def analyze_arcs(matrix: np.ndarray, offsets: np.ndarray, window: int | None = None) -> dict[str, np.ndarray]:
+    """
+    Computes all emotional-arc analytics for a stacked corpus in one vectorized pass.
+
+    Args:
+        matrix: (total scenes x emotions) float32 score matrix (columns follow EMOTION_LABELS).
+        offsets: Film offsets from stack_corpus (or single_offsets for one film).
+        window: Smoothing window in scenes (None = 10% of each film).
+
+    Returns:
+        A dict of per-film arrays; see the keys below.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    offsets = np.asarray(offsets, dtype=np.intp)
+    lengths = np.diff(offsets)
+    dominant = dominant_index(matrix)
+    transitions = transition_matrices(dominant, offsets)
+
+    # Shifts: transitions between different emotions
+    n_labels = len(EMOTION_LABELS)
+    off_diagonal = transitions * (1 - np.eye(n_labels, dtype=transitions.dtype))
+    shift_counts = off_diagonal.sum(axis=(1, 2))
+    top_shift = off_diagonal.reshape(len(lengths), -1).argmax(axis=1)
+
+    smoothed_tension = smoothed_arcs(tension(matrix), offsets, window)
+    smoothed_valence = smoothed_arcs(valence(matrix), offsets, window)
+    climax = _segment_argmax(smoothed_tension, offsets)
+    climax_value = np.zeros(len(lengths), dtype=np.float32)
+    has_climax = climax >= 0
+    climax_value[has_climax] = smoothed_tension[offsets[:-1][has_climax] + climax[has_climax]]
+
+    result = {
+        "scene_counts": lengths,
+        "emotion_counts": emotion_counts(dominant, offsets),
+        "mean_scores": _segment_sum(matrix, offsets) / np.maximum(lengths, 1)[:, None],
+        "transitions": transitions,
+        "shift_counts": shift_counts,
+        "top_shift_from": top_shift // n_labels,
+        "top_shift_to": top_shift % n_labels,
+        "climax_scene": climax,
+        "climax_position": np.where(lengths > 1, climax / np.maximum(lengths - 1, 1), 0.0),
+        "climax_tension": climax_value,
+        "smoothed_tension": smoothed_tension,
+        "smoothed_valence": smoothed_valence,
+    }
+    result.update(intensity_stats(matrix, offsets))
+    result.update(arc_shape_features(smoothed_valence, offsets))
+    return result
+
+
+def analyze_film(scores: EmotionScores, window: int | None = None) -> dict:
+    """Arc analytics for a single film, with per-film arrays unwrapped to scalars."""
+    analytics = analyze_arcs(scores.matrix, single_offsets(len(scores)), window)
+    film = {}
+    for key, value in analytics.items():
+        if key in ("smoothed_tension", "smoothed_valence"):
+            film[key] = value # Already per scene
+        else:
+            film[key] = value[0]
+    return film
+
+
+def describe_shape(shape_signs) -> str:
+    """Names an arc shape code from arc_shape_features."""
+    signs = tuple(int(s) for s in shape_signs)
+    if signs == (0, 0):
+        return "flat (an even emotional tone throughout)"
+    if 0 in signs:
+        direction = signs[0] or signs[1]
+        return "a gradual rise" if direction > 0 else "a gradual decline"
+    return ARC_SHAPES[signs]
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    import time
+    rng = np.random.default_rng(0)
+    films = [EmotionScores(rng.dirichlet(np.ones(len(EMOTION_LABELS)), size=int(n)))
+             for n in rng.integers(20, 400, size=10000)]
+    matrix, offsets = stack_corpus(films)
+    started = time.perf_counter()
+    analytics = analyze_arcs(matrix, offsets)
+    elapsed = time.perf_counter() - started
+    print(f"Analyzed {len(films)} films / {len(matrix)} scenes in {elapsed:.3f}s")
+    print("First film climax position:", round(float(analytics["climax_position"][0]), 3))
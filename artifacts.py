@@ -0,0 +1,319 @@
+# artifacts.py
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable
+
+import pandas as pd
+
+from emotion_scores import get_emotion_scores
+from report_generator import build_pdf_report
+from visuals import create_emotion_distribution_graph, create_emotion_timeline_graph
+
+logging.basicConfig(level=logging.INFO)
+
+# Downloadable files are written here, named by the hash of what they were built from
+ARTIFACT_DIR = os.environ.get("CINEMOOD_ARTIFACT_DIR", os.path.join(".cache", "artifacts"))
+# Seconds an unused artifact is kept, total disk quota, and how often the background sweeper runs
+ARTIFACT_TTL = float(os.environ.get("CINEMOOD_ARTIFACT_TTL", "3600"))
+ARTIFACT_MAX_BYTES = int(os.environ.get("CINEMOOD_ARTIFACT_MAX_BYTES", str(512 * 1024 * 1024)))
+ARTIFACT_SWEEP_INTERVAL = float(os.environ.get("CINEMOOD_ARTIFACT_SWEEP_INTERVAL", "60"))
+
+
+@dataclass(frozen=True)
+class AnalysisResult:
+    """
+    Everything needed to build the downloads for one finished analysis.
+
+    Kept in the Gradio session (gr.State) so CSV, PNG and PDF files are only
+    produced when a user asks for them.
+    """
+    title: str
+    plot_text: str
+    analysis_df: pd.DataFrame = field(compare=False)
+    insights: str
+    digest: str # Content hash of the scene table and scores, see analysis_digest
+
+    @classmethod
+    def create(cls, title: str, plot_text: str, analysis_df: pd.DataFrame, insights: str) -> "AnalysisResult":
+        return cls(title, plot_text, analysis_df, insights, analysis_digest(analysis_df))
+
+
+def analysis_digest(analysis_df: pd.DataFrame) -> str:
+    """sha256 over the columns, scene texts and full score matrix; identical analyses share every artifact."""
+    hasher = hashlib.sha256()
+    hasher.update(",".join(map(str, analysis_df.columns)).encode('utf-8') + b"\0") # 'scene' chunking adds 'Sentences'
+    hasher.update(get_emotion_scores(analysis_df).matrix.tobytes())
+    for chunk in analysis_df['Chunk'].tolist():
+        hasher.update(str(chunk).encode('utf-8'))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+def _text_digest(*parts: str) -> str:
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(part.encode('utf-8'))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+@dataclass
+class _Entry:
+    size: int
+    last_access: float
+    sessions: set = field(default_factory=set)
+
+
+class ArtifactStore:
+    """
+    Bounded, content-addressed files on disk, referenced per Gradio session.
+
+    `get_or_build` returns the existing file when the key is already present
+    and otherwise runs the builder exactly once, even if several requests ask
+    for the same artifact at the same time. Files are written to a temporary
+    name and renamed into place, so readers never see a partial file.
+
+    Every access records the requesting session. A file is only removed when
+    it expired (unused for `ttl` seconds), when no live session references it
+    any more, or when the store exceeds `max_bytes`. In that last case files
+    no session references go first, then the least recently used. One user's
+    activity therefore never deletes another user's fresh downloads.
+    Call `start_sweeper` to expire files in the background.
+
+    Gradio copies every file path an event returns into its own cache directory,
+    which this store does not manage. app.py bounds that copy with
+    `gr.Blocks(delete_cache=(ARTIFACT_SWEEP_INTERVAL, ARTIFACT_TTL))`, so served
+    files expire on the same schedule as the originals.
+    """
+
+    def __init__(self, root: str = ARTIFACT_DIR,
+                 ttl: float = ARTIFACT_TTL,
+                 max_bytes: int = ARTIFACT_MAX_BYTES):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._key_locks = {} # path -> [lock, threads holding or waiting for it]
+        self._entries = OrderedDict() # path -> _Entry, least recently used first
+        self._sessions = {} # session id -> set of paths
+        self._total_bytes = 0
+        self._sweeper = None
+        self._stop = threading.Event()
+        self.hits = 0
+        self.builds = 0
+        self.evictions = 0
+        self._adopt_existing()
+
+    def _adopt_existing(self) -> None:
+        """Indexes files left by a previous run (oldest first) and drops interrupted writes."""
+        files = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith(".part"):
+                self._remove_file(path)
+            elif os.path.isfile(path):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, path, stat.st_size))
+        for mtime, path, size in sorted(files):
+            self._entries[path] = _Entry(size, mtime)
+            self._total_bytes += size
+
+    def path_for(self, key: str, suffix: str) -> str:
+        return os.path.join(self.root, f"{key}.{suffix}")
+
+    def get_or_build(self, key: str, suffix: str, build: Callable[[], bytes], session: str | None = None) -> str:
+        """
+        Returns the path of artifact `key`, building it with `build` if it does not exist yet.
+
+        Args:
+            key: Content hash identifying the artifact.
+            suffix: File extension (e.g. 'csv', 'png', 'pdf').
+            build: Produces the file contents.
+            session: Gradio session hash of the requester; keeps the file alive until the session ends.
+
+        Returns:
+            Path to the artifact file.
+        """
+        path = self.path_for(key, suffix)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(path, [threading.Lock(), 0])
+            key_lock[1] += 1
+        try:
+            with key_lock[0]:
+                return self._get_or_build_locked(path, build, session)
+        finally:
+            with self._lock:
+                # The lock is dropped only once no thread holds or waits for it
+                key_lock[1] -= 1
+                if key_lock[1] == 0:
+                    del self._key_locks[path]
+
+    def _get_or_build_locked(self, path: str, build: Callable[[], bytes], session: str | None) -> str:
+        with self._lock:
+            if path in self._entries and os.path.exists(path):
+                self.hits += 1
+                self._touch(path, session)
+                return path
+        data = build()
+        with tempfile.NamedTemporaryFile(dir=self.root, delete=False, suffix=".part") as temp:
+            temp.write(data)
+        os.replace(temp.name, path)
+        with self._lock:
+            self.builds += 1
+            previous = self._entries.pop(path, None)
+            if previous:
+                self._total_bytes -= previous.size
+            self._entries[path] = _Entry(len(data), time.time())
+            self._total_bytes += len(data)
+            self._touch(path, session)
+            self._enforce_quota()
+        logging.info(f"Built artifact {os.path.basename(path)} ({len(data)} bytes)")
+        return path
+
+    def _touch(self, path: str, session: str | None) -> None:
+        entry = self._entries[path]
+        entry.last_access = time.time()
+        self._entries.move_to_end(path)
+        if session:
+            entry.sessions.add(session)
+            self._sessions.setdefault(session, set()).add(path)
+
+    def release_session(self, session: str) -> None:
+        """Drops a finished session's references; files nobody else uses are removed right away."""
+        with self._lock:
+            for path in self._sessions.pop(session, set()):
+                entry = self._entries.get(path)
+                if entry is None:
+                    continue
+                entry.sessions.discard(session)
+                if not entry.sessions:
+                    self._evict(path)
+
+    def sweep(self) -> int:
+        """Removes expired files and enforces the quota. Returns the number of files removed."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            before = self.evictions
+            expired = [path for path, entry in self._entries.items() if entry.last_access < cutoff]
+            for path in expired:
+                self._evict(path)
+            self._enforce_quota()
+            return self.evictions - before
+
+    def _enforce_quota(self) -> None:
+        if self._total_bytes <= self.max_bytes:
+            return
+        # Unreferenced files first, then everything in least-recently-used order
+        candidates = [path for path, entry in self._entries.items() if not entry.sessions]
+        candidates += [path for path, entry in self._entries.items() if entry.sessions]
+        for path in candidates:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._evict(path)
+
+    def _evict(self, path: str) -> None:
+        entry = self._entries.pop(path)
+        self._total_bytes -= entry.size
+        for session in entry.sessions:
+            paths = self._sessions.get(session)
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del self._sessions[session]
+        self._remove_file(path)
+        self.evictions += 1
+
+    @staticmethod
+    def _remove_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Error removing artifact {path}: {e}")
+
+    def start_sweeper(self, interval: float = ARTIFACT_SWEEP_INTERVAL) -> None:
+        """Runs `sweep` every `interval` seconds on a daemon thread."""
+        if self._sweeper is not None:
+            return
+
+        def run() -> None:
+            while not self._stop.wait(interval):
+                removed = self.sweep()
+                if removed:
+                    usage = self.disk_usage()
+                    logging.info(f"Artifact sweep removed {removed} files; {usage['files']} files, {usage['bytes']} bytes in use.")
+
+        self._sweeper = threading.Thread(target=run, name="artifact-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+        self._stop.clear()
+
+    def disk_usage(self) -> dict:
+        """Files and bytes currently stored, against the quota, plus the number of sessions holding files."""
+        with self._lock:
+            return {"files": len(self._entries), "bytes": self._total_bytes,
+                    "max_bytes": self.max_bytes, "sessions": len(self._sessions)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "builds": self.builds, "evictions": self.evictions}
+
+
+def csv_artifact(store: ArtifactStore, result: AnalysisResult, session: str | None = None) -> str:
+    """Scene-by-scene table as CSV."""
+    return store.get_or_build(result.digest, "csv",
+                              lambda: result.analysis_df.to_csv(index=False).encode('utf-8'), session)
+
+
+def chart_artifact(store: ArtifactStore, result: AnalysisResult, session: str | None = None) -> str | None:
+    """Emotion distribution chart as PNG, or None if it cannot be drawn."""
+    def build() -> bytes:
+        plot_buffer = create_emotion_distribution_graph(result.analysis_df)
+        if plot_buffer is None:
+            raise ValueError("Emotion distribution graph could not be created.")
+        return plot_buffer.getvalue()
+
+    try:
+        return store.get_or_build(result.digest, "png", build, session)
+    except ValueError as e:
+        logging.error(str(e))
+        return None
+
+
+def report_artifact(store: ArtifactStore, result: AnalysisResult, session: str | None = None) -> str:
+    """Full PDF report; keyed on the title, plot and insights as well as the analysis."""
+    def build() -> bytes:
+        return build_pdf_report(result.title, result.plot_text, result.analysis_df, result.insights,
+                                create_emotion_distribution_graph(result.analysis_df),
+                                create_emotion_timeline_graph(result.analysis_df))
+
+    key = _text_digest(result.digest, result.title, result.plot_text, result.insights)
+    return store.get_or_build(key, "pdf", build, session)
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    from emotion_scores import EmotionScores
+    scores = EmotionScores.from_outputs([[{"label": "joy", "score": 0.9}], [{"label": "fear", "score": 0.7}]])
+    result = AnalysisResult.create("Demo", "A demo plot.", scores.to_frame(["Happy.", "Scary."]), "Joy then fear.")
+    store = ArtifactStore(tempfile.mkdtemp())
+    first = csv_artifact(store, result, session="alice")
+    second = csv_artifact(store, AnalysisResult.create("Demo", "A demo plot.", scores.to_frame(["Happy.", "Scary."]), "Joy then fear."), session="bob")
+    print("Same file for identical analyses:", first == second, store.stats())
+    store.release_session("alice")
+    print("Kept while another session uses it:", os.path.exists(first), store.disk_usage())
+    store.release_session("bob")
+    print("Removed once no session uses it:", not os.path.exists(first), store.disk_usage())
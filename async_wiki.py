@@ -0,0 +1,273 @@
+# async_wiki.py
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from plot_store import normalize_title
+from wiki_fetcher import LocalPage, extract_plot
+
+logging.basicConfig(level=logging.INFO)
+
+API_URL = os.environ.get("CINEMOOD_WIKI_API_URL", "https://en.wikipedia.org/w/api.php")
+# Wikimedia asks API clients to identify themselves with a descriptive User-Agent
+USER_AGENT = "Cinemood/1.0 (https://github.com/sayyidsyamil/cinemood)"
+DEFAULT_RATE = float(os.environ.get("CINEMOOD_WIKI_RATE", "10"))        # requests per second
+DEFAULT_MAX_CONNECTIONS = int(os.environ.get("CINEMOOD_WIKI_MAX_CONNECTIONS", "8"))
+DEFAULT_MAX_RETRIES = 4
+MAXLAG_SECONDS = 5
+
+
+class WikiFetchError(Exception):
+    """Raised when the API cannot be reached or keeps failing after retries (never cached as 'not found')."""
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` requests per second with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Drains the bucket so no request is sent for roughly `seconds` (used on 429 / maxlag)."""
+        self.tokens = min(self.tokens, -seconds * self.rate)
+        self.updated = time.monotonic()
+
+
+def _section(content: str, section_title: str) -> str | None:
+    """Same semantics as wikipedia.WikipediaPage.section: text between the heading and the next '=='."""
+    heading = f"== {section_title} =="
+    index = content.find(heading)
+    if index < 0:
+        return None
+    index += len(heading)
+    next_index = content.find("==", index)
+    if next_index < 0:
+        next_index = len(content)
+    return content[index:next_index].lstrip("=").strip()
+
+
+class AsyncWikiClient:
+    """
+    asyncio MediaWiki client with a pooled session, rate limiting, backoff and request coalescing.
+
+    Identical concurrent lookups (by normalized title) share one in-flight
+    task, so ten simultaneous requests for "Inception" cost a single fetch.
+    Point `api_url` at a local mock server to test without the network.
+    """
+
+    def __init__(self, api_url: str = API_URL,
+                 rate: float = DEFAULT_RATE,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 timeout: float = 15.0):
+        self.api_url = api_url
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.rate = rate
+        self._limiter = None
+        self._session = None
+        self._in_flight = {}
+        self.requests_sent = 0
+        self.coalesced = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily so it binds to the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"User-Agent": USER_AGENT},
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._limiter = RateLimiter(self.rate)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _api(self, **params) -> dict:
+        """
+        Sends one API request, retrying with exponential backoff on 429, 5xx, maxlag and network errors.
+
+        Raises:
+            WikiFetchError: At once on any other 4xx or an API error, else once retries run out.
+        """
+        params = {"format": "json", "formatversion": "2", "maxlag": MAXLAG_SECONDS, **params}
+        session = self._get_session()
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            await self._limiter.acquire()
+            delay = min(30.0, 0.5 * 2 ** attempt) * (1 + random.random() * 0.1)
+            try:
+                self.requests_sent += 1
+                async with session.get(self.api_url, params=params) as response:
+                    if response.status == 429 or response.status >= 500:
+                        retry_after = response.headers.get("Retry-After")
+                        if retry_after and retry_after.isdigit():
+                            delay = max(delay, float(retry_after))
+                        last_error = f"HTTP {response.status}"
+                    elif response.status >= 400:
+                        # A client error fails the same way on every attempt
+                        raise WikiFetchError(f"Wikipedia API request failed: HTTP {response.status}")
+                    else:
+                        data = await response.json(content_type=None)
+                        error = data.get("error")
+                        if error and error.get("code") == "maxlag":
+                            last_error = "maxlag"
+                            retry_after = response.headers.get("Retry-After")
+                            if retry_after and retry_after.isdigit():
+                                delay = max(delay, float(retry_after))
+                        elif error:
+                            raise WikiFetchError(f"API error {error.get('code')}: {error.get('info')}")
+                        else:
+                            return data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = str(e) or type(e).__name__
+            if attempt < self.max_retries:
+                logging.warning(f"Wikipedia API request failed ({last_error}); retrying in {delay:.1f}s.")
+                # Draining the shared bucket backs off every concurrent request, not just this one
+                self._limiter.pause(delay)
+        raise WikiFetchError(f"Wikipedia API request failed after {self.max_retries + 1} attempts: {last_error}")
+
+    async def _search(self, movie_title: str) -> str | None:
+        data = await self._api(action="query", list="search", srsearch=movie_title, srlimit=1, srprop="")
+        results = data.get("query", {}).get("search", [])
+        return results[0]["title"] if results else None
+
+    async def _page(self, title: str) -> dict | None:
+        data = await self._api(action="query", prop="extracts|pageprops", explaintext=1,
+                               titles=title, redirects=1, ppprop="disambiguation")
+        pages = data.get("query", {}).get("pages", [])
+        if not pages or pages[0].get("missing"):
+            return None
+        return pages[0]
+
+    async def _first_disambiguation_option(self, title: str) -> str | None:
+        """
+        First option of a disambiguation page in page order, chosen as the wikipedia
+        package builds DisambiguationError.options: the first link of each list item.
+        """
+        data = await self._api(action="parse", page=title, prop="text", redirects=1)
+        html = data.get("parse", {}).get("text", "")
+        for item in BeautifulSoup(html, "html.parser").find_all("li"):
+            if "tocsection" not in "".join(item.get("class", [])) and item.a:
+                return item.a.get_text()
+        return None
+
+    async def _resolve(self, movie_title: str) -> LocalPage | None:
+        search_title = await self._search(movie_title)
+        if not search_title:
+            logging.warning(f"No Wikipedia page found for '{movie_title}'.")
+            return None
+        page = await self._page(search_title)
+        if page is not None and "disambiguation" in page.get("pageprops", {}):
+            option = await self._first_disambiguation_option(page["title"])
+            logging.warning(f"Disambiguation error for '{movie_title}'. Trying first option: {option}")
+            page = await self._page(option) if option else None
+        if page is None:
+            logging.warning(f"Wikipedia page '{search_title}' not found precisely.")
+            return None
+
+        content = page.get("extract", "")
+        # The summary is the lead section, i.e. everything before the first heading
+        heading_index = content.find("\n== ")
+        summary = (content[:heading_index] if heading_index >= 0 else content).strip()
+        sections = {}
+        for section_title in ("Plot", "Synopsis"):
+            text = _section(content, section_title)
+            if text is not None:
+                sections[section_title] = text
+        return LocalPage(page.get("pageid"), page.get("title"), sections, summary)
+
+    async def resolve_page(self, movie_title: str) -> LocalPage | None:
+        """
+        Resolves a movie title to a page exposing `section()` and `summary`.
+
+        Concurrent calls for the same normalized title await one shared fetch.
+
+        Raises:
+            WikiFetchError: On network/API failure after retries.
+        """
+        key = normalize_title(movie_title)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+        task = asyncio.ensure_future(self._resolve(movie_title))
+        self._in_flight[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._in_flight.pop(key, None)
+            else:
+                task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+    async def fetch_movie_plot(self, movie_title: str) -> str | None:
+        """Async counterpart of wiki_fetcher.fetch_movie_plot (Plot -> Synopsis -> summary), without the store."""
+        page = await self.resolve_page(movie_title)
+        return extract_plot(page, movie_title) if page is not None else None
+
+
+class AsyncWikiBackend:
+    """
+    Synchronous fetch backend for wiki_fetcher that runs an AsyncWikiClient on a private event loop thread.
+
+    Because every Gradio worker thread submits into the same loop, request
+    coalescing and the rate limit apply across all concurrent users:
+
+        wiki_fetcher.set_fetch_backend(AsyncWikiBackend())
+    """
+
+    def __init__(self, client: AsyncWikiClient | None = None):
+        self.client = client or AsyncWikiClient()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async-wiki-loop", daemon=True)
+        self._thread.start()
+
+    def resolve_page(self, movie_title: str):
+        future = asyncio.run_coroutine_threadsafe(self.client.resolve_page(movie_title), self._loop)
+        return future.result()
+
+    def close(self) -> None:
+        asyncio.run_coroutine_threadsafe(self.client.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    async def main():
+        async with AsyncWikiClient() as client:
+            plots = await asyncio.gather(*[client.fetch_movie_plot("Inception") for _ in range(10)])
+            print("Fetched:", sum(1 for p in plots if p), "plots with", client.requests_sent,
+                  "requests,", client.coalesced, "coalesced")
+    asyncio.run(main())
@@ -0,0 +1,269 @@
+# batch_runner.py
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from wiki_fetcher import fetch_movie_plot
+from emotion_utils import chunk_text, classify_emotions, generate_insights, warm_up
+from emotion_scores import get_emotion_scores
+
+logging.basicConfig(level=logging.INFO)
+
+# Statuses that a rerun would reproduce; only these are checkpointed. 'not_found' and
+# 'classification_failed' can come from a network error or timeout, so they are retried.
+FINAL_STATUSES = ("ok", "no_chunks")
+
+
+def read_inputs(list_path: str) -> list[str]:
+    """Reads one title (or plot file path) per line, skipping blanks and '#' comments."""
+    with open(list_path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def load_checkpoint(checkpoint_path: str) -> set[str]:
+    """Returns the keys already processed in a previous run."""
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def fetch_and_chunk(item: str, plot_files: bool) -> dict:
+    """I/O stage, run on the fetch thread pool: fetch (or read) the plot and split it into sentences."""
+    if plot_files:
+        title = os.path.splitext(os.path.basename(item))[0]
+        try:
+            with open(item, encoding="utf-8") as f:
+                plot = f.read().strip()
+        except OSError as e:
+            logging.error(f"Could not read plot file '{item}': {e}")
+            plot = None
+    else:
+        title = item
+        plot = fetch_movie_plot(item)
+    chunks = chunk_text(plot) if plot else []
+    return {"key": item, "title": title, "plot": plot, "chunks": chunks}
+
+
+def analyze(fetched: dict) -> dict:
+    """CPU stage, run on the main thread: classify emotions and build insights."""
+    record = {"key": fetched["key"], "title": fetched["title"]}
+    if not fetched["plot"]:
+        record["status"] = "not_found"
+        return record
+    if not fetched["chunks"]:
+        record["status"] = "no_chunks"
+        return record
+
+    analysis_df = classify_emotions(fetched["chunks"])
+    if analysis_df.empty:
+        record["status"] = "classification_failed"
+        return record
+
+    scores = get_emotion_scores(analysis_df)
+    columns = [c for c in ("Scene", "Sentences", "Emotion", "Score", "Chunk") if c in analysis_df.columns]
+    record.update({
+        "status": "ok",
+        "scene_count": len(analysis_df),
+        "emotion_counts": {label: int(n) for label, n in scores.counts().items()},
+        "mean_scores": {label: round(float(v), 4) for label, v in zip(scores.labels, scores.mean())},
+        "insights": generate_insights(analysis_df),
+        "scenes": analysis_df[columns].to_dict(orient="records"),
+    })
+    return record
+
+
+class JsonlSink:
+    """Appends one JSON record per line, flushing after every record so a crash loses nothing written."""
+
+    def __init__(self, path: str):
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: dict) -> list[str]:
+        """Writes a record and returns the keys that are now durable."""
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        return [record["key"]]
+
+    def close(self) -> list[str]:
+        self.file.close()
+        return []
+
+
+# Nested record fields, stored in Parquet as JSON strings to keep the schema flat and stable
+PARQUET_JSON_COLUMNS = ("emotion_counts", "mean_scores", "scenes")
+
+
+def parquet_schema():
+    """The fixed schema of every Parquet part; fields a record lacks (e.g. failed titles) are null."""
+    import pyarrow as pa
+    return pa.schema([
+        ("key", pa.string()),
+        ("title", pa.string()),
+        ("status", pa.string()),
+        ("scene_count", pa.int64()),
+        ("emotion_counts", pa.string()),
+        ("mean_scores", pa.string()),
+        ("insights", pa.string()),
+        ("scenes", pa.string()),
+    ])
+
+
+class ParquetSink:
+    """
+    Buffers records and writes them as numbered Parquet part files in a directory.
+
+    Parquet files cannot be appended to, so each flush produces a new part; a
+    resumed run simply continues numbering after the existing parts. Every part
+    has the same schema (parquet_schema), so the directory reads as one dataset.
+    """
+
+    def __init__(self, directory: str, rows_per_part: int = 500):
+        try:
+            import pyarrow  # noqa: F401 - fail early if the optional dependency is missing
+        except ImportError as e:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow (or use --format jsonl).") from e
+        self.directory = directory
+        self.rows_per_part = rows_per_part
+        self.buffer = []
+        os.makedirs(directory, exist_ok=True)
+        self.part = len([name for name in os.listdir(directory) if name.endswith(".parquet")])
+
+    def write(self, record: dict) -> list[str]:
+        """Buffers a record and returns the keys that became durable (non-empty only on a flush)."""
+        row = dict(record)
+        for column in PARQUET_JSON_COLUMNS:
+            if column in row:
+                row[column] = json.dumps(row[column], ensure_ascii=False)
+        self.buffer.append(row)
+        if len(self.buffer) >= self.rows_per_part:
+            return self.flush()
+        return []
+
+    def flush(self) -> list[str]:
+        if not self.buffer:
+            return []
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        path = os.path.join(self.directory, f"part-{self.part:05d}.parquet")
+        pq.write_table(pa.Table.from_pylist(self.buffer, schema=parquet_schema()), path)
+        self.part += 1
+        keys = [row["key"] for row in self.buffer]
+        self.buffer = []
+        return keys
+
+    def close(self) -> list[str]:
+        return self.flush()
+
+
+def iter_fetched(items: list[str], plot_files: bool = False, fetch_workers: int = 8, prefetch: int = 32):
+    """
+    Runs fetch_and_chunk over `items` on a thread pool, at most `prefetch` items ahead of the consumer.
+
+    Yields:
+        fetch_and_chunk results in completion order. Items whose fetch raised are logged and skipped.
+    """
+    with ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="batch-fetch") as pool:
+        queue = iter(items)
+        in_flight = set()
+
+        def refill():
+            while len(in_flight) < prefetch:
+                item = next(queue, None)
+                if item is None:
+                    break
+                in_flight.add(pool.submit(fetch_and_chunk, item, plot_files))
+
+        refill()
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                in_flight.discard(future)
+            refill() # Keep fetches running while the consumer classifies
+            for future in finished:
+                try:
+                    fetched = future.result()
+                except Exception as e:
+                    logging.error(f"Batch item failed: {e}")
+                    continue
+                yield fetched
+
+
+def run_batch(items: list[str],
+              output: str,
+              output_format: str = "jsonl",
+              plot_files: bool = False,
+              fetch_workers: int = 8,
+              prefetch: int = 32) -> dict:
+    """
+    Runs fetch -> chunk -> classify -> insights over many titles, streaming results as they finish.
+
+    Fetching and chunking run concurrently on a thread pool, at most `prefetch`
+    items ahead, while the main thread keeps the classifier busy. Finished keys
+    are appended to '<output>.checkpoint' only after their record is written,
+    so a restarted run skips them. Failed titles (see FINAL_STATUSES) are written
+    but not checkpointed, so the next run tries them again and its record supersedes this one.
+
+    Returns:
+        Counts of processed, skipped and per-status results plus elapsed seconds.
+    """
+    checkpoint_path = output.rstrip("/\\") + ".checkpoint"
+    done = load_checkpoint(checkpoint_path)
+    pending = [item for item in dict.fromkeys(items) if item not in done]
+    logging.info(f"Batch run: {len(pending)} to process, {len(items) - len(pending)} already done.")
+
+    if output_format == "parquet":
+        sink = ParquetSink(output)
+    else:
+        sink = JsonlSink(output)
+
+    summary = {"processed": 0, "skipped": len(items) - len(pending), "statuses": {}}
+    started = time.perf_counter()
+    retry = set() # Written keys that must not be checkpointed
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        try:
+            for fetched in iter_fetched(pending, plot_files, fetch_workers, prefetch):
+                try:
+                    record = analyze(fetched)
+                except Exception as e:
+                    logging.error(f"Batch item failed: {e}")
+                    continue # Not checkpointed, so it is retried on the next run
+                if record["status"] not in FINAL_STATUSES:
+                    retry.add(record["key"])
+                # Keys are checkpointed only once their rows are on disk (Parquet flushes in parts)
+                checkpoint.writelines(key + "\n" for key in sink.write(record) if key not in retry)
+                checkpoint.flush()
+                summary["processed"] += 1
+                summary["statuses"][record["status"]] = summary["statuses"].get(record["status"], 0) + 1
+                if summary["processed"] % 100 == 0:
+                    rate = summary["processed"] / (time.perf_counter() - started)
+                    logging.info(f"Batch progress: {summary['processed']}/{len(pending)} ({rate:.1f} titles/s)")
+        finally:
+            checkpoint.writelines(key + "\n" for key in sink.close() if key not in retry)
+
+    summary["elapsed_s"] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze many movie titles (or plot files) headlessly.")
+    parser.add_argument("input", help="Text file with one movie title (or plot file path) per line.")
+    parser.add_argument("output", help="Output .jsonl file, or a directory for --format parquet.")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl", help="Output format.")
+    parser.add_argument("--plot-files", action="store_true", help="Treat input lines as paths to plot text files.")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="Concurrent fetch/chunk threads.")
+    parser.add_argument("--prefetch", type=int, default=32, help="Maximum items fetched ahead of classification.")
+    args = parser.parse_args()
+    if args.format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--format parquet needs pyarrow: pip install pyarrow")
+
+    warm_up(background=False)
+    result = run_batch(read_inputs(args.input), args.output, args.format, args.plot_files,
+                       args.fetch_workers, args.prefetch)
+    print(json.dumps(result, indent=2))
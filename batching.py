@@ -0,0 +1,152 @@
+# batching.py
+import copy
+import logging
+import os
+import threading
+
+import metrics
+
+logging.basicConfig(level=logging.INFO)
+
+# Token budget per forward pass (batch size x longest sequence, i.e. padded tokens)
+DEFAULT_MAX_BATCH_TOKENS = int(os.environ.get("CINEMOOD_MAX_BATCH_TOKENS", "4096"))
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get("CINEMOOD_MAX_BATCH_SIZE", "64"))
+MODEL_MAX_LENGTH = 512
+
+
+def plan_batches(lengths: list[int], max_tokens: int, max_batch_size: int) -> list[list[int]]:
+    """
+    Groups item indices into batches whose padded size fits the token budget.
+
+    Items are sorted by length so each batch holds sequences of similar size;
+    a batch costs len(batch) * longest item, which is what the model pays once
+    shorter sequences are padded. An item longer than the budget gets a batch
+    of its own.
+
+    Returns:
+        A list of batches, each a list of indices into `lengths`.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    current = []
+    for index in order:
+        # Sorted ascending, so the new item is the longest in the batch
+        padded_cost = (len(current) + 1) * lengths[index]
+        if current and (padded_cost > max_tokens or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class CountingTokenizer:
+    """
+    A private copy of a pipeline's tokenizer for token counting, with calls serialized by a lock.
+
+    A Hugging Face fast tokenizer raises "Already borrowed" when threads call it
+    concurrently with different truncation or offset settings. Request and batch-fetch
+    threads count tokens (scene windows, batch planning) while an inference thread runs
+    the pipeline, so those counts go through this copy and never touch the pipeline's own.
+    """
+
+    def __init__(self, tokenizer):
+        self._tokenizer = copy.deepcopy(tokenizer)
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            return self._tokenizer(*args, **kwargs)
+
+    def num_special_tokens_to_add(self) -> int:
+        with self._lock:
+            return self._tokenizer.num_special_tokens_to_add()
+
+
+class TokenBudgetBatcher:
+    """
+    Runs a text-classification pipeline over length-sorted, token-budgeted batches.
+
+    Sentences are tokenized with the pipeline's own tokenizer, packed with
+    `plan_batches`, classified batch by batch and returned in their original
+    order. Batch counts, sizes and padding waste are kept as running totals for tuning,
+    so the stats stay constant-size in a long-running server.
+    """
+
+    def __init__(self, classifier,
+                 max_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE):
+        self.classifier = classifier
+        self.tokenizer = CountingTokenizer(classifier.tokenizer)
+        self.max_tokens = max_tokens
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.batches = 0
+            self.sentences = 0
+            self.largest_batch = 0
+            self.real_tokens = 0
+            self.padded_tokens = 0
+
+    def token_lengths(self, texts: list[str]) -> list[int]:
+        """Returns the tokenized length of each text, including special tokens, capped at the model limit."""
+        encoded = self.tokenizer(texts, truncation=True, max_length=MODEL_MAX_LENGTH)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def iter_batches(self, texts: list[str]):
+        """
+        Classifies `texts` batch by batch.
+
+        Yields:
+            (indices, outputs) per batch, where indices point into `texts`.
+        """
+        if not texts:
+            return
+        lengths = self.token_lengths(texts)
+        for batch in plan_batches(lengths, self.max_tokens, self.max_batch_size):
+            batch_texts = [texts[i] for i in batch]
+            with metrics.span("forward_pass"):
+                outputs = self.classifier(batch_texts, batch_size=len(batch_texts), truncation=True)
+            metrics.BATCH_SIZE.observe(len(batch))
+            longest = max(lengths[i] for i in batch)
+            with self._lock:
+                self.batches += 1
+                self.sentences += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+                self.real_tokens += sum(lengths[i] for i in batch)
+                self.padded_tokens += longest * len(batch)
+            yield batch, outputs
+
+    def __call__(self, texts: list[str]) -> list:
+        """Classifies `texts` and returns the outputs in input order."""
+        results = [None] * len(texts)
+        for batch, outputs in self.iter_batches(texts):
+            for index, output in zip(batch, outputs):
+                results[index] = output
+        return results
+
+    def stats(self) -> dict:
+        """Returns batch count, mean/max batch size and the fraction of padded tokens wasted."""
+        with self._lock:
+            batches, sentences, largest = self.batches, self.sentences, self.largest_batch
+            real, padded = self.real_tokens, self.padded_tokens
+        return {
+            "batches": batches,
+            "sentences": sentences,
+            "mean_batch_size": round(sentences / batches, 2) if batches else 0.0,
+            "max_batch_size": largest,
+            "real_tokens": real,
+            "padded_tokens": padded,
+            "padding_waste": round(1 - real / padded, 4) if padded else 0.0,
+        }
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    lengths = [12, 80, 9, 40, 15, 300, 11]
+    for batch in plan_batches(lengths, max_tokens=128, max_batch_size=4):
+        print("Batch:", batch, "lengths:", [lengths[i] for i in batch])
@@ -0,0 +1,3 @@
+# benchmarks/__init__.py
+# Offline benchmark scripts. Run from the repository root, e.g.:
+#   python -m benchmarks.bench_segmentation
@@ -0,0 +1,108 @@
+# benchmarks/bench_cascade.py
+import argparse
+import logging
+import time
+import zlib
+
+import numpy as np
+
+import emotion_utils
+from benchmarks.bench_pipeline import WORDS, StubEmotionClassifier
+from cascade import Cascade, HashedNgramClassifier, evaluate, print_report, split_plots
+from emotion_scores import EMOTION_LABELS, EmotionScores, get_emotion_scores
+
+# Words that push the stub teacher towards an emotion; sentences without any come out neutral
+CUES = {
+    "anger": ("furious", "rage", "shouts", "revenge"),
+    "disgust": ("rotten", "vile", "repulsed", "filth"),
+    "fear": ("terrified", "screams", "hunted", "dread"),
+    "joy": ("celebrates", "laughs", "wedding", "delighted"),
+    "sadness": ("mourns", "funeral", "weeps", "lonely"),
+    "surprise": ("suddenly", "shocked", "reveals", "twist"),
+}
+
+
+class LexiconStubClassifier(StubEmotionClassifier):
+    """
+    Learnable stand-in for the transformer: cue words decide the emotion, with per-sentence noise,
+    and each sentence costs `ms_per_sentence` of wall time, like a CPU forward pass.
+    """
+
+    def __init__(self, ms_per_sentence: float):
+        super().__init__()
+        self.ms_per_sentence = ms_per_sentence
+
+    def __call__(self, texts, **kwargs):
+        time.sleep(self.ms_per_sentence * len(texts) / 1000)
+        outputs = []
+        for text in texts:
+            rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+            words = set(text.lower().rstrip(".").split())
+            alpha = np.full(len(EMOTION_LABELS), 0.3)
+            alpha[EMOTION_LABELS.index("neutral")] += 20.0
+            for label, cues in CUES.items():
+                alpha[EMOTION_LABELS.index(label)] += 30.0 * len(words.intersection(cues))
+            scores = rng.dirichlet(alpha)
+            ranked = sorted(zip(EMOTION_LABELS, scores.tolist()), key=lambda item: -item[1])
+            outputs.append([{"label": label, "score": score} for label, score in ranked])
+        return outputs
+
+
+def cue_plot(n_sentences: int, seed: int, emotional_share: float) -> list[str]:
+    """Sentences of filler words; `emotional_share` of them carry one or two cue words."""
+    rng = np.random.default_rng(seed)
+    cue_words = [word for cues in CUES.values() for word in cues]
+    sentences = []
+    for length in rng.integers(6, 25, size=n_sentences):
+        words = list(rng.choice(WORDS, size=length))
+        if rng.random() < emotional_share:
+            for _ in range(rng.integers(1, 3)):
+                words.insert(int(rng.integers(0, len(words))), str(rng.choice(cue_words)))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return sentences
+
+
+def classify_seconds(plots: list[list[str]]) -> tuple[float, np.ndarray]:
+    started = time.perf_counter()
+    labels = [get_emotion_scores(emotion_utils.classify_emotions(plot)).dominant_index() for plot in plots]
+    return time.perf_counter() - started, np.concatenate(labels)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cascade skip rate, agreement and speedup (offline, lexicon stub teacher).")
+    parser.add_argument("--plots", type=int, default=200)
+    parser.add_argument("--sentences", type=int, default=60, help="Sentences per plot.")
+    parser.add_argument("--emotional-share", type=float, default=0.3, help="Share of sentences with emotion cues.")
+    parser.add_argument("--ms-per-sentence", type=float, default=5.0, help="Simulated transformer cost.")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    teacher = LexiconStubClassifier(args.ms_per_sentence)
+    emotion_utils.set_emotion_classifier(teacher)
+    emotion_utils.set_score_cache(None)
+    emotion_utils.set_inference_runner(None)
+    emotion_utils.set_cascade(None)
+    plots = [cue_plot(args.sentences, seed, args.emotional_share) for seed in range(args.plots)]
+    train_texts, held_out = split_plots(plots, 0.2)
+
+    targets = EmotionScores.from_outputs(teacher(train_texts)).matrix
+    started = time.perf_counter()
+    first_stage = HashedNgramClassifier().fit(train_texts, targets)
+    print(f"Distilled from {len(train_texts)} sentences in {time.perf_counter() - started:.2f}s; "
+          f"{len(held_out)} held out\n")
+
+    started = time.perf_counter()
+    teacher_matrix = EmotionScores.from_outputs(teacher(held_out)).matrix
+    print_report(evaluate(first_stage, held_out, teacher_matrix, time.perf_counter() - started))
+
+    # End to end through classify_emotions, on the held-out plots
+    held_out_set = set(held_out)
+    held_out_plots = [plot for plot in plots if plot[0] in held_out_set]
+    baseline_seconds, baseline_labels = classify_seconds(held_out_plots)
+    cascade = Cascade(first_stage, args.threshold)
+    emotion_utils.set_cascade(cascade)
+    cascade_seconds, cascade_labels = classify_seconds(held_out_plots)
+    print(f"\nclassify_emotions at threshold {args.threshold}: {cascade.stats()['skip_rate']:.1%} skipped, "
+          f"label agreement {np.mean(cascade_labels == baseline_labels):.3f}, "
+          f"{baseline_seconds:.2f}s -> {cascade_seconds:.2f}s ({baseline_seconds / cascade_seconds:.2f}x)")
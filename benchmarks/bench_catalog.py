@@ -0,0 +1,62 @@
+# benchmarks/bench_catalog.py
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_pipeline import setup, synthetic_plot
+from catalog_index import CatalogIndex, build_catalog
+from emotion_utils import chunk_text, classify_emotions, generate_insights
+from wiki_fetcher import fetch_movie_plot
+
+
+def live_analysis(title: str) -> None:
+    """What process_analysis does on a catalog miss (minus the UI updates)."""
+    plot_text = fetch_movie_plot(title)
+    analysis_df = classify_emotions(chunk_text(plot_text))
+    generate_insights(analysis_df)
+
+
+def timings_ms(fn, titles: list[str]) -> list[float]:
+    results = []
+    for title in titles:
+        started = time.perf_counter()
+        fn(title)
+        results.append((time.perf_counter() - started) * 1000)
+    return results
+
+
+def summarize(label: str, values: list[float]) -> None:
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(0.95 * len(values)))]
+    print(f"{label:<26} {statistics.median(values):>10.3f} {p95:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Catalog index hits versus live analysis (offline, stub classifier).")
+    parser.add_argument("--films", type=int, default=500, help="Films in the catalog.")
+    parser.add_argument("--sentences", type=int, default=120, help="Sentences per synthetic plot.")
+    parser.add_argument("--samples", type=int, default=100, help="Lookups timed per case.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    corpora = {f"Synthetic Film {i}": synthetic_plot(args.sentences, i) for i in range(args.films)}
+    setup(corpora, "stub")
+    titles = list(corpora)[:args.samples]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, "catalog")
+        summary = build_catalog(list(corpora), directory, fetch_workers=4)
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"Built {summary['indexed']} films in {summary['elapsed_s']:.2f}s, {size / 2**20:.1f} MiB on disk")
+
+        started = time.perf_counter()
+        catalog = CatalogIndex(directory)
+        print(f"Opened in {(time.perf_counter() - started) * 1000:.3f} ms\n")
+
+        print(f"{'case':<26} {'p50 ms':>10} {'p95 ms':>10}")
+        summarize("catalog hit", timings_ms(catalog.get, [title.upper() for title in titles]))
+        summarize("catalog miss", timings_ms(catalog.get, [f"{title} (remake)" for title in titles]))
+        summarize("live analysis (stub model)", timings_ms(live_analysis, titles))
@@ -0,0 +1,70 @@
+# benchmarks/bench_ingest.py
+import argparse
+import bz2
+import logging
+import os
+import re
+import resource
+import tempfile
+from xml.sax.saxutils import escape
+
+from dump_ingest import ingest_dump
+from plot_store import PlotStore
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), "data", "sample_pages_articles.xml")
+SAMPLE_TITLES = ["Inception", "Spirited Away", "Heat", "Heat (1995 film)", "Film noir", "Talk:Inception"]
+
+
+def synthetic_dump(path: str, pages: int, film_share: float, plot_paragraphs: int = 12) -> None:
+    """
+    Writes a bz2 pages-articles dump of `pages` articles, `film_share` of them films with a markup-heavy Plot section.
+    """
+    sample = open(SAMPLE_DUMP, encoding="utf-8").read()
+    header = sample[:sample.index("<page>")]
+    film_text = re.search(r'<text[^>]*>(.*?)</text>', sample, re.DOTALL).group(1)
+    plot = "\n".join(
+        f"In part {i}, [[Dom Cobb|Cobb]] and '''Arthur''' descend another level.&lt;ref&gt;{{{{cite web|url=https://"
+        f"example.org/{i}|title=Source}}}}&lt;/ref&gt; The [[dream]] collapses as the kick arrives." for i in range(plot_paragraphs))
+    film_text = film_text.replace("== Cast ==", f"{plot}\n\n== Cast ==")
+    other_text = escape("'''Topic''' is an article about something else. " * 40 + "\n== History ==\nText.\n[[Category:Topics]]")
+    every = max(1, round(1 / film_share)) if film_share else pages + 1
+    with bz2.open(path, "wt", encoding="utf-8") as f:
+        f.write(header)
+        for i in range(pages):
+            is_film = i % every == 0
+            title = f"Synthetic Film {i} (film)" if is_film else f"Topic {i}"
+            f.write(f"  <page>\n    <title>{title}</title>\n    <ns>0</ns>\n    <id>{i + 1}</id>\n    <revision>\n"
+                    f"      <id>{10**7 + i}</id>\n      <text xml:space=\"preserve\">{film_text if is_film else other_text}"
+                    f"</text>\n    </revision>\n  </page>\n")
+        f.write("</mediawiki>\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline dump ingestion: sample-dump check, then throughput versus workers.")
+    parser.add_argument("--pages", type=int, default=20000, help="Articles in the synthetic dump.")
+    parser.add_argument("--film-share", type=float, default=0.1, help="Share of articles that are films.")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4])
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The sample dump, compressed as the real ones are
+        sample_path = os.path.join(tmp, "sample.xml.bz2")
+        with open(SAMPLE_DUMP, "rb") as src, bz2.open(sample_path, "wb") as dst:
+            dst.write(src.read())
+        store = PlotStore(os.path.join(tmp, "sample.sqlite3"))
+        print(f"Sample dump: {ingest_dump(sample_path, store, workers=2)}")
+        for title in SAMPLE_TITLES:
+            hit = store.lookup(title)
+            print(f"  {title!r:<22} -> {'(not stored)' if hit is None else repr(hit[:70] + '...')}")
+
+        dump_path = os.path.join(tmp, "synthetic.xml.bz2")
+        synthetic_dump(dump_path, args.pages, args.film_share)
+        print(f"\nSynthetic dump: {args.pages} pages, {os.path.getsize(dump_path) / 2**20:.1f} MiB compressed\n")
+        print(f"{'workers':<8} {'pages/s':>10} {'films/s':>10} {'stored':>8} {'peak RSS MiB':>13}")
+        for workers in args.workers:
+            store = PlotStore(os.path.join(tmp, f"synthetic-{workers}.sqlite3"))
+            stats = ingest_dump(dump_path, store, workers=workers)
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(f"{workers:<8} {stats['pages'] / stats['elapsed_s']:>10.0f} {stats['films'] / stats['elapsed_s']:>10.0f} "
+                  f"{stats['stored']:>8} {peak:>13.1f}")
@@ -0,0 +1,51 @@
+# benchmarks/bench_metrics.py
+import argparse
+import logging
+import time
+
+import metrics
+from benchmarks.bench_pipeline import load_corpora, run_pipeline, setup
+
+
+def per_call(iterations: int) -> None:
+    """Cost of one span, counter increment and histogram observation, with collection on and off."""
+    operations = {
+        "span": lambda: metrics.span("bench").__enter__().__exit__(None, None, None),
+        "counter.inc": lambda: metrics.SENTENCES_CLASSIFIED.inc(1),
+        "histogram.observe": lambda: metrics.BATCH_SIZE.observe(8),
+    }
+    for enabled in (False, True):
+        metrics.set_enabled(enabled)
+        for name, operation in operations.items():
+            started = time.perf_counter()
+            for _ in range(iterations):
+                operation()
+            elapsed_us = (time.perf_counter() - started) / iterations * 1e6
+            print(f"{'enabled' if enabled else 'disabled':>9} {name:<18} {elapsed_us:8.3f} us/call")
+
+
+def pipeline_overhead(corpus: str, repeats: int) -> None:
+    """End-to-end stub pipeline time with metrics on vs off."""
+    corpora = load_corpora()
+    setup({corpus: corpora[corpus]}, "stub")
+    run_pipeline(corpus)
+    totals = {}
+    for enabled in (False, True, False, True): # Interleaved to even out drift
+        metrics.set_enabled(enabled)
+        started = time.perf_counter()
+        for _ in range(repeats):
+            run_pipeline(corpus)
+        totals.setdefault(enabled, []).append((time.perf_counter() - started) / repeats)
+    off, on = min(totals[False]), min(totals[True])
+    print(f"Pipeline ({corpus}): {off * 1000:.1f} ms disabled, {on * 1000:.1f} ms enabled ({(on - off) / off:+.2%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Instrumentation overhead of metrics.py.")
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--corpus", default="synthetic-medium")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    per_call(args.iterations)
+    pipeline_overhead(args.corpus, args.repeats)
@@ -0,0 +1,252 @@
+# benchmarks/bench_pipeline.py
+import argparse
+import contextlib
+import glob
+import json
+import logging
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+import zlib
+
+import numpy as np
+
+import emotion_utils
+from emotion_scores import EMOTION_LABELS
+from emotion_utils import chunk_text_spacy, classify_emotions, generate_insights
+from report_generator import build_pdf_report
+from visuals import chart_renderer, create_emotion_distribution_graph
+from wiki_fetcher import LocalBackend, fetch_movie_plot, set_fetch_backend, set_plot_store
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+STAGES = ("fetch", "chunk", "classify", "insights", "graph", "report")
+
+# Synthetic corpora: name -> number of sentences
+SYNTHETIC_SIZES = {"synthetic-small": 25, "synthetic-medium": 250, "synthetic-large": 2500}
+
+WORDS = ("the", "detective", "returns", "to", "a", "city", "where", "her", "brother", "vanished", "years",
+         "ago", "and", "every", "clue", "leads", "back", "into", "old", "fear", "while", "friends", "laugh",
+         "quietly", "under", "rain", "before", "final", "betrayal", "breaks", "them", "apart")
+
+
+class StubEmotionClassifier:
+    """
+    Deterministic, model-free stand-in for the transformers text-classification pipeline.
+
+    Scores are derived from a CRC32 of each sentence, so every run classifies
+    identically. Only the classification stage's model time is missing from
+    the measurements; tokenization, batching and everything around it run as usual.
+    """
+
+    class _Tokenizer:
+        """One token per whitespace-separated word, plus <s> and </s>."""
+
+        def num_special_tokens_to_add(self):
+            return 2
+
+        def __call__(self, texts, truncation=True, max_length=512, add_special_tokens=True, return_offsets_mapping=False):
+            single = isinstance(texts, str)
+            words = [[m.span() for m in re.finditer(r"\S+", text)] for text in ([texts] if single else texts)]
+            specials = 2 if add_special_tokens else 0
+            limit = max_length - specials if truncation else None
+            words = [spans[:limit] for spans in words]
+            encoded = {"input_ids": [[0] * (len(spans) + specials) for spans in words]}
+            if return_offsets_mapping:
+                encoded["offset_mapping"] = words
+            return {key: value[0] for key, value in encoded.items()} if single else encoded
+
+    def __init__(self):
+        self.tokenizer = self._Tokenizer()
+
+    def __call__(self, texts, **kwargs):
+        outputs = []
+        for text in texts:
+            rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+            scores = rng.dirichlet(np.ones(len(EMOTION_LABELS)))
+            ranked = sorted(zip(EMOTION_LABELS, scores.tolist()), key=lambda item: -item[1])
+            outputs.append([{"label": label, "score": score} for label, score in ranked])
+        return outputs
+
+
+def synthetic_plot(n_sentences: int, seed: int) -> str:
+    rng = np.random.default_rng(seed)
+    sentences = []
+    for length in rng.integers(6, 30, size=n_sentences):
+        sentences.append(" ".join(rng.choice(WORDS, size=length)).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def load_corpora() -> dict[str, str]:
+    """Recorded plots from benchmarks/data plus synthetic plots of several sizes, keyed by title."""
+    corpora = {}
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "*_plot.txt"))):
+        name = os.path.basename(path)[:-len("_plot.txt")]
+        with open(path, encoding="utf-8") as f:
+            corpora[f"recorded-{name}"] = f.read().strip()
+    for seed, (name, n_sentences) in enumerate(SYNTHETIC_SIZES.items()):
+        corpora[name] = synthetic_plot(n_sentences, seed)
+    return corpora
+
+
+def setup(corpora: dict[str, str], classifier: str) -> None:
+    """Serves plots from a local Wikipedia stand-in and disables every cache so each run does the full work."""
+    set_fetch_backend(LocalBackend({title: {"sections": {"Plot": text}} for title, text in corpora.items()}))
+    set_plot_store(None)
+    emotion_utils.set_score_cache(None)
+    emotion_utils.set_inference_runner(None)
+    if classifier == "stub":
+        emotion_utils.set_emotion_classifier(StubEmotionClassifier())
+    elif emotion_utils.get_emotion_classifier() is None:
+        raise SystemExit("The emotion model could not be loaded; use --classifier stub to run offline.")
+
+
+def run_pipeline(title: str, probe=None) -> tuple[dict[str, float], int]:
+    """
+    Runs every stage once. Returns seconds per stage and the number of sentences.
+
+    `probe`, if given, is a context-manager factory wrapped around each stage (called with the stage name).
+    """
+    chart_renderer.clear() # Time real renders, not cache hits
+    timings = {}
+
+    def timed(stage, fn, *args):
+        with probe(stage) if probe else contextlib.nullcontext():
+            started = time.perf_counter()
+            result = fn(*args)
+            timings[stage] = time.perf_counter() - started
+        return result
+
+    plot_text = timed("fetch", fetch_movie_plot, title, False)
+    chunks = timed("chunk", chunk_text_spacy, plot_text)
+    analysis_df = timed("classify", classify_emotions, chunks)
+    insights = timed("insights", generate_insights, analysis_df)
+    plot_buffer = timed("graph", create_emotion_distribution_graph, analysis_df)
+    timed("report", build_pdf_report, title, plot_text, analysis_df, insights, plot_buffer)
+    return timings, len(chunks)
+
+
+def peak_memory(title: str) -> dict[str, float]:
+    """Peak traced Python allocations per stage in KiB (a separate run, since tracing slows everything down)."""
+    peaks = {}
+
+    @contextlib.contextmanager
+    def traced(stage):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        yield
+        peaks[stage] = round((tracemalloc.get_traced_memory()[1] - base) / 1024, 1)
+
+    tracemalloc.start()
+    try:
+        run_pipeline(title, traced)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def measure(corpora: dict[str, str], repeats: int) -> dict:
+    results = {}
+    for title in corpora:
+        run_pipeline(title) # Warm-up: model and font loading stay out of the numbers
+        runs = []
+        for _ in range(repeats):
+            timings, n_sentences = run_pipeline(title)
+            runs.append(timings)
+        peaks = peak_memory(title)
+        stages = {}
+        for stage in STAGES:
+            latency = statistics.median(run[stage] for run in runs)
+            stages[stage] = {
+                "latency_ms": round(latency * 1000, 3),
+                "sentences_per_s": round(n_sentences / latency, 1) if latency else None,
+                "peak_kib": peaks.get(stage),
+            }
+        total = statistics.median(sum(run.values()) for run in runs)
+        results[title] = {"sentences": n_sentences, "total_ms": round(total * 1000, 3), "stages": stages}
+    return results
+
+
+def print_results(results: dict) -> None:
+    print(f"{'corpus':<46} {'stage':<9} {'latency ms':>11} {'sentences/s':>12} {'peak KiB':>9}")
+    for title, result in results.items():
+        label = f"{title} ({result['sentences']} sentences)"
+        for stage, values in result["stages"].items():
+            print(f"{label:<46} {stage:<9} {values['latency_ms']:>11.2f} {values['sentences_per_s'] or 0:>12.1f} {values['peak_kib'] or 0:>9.1f}")
+            label = ""
+        print(f"{'':<46} {'total':<9} {result['total_ms']:>11.2f}")
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list[str]:
+    """
+    Lists stages whose latency or peak memory grew by more than `threshold` (a fraction) over the baseline.
+
+    Latency changes smaller than `min_delta_ms` are ignored as timer noise.
+    """
+    regressions = []
+    for title, result in results.items():
+        base_stages = baseline.get("results", {}).get(title, {}).get("stages", {})
+        for stage, values in result["stages"].items():
+            base = base_stages.get(stage)
+            if not base:
+                continue
+            latency, base_latency = values["latency_ms"], base["latency_ms"]
+            if latency > base_latency * (1 + threshold) and latency - base_latency > min_delta_ms:
+                regressions.append(f"{title}/{stage}: latency {base_latency:.2f} -> {latency:.2f} ms")
+            peak, base_peak = values["peak_kib"], base.get("peak_kib")
+            if peak and base_peak and peak > base_peak * (1 + threshold) and peak - base_peak > 64:
+                regressions.append(f"{title}/{stage}: peak memory {base_peak:.1f} -> {peak:.1f} KiB")
+    return regressions
+
+
+def default_baseline(classifier: str) -> str:
+    return os.path.join(BASELINE_DIR, f"pipeline_{classifier}.json")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline per-stage latency, throughput and peak memory of the analysis pipeline.")
+    parser.add_argument("--classifier", choices=("stub", "model"), default="stub",
+                        help="'stub' is deterministic and needs no model; 'model' runs the configured model on CPU.")
+    parser.add_argument("--corpus", nargs="*", help="Only run these corpora (default: all).")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--save-baseline", nargs="?", const="", metavar="PATH",
+                        help="Write the results as a baseline (default: benchmarks/baselines/pipeline_<classifier>.json).")
+    parser.add_argument("--compare", nargs="?", const="", metavar="PATH",
+                        help="Compare against a baseline and exit 1 on regressions.")
+    parser.add_argument("--threshold", type=float, default=0.3, help="Allowed relative slowdown before failing.")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Ignore latency changes smaller than this.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    corpora = load_corpora()
+    if args.corpus:
+        corpora = {title: text for title, text in corpora.items() if title in args.corpus}
+    setup(corpora, args.classifier)
+    results = measure(corpora, args.repeats)
+    print_results(results)
+
+    if args.save_baseline is not None:
+        path = args.save_baseline or default_baseline(args.classifier)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        meta = {"classifier": args.classifier, "repeats": args.repeats,
+                "python": platform.python_version(), "machine": platform.machine()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"Baseline written to {path}")
+
+    if args.compare is not None:
+        path = args.compare or default_baseline(args.classifier)
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"Regressions beyond {args.threshold:.0%} against {path}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {path}.")
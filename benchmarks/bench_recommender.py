@@ -0,0 +1,99 @@
+# benchmarks/bench_recommender.py
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from emotion_scores import EMOTION_LABELS, EmotionScores
+from recommender import DEFAULT_NPROBE, ArcIndex, arc_signatures
+
+# Story archetypes the synthetic films are drawn from, and the points their arcs are defined at
+N_ARCHETYPES = 64
+TEMPLATE_POINTS = 8
+
+
+def synthetic_films(n_films: int, seed: int, templates: np.ndarray, max_scenes: int = 80):
+    """
+    Synthetic films in stacked form: each follows a random archetype's arc, stretched to its length, plus noise.
+
+    Returns:
+        (matrix, offsets) as in arc_analytics.stack_corpus.
+    """
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(3, max_scenes, size=n_films)
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.intp)
+    film = np.repeat(np.arange(n_films), lengths)
+    archetype = rng.integers(0, len(templates), size=n_films)[film]
+    position = (np.arange(offsets[-1]) - offsets[:-1][film]) / np.maximum(lengths[film] - 1, 1) * (TEMPLATE_POINTS - 1)
+    low = np.floor(position).astype(np.intp)
+    high = np.minimum(low + 1, TEMPLATE_POINTS - 1)
+    weight = (position - low)[:, None]
+    logits = (1 - weight) * templates[archetype, low] + weight * templates[archetype, high]
+    logits += rng.normal(0.0, 1.0, size=logits.shape)
+    probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return (probabilities / probabilities.sum(axis=1, keepdims=True)).astype(np.float32), offsets
+
+
+def latency_ms(fn, queries) -> list[float]:
+    times = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        times.append((time.perf_counter() - started) * 1000)
+    return times
+
+
+def percentiles(times: list[float]) -> tuple[float, float]:
+    times = sorted(times)
+    return statistics.median(times), times[min(len(times) - 1, int(0.95 * len(times)))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall and latency of arc-signature search: brute force versus IVF.")
+    parser.add_argument("--films", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="*", default=[1, 2, 4, DEFAULT_NPROBE, 16, 32])
+    parser.add_argument("--inserts", type=int, default=1000, help="Films added one by one after training.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    templates = rng.normal(0.0, 1.5, size=(N_ARCHETYPES, TEMPLATE_POINTS, len(EMOTION_LABELS)))
+
+    index = ArcIndex()
+    signature_seconds = 0.0
+    for start in range(0, args.films, 10000):
+        n = min(10000, args.films - start)
+        matrix, offsets = synthetic_films(n, start, templates)
+        started = time.perf_counter()
+        signatures = arc_signatures(matrix, offsets)
+        signature_seconds += time.perf_counter() - started
+        index.add_signatures([f"Film {start + i}" for i in range(n)], signatures)
+    print(f"{len(index)} films, {index.dim}-dim signatures ({index.stats()['vector_bytes'] / 2**20:.1f} MiB); "
+          f"signatures at {len(index) / signature_seconds:,.0f} films/s")
+
+    started = time.perf_counter()
+    index.train()
+    print(f"IVF trained in {time.perf_counter() - started:.2f}s ({len(index.centroids)} lists)\n")
+
+    matrix, offsets = synthetic_films(args.queries, 10**6, templates)
+    queries = arc_signatures(matrix, offsets)
+    exact = [index.search_signature(q, args.k, nprobe=None) for q in queries]
+
+    print(f"{'search':<16} {'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(args.k):>10}")
+    p50, p95 = percentiles(latency_ms(lambda q: index.search_signature(q, args.k, nprobe=None), queries))
+    print(f"{'brute force':<16} {p50:>8.3f} {p95:>8.3f} {1.0:>10.3f}")
+    for nprobe in args.nprobe:
+        p50, p95 = percentiles(latency_ms(lambda q: index.search_signature(q, args.k, nprobe=nprobe), queries))
+        hits = sum(len({t for t, _ in index.search_signature(q, args.k, nprobe=nprobe)} & {t for t, _ in truth})
+                   for q, truth in zip(queries, exact))
+        print(f"{'IVF nprobe=' + str(nprobe):<16} {p50:>8.3f} {p95:>8.3f} {hits / (args.k * len(queries)):>10.3f}")
+
+    matrix, offsets = synthetic_films(args.inserts, 2 * 10**6, templates)
+    films = [EmotionScores(matrix[offsets[i]:offsets[i + 1]]) for i in range(args.inserts)]
+    started = time.perf_counter()
+    for i, film in enumerate(films):
+        index.add(f"New film {i}", film)
+    per_insert = (time.perf_counter() - started) / max(1, args.inserts) * 1e6
+    print(f"\nIncremental insert (signature + IVF assignment): {per_insert:.1f} us per film; index now {len(index)} films")
@@ -0,0 +1,80 @@
+# benchmarks/bench_render.py
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from emotion_scores import EMOTION_LABELS
+from visuals import ChartRenderer, ChartStyle
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def random_counts(rng: np.random.Generator) -> pd.Series:
+    values = rng.integers(0, 50, size=len(EMOTION_LABELS))
+    return pd.Series(values, index=EMOTION_LABELS).sort_values(ascending=False)
+
+
+def stress(threads: int, renders: int, seed: int = 0) -> None:
+    """
+    Renders many different charts concurrently with the cache disabled and checks
+    each result byte-for-byte against a serial render of the same counts, so any
+    cross-thread interference (e.g. shared pyplot state) shows up as a mismatch.
+    """
+    rng = np.random.default_rng(seed)
+    inputs = [random_counts(rng) for _ in range(renders)]
+    renderer = ChartRenderer(cache_size=0)
+    expected = [renderer.render_counts(counts) for counts in inputs]
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        actual = list(pool.map(renderer.render_counts, inputs))
+
+    corrupt = sum(1 for data in actual if not data.startswith(PNG_SIGNATURE))
+    mismatched = sum(1 for a, e in zip(actual, expected) if a != e)
+    status = "OK" if not corrupt and not mismatched else "FAILED"
+    print(f"Stress ({threads} threads, {renders} renders): {status} - {corrupt} corrupt, {mismatched} mismatched")
+    if status != "OK":
+        raise SystemExit(1)
+
+
+def throughput(renders: int, threads: int, seed: int = 1) -> None:
+    """Renders per second: cold (cache off, serial and threaded), warm (cache hits), PNG vs SVG."""
+    rng = np.random.default_rng(seed)
+    inputs = [random_counts(rng) for _ in range(renders)]
+
+    def timed(label, fn):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        print(f"{label:>28}: {renders / elapsed:8.1f} renders/s")
+
+    cold = ChartRenderer(cache_size=0)
+    timed("cold png, serial", lambda: [cold.render_counts(c) for c in inputs])
+    def threaded():
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(cold.render_counts, inputs))
+
+    timed(f"cold png, {threads} threads", threaded)
+    timed("cold svg, serial", lambda: [cold.render_counts(c, fmt="svg") for c in inputs])
+    timed("cold png @200dpi, serial", lambda: [cold.render_counts(c, dpi=200) for c in inputs])
+
+    warm = ChartRenderer(cache_size=renders)
+    for counts in inputs:
+        warm.render_counts(counts)
+    timed("warm png (cache hits)", lambda: [warm.render_counts(c) for c in inputs])
+
+    compact = ChartStyle(figsize=(6, 4), show_counts=False)
+    timed("cold png, compact style", lambda: [cold.render_counts(c, style=compact) for c in inputs])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrency stress test and renders/s benchmark for ChartRenderer.")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--renders", type=int, default=64)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    stress(args.threads, args.renders)
+    throughput(args.renders, args.threads)
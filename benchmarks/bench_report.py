@@ -0,0 +1,73 @@
+# benchmarks/bench_report.py
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from emotion_scores import EMOTION_LABELS, EmotionScores
+from report_generator import PDF, build_pdf_report
+from visuals import create_emotion_distribution_graph, create_emotion_timeline_graph
+
+SENTENCE_WORDS = ("the", "crew", "descends", "into", "a", "dream", "where", "memories", "collapse",
+                  "and", "old", "guilt", "returns", "as", "time", "slows", "down")
+
+
+def synthetic_analysis(n_scenes: int, seed: int = 0) -> pd.DataFrame:
+    """Analysis table with realistic chunk lengths (8-60 words) and an attached score matrix."""
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(8, 60, size=n_scenes)
+    chunks = [" ".join(rng.choice(SENTENCE_WORDS, size=length)).capitalize() + "." for length in lengths]
+    matrix = rng.dirichlet(np.ones(len(EMOTION_LABELS)), size=n_scenes)
+    return EmotionScores(matrix).to_frame(chunks)
+
+
+def legacy_scene_table(analysis_df: pd.DataFrame) -> bytes:
+    """The previous per-row layout (four multi_cell + set_xy calls per row, manual page breaks), for comparison."""
+    pdf = PDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    col_widths = {'Scene': 15, 'Emotion': 25, 'Score': 15, 'Chunk': pdf.w - pdf.l_margin - pdf.r_margin - 15 - 25 - 15 - 5}
+    pdf.set_font('Helvetica', '', 8)
+    for scene, emotion, score, chunk in zip(analysis_df['Scene'], analysis_df['Emotion'], analysis_df['Score'], analysis_df['Chunk']):
+        current_y = pdf.get_y()
+        pdf.multi_cell(col_widths['Scene'], 5, str(scene), 1, 'C')
+        pdf.set_xy(pdf.l_margin + col_widths['Scene'], current_y)
+        pdf.multi_cell(col_widths['Emotion'], 5, str(emotion), 1, 'C')
+        pdf.set_xy(pdf.l_margin + col_widths['Scene'] + col_widths['Emotion'], current_y)
+        pdf.multi_cell(col_widths['Score'], 5, str(score), 1, 'C')
+        pdf.set_xy(pdf.l_margin + col_widths['Scene'] + col_widths['Emotion'] + col_widths['Score'], current_y)
+        pdf.multi_cell(col_widths['Chunk'], 5, str(chunk), 1, 'L')
+        if pdf.get_y() > pdf.h - pdf.b_margin - 15:
+            pdf.add_page()
+    return bytes(pdf.output())
+
+
+def run(sizes: list[int], legacy: bool) -> None:
+    print(f"{'rows':>7} {'report s':>9} {'rows/s':>9} {'pages':>6} {'KiB':>8}" + (f" {'legacy table s':>15}" if legacy else ""))
+    for n_scenes in sizes:
+        analysis_df = synthetic_analysis(n_scenes)
+        plot_buffer = create_emotion_distribution_graph(analysis_df)
+        timeline_buffer = create_emotion_timeline_graph(analysis_df)
+        insights = "Joy dominates the opening; fear builds towards the climax."
+
+        started = time.perf_counter()
+        pdf_bytes = build_pdf_report("Benchmark", "Synthetic plot.", analysis_df, insights, plot_buffer, timeline_buffer)
+        elapsed = time.perf_counter() - started
+        pages = pdf_bytes.count(b"/Type /Page\n") or pdf_bytes.count(b"/Type /Page")
+        line = f"{n_scenes:>7} {elapsed:>9.2f} {n_scenes / elapsed:>9.0f} {pages:>6} {len(pdf_bytes) / 1024:>8.1f}"
+        if legacy:
+            started = time.perf_counter()
+            legacy_scene_table(analysis_df)
+            line += f" {time.perf_counter() - started:>15.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF report build time for 100 to 10,000 scene rows.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 10000])
+    parser.add_argument("--legacy", action="store_true", help="Also time the previous per-row table layout.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    run(args.sizes, args.legacy)
@@ -0,0 +1,76 @@
+# benchmarks/bench_segmentation.py
+import argparse
+import glob
+import logging
+import os
+import time
+
+from emotion_utils import _nltk_segments
+from segmentation import SEGMENTER_MODES, get_segmenter, segment_texts
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+def load_plots(repeat: int) -> list[str]:
+    """Loads the recorded plot texts in benchmarks/data, repeated to build a larger corpus."""
+    plots = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "*_plot.txt"))):
+        with open(path, encoding="utf-8") as f:
+            plots.append(f.read().strip())
+    return plots * repeat
+
+
+def boundary_f1(reference: list[set[int]], candidate: list[set[int]]) -> float:
+    """F1 of sentence end offsets against a reference segmentation, pooled over all documents."""
+    true_pos = sum(len(r & c) for r, c in zip(reference, candidate))
+    ref_total = sum(len(r) for r in reference)
+    cand_total = sum(len(c) for c in candidate)
+    if not ref_total or not cand_total:
+        return 0.0
+    precision, recall = true_pos / cand_total, true_pos / ref_total
+    return round(2 * precision * recall / (precision + recall), 4) if true_pos else 0.0
+
+
+def run(repeat: int, n_process: int) -> None:
+    plots = load_plots(repeat)
+    total_chars = sum(len(p) for p in plots)
+    print(f"Corpus: {len(plots)} documents, {total_chars} characters")
+
+    results = {}
+    for mode in SEGMENTER_MODES:
+        nlp = get_segmenter(mode) # Load outside the timed region
+        if nlp is None:
+            print(f"{mode:>12}: unavailable")
+            continue
+        # The legacy path: one nlp() call per document
+        if mode == "full":
+            started = time.perf_counter()
+            segmented = segment_texts(plots, mode=mode, n_process=1, batch_size=1)
+        else:
+            started = time.perf_counter()
+            segmented = segment_texts(plots, mode=mode, n_process=n_process)
+        results[mode] = (time.perf_counter() - started, segmented)
+
+    # chunk_text_nltk plus offset recovery, so boundaries can be compared
+    started = time.perf_counter()
+    nltk_segmented = [_nltk_segments(plot) for plot in plots]
+    results["nltk"] = (time.perf_counter() - started, nltk_segmented)
+
+    reference_mode = "full" if "full" in results else next(iter(results))
+    reference = [{s.end for s in doc} for doc in results[reference_mode][1]]
+    print(f"Boundary agreement is F1 of sentence end offsets against '{reference_mode}'.\n")
+    print(f"{'mode':>12} {'seconds':>9} {'docs/s':>9} {'chars/s':>11} {'sentences':>10} {'F1':>7}")
+    for mode, (elapsed, segmented) in results.items():
+        ends = [{s.end for s in doc} for doc in segmented]
+        sentences = sum(len(doc) for doc in segmented)
+        print(f"{mode:>12} {elapsed:9.3f} {len(plots) / elapsed:9.1f} {total_chars / elapsed:11.0f} "
+              f"{sentences:10d} {boundary_f1(reference, ends):7.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sentence segmentation modes on recorded plot text.")
+    parser.add_argument("--repeat", type=int, default=50, help="How many times to repeat the recorded corpus.")
+    parser.add_argument("--n-process", type=int, default=2, help="Processes for nlp.pipe in the fast modes.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    run(args.repeat, args.n_process)
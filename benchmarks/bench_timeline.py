@@ -0,0 +1,41 @@
+# benchmarks/bench_timeline.py
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from emotion_scores import EMOTION_LABELS, EmotionScores
+from visuals import DEFAULT_TIMELINE_POINTS, ChartRenderer
+
+
+def synthetic_scores(n_scenes: int, seed: int = 0) -> EmotionScores:
+    """Smoothly drifting per-scene emotion probabilities, like a long screenplay."""
+    rng = np.random.default_rng(seed)
+    logits = np.cumsum(rng.normal(scale=0.3, size=(n_scenes, len(EMOTION_LABELS))), axis=0)
+    probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return EmotionScores(probabilities / probabilities.sum(axis=1, keepdims=True))
+
+
+def run(sizes: list[int], repeats: int, max_points: int) -> None:
+    """Timeline render time and PNG size per scene count; both should flatten once scenes exceed max_points."""
+    renderer = ChartRenderer(cache_size=0)
+    print(f"{'scenes':>8} {'render ms':>10} {'png KiB':>8}")
+    for n_scenes in sizes:
+        scores = synthetic_scores(n_scenes)
+        renderer.render_timeline(scores, max_points=max_points) # Warm matplotlib font caches
+        started = time.perf_counter()
+        for _ in range(repeats):
+            data = renderer.render_timeline(scores, max_points=max_points)
+        elapsed_ms = (time.perf_counter() - started) / repeats * 1000
+        print(f"{n_scenes:>8} {elapsed_ms:>10.1f} {len(data) / 1024:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render time and PNG size of the scene timeline as scene count grows.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--max-points", type=int, default=DEFAULT_TIMELINE_POINTS)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    run(args.sizes, args.repeats, args.max_points)
@@ -0,0 +1,77 @@
+# benchmarks/bench_windowing.py
+import argparse
+import logging
+import time
+
+import numpy as np
+
+import emotion_utils
+from batching import MODEL_MAX_LENGTH
+from benchmarks.bench_pipeline import WORDS, load_corpora, setup
+from emotion_utils import chunk_text_spacy_offsets, classify_emotions, get_batcher, get_emotion_classifier
+from scene_windows import DEFAULT_SCENE_TOKENS, DEFAULT_WINDOW_OVERLAP, build_scenes, special_token_count, token_counts
+
+
+def fragmented_plot(n_sentences: int, seed: int) -> str:
+    """Mostly short fragments ('He runs.') with an occasional run-on sentence past the model limit."""
+    rng = np.random.default_rng(seed)
+    sentences = []
+    for i in range(n_sentences):
+        length = int(rng.integers(700, 1200)) if i % 50 == 25 else int(rng.integers(1, 5))
+        sentences.append(" ".join(rng.choice(WORDS, size=length)).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def classify_run(chunks) -> dict:
+    """Classifies once with a fresh batcher and returns forward passes, tokens and wall time."""
+    batcher = get_batcher()
+    batcher.reset_stats()
+    started = time.perf_counter()
+    analysis_df = classify_emotions(chunks)
+    elapsed = time.perf_counter() - started
+    stats = batcher.stats()
+    return {"rows": len(analysis_df), "texts": stats["sentences"], "forward_passes": stats["batches"],
+            "padded_tokens": stats["padded_tokens"], "ms": elapsed * 1000}
+
+
+def run(corpora: dict[str, str], target_tokens: int, overlap: int) -> None:
+    tokenizer = get_emotion_classifier().tokenizer
+    max_tokens = MODEL_MAX_LENGTH - special_token_count(tokenizer)
+    print(f"Scene target {target_tokens} tokens, window overlap {overlap}, model limit {max_tokens} tokens\n")
+    header = f"{'corpus':<30} {'mode':<9} {'rows':>6} {'texts':>6} {'passes':>7} {'padded tok':>11} {'truncated':>10} {'ms':>9}"
+    print(header)
+    for title, text in corpora.items():
+        segments = chunk_text_spacy_offsets(text)
+        counts = token_counts(tokenizer, [segment.text for segment in segments])
+        truncated = sum(1 for n in counts if n > max_tokens)
+
+        sentence = classify_run([segment.text for segment in segments])
+        scenes = build_scenes(text, segments, tokenizer, target_tokens, overlap)
+        scene = classify_run(scenes)
+
+        for mode, result, lost in (("sentence", sentence, truncated), ("scene", scene, 0)):
+            print(f"{title if mode == 'sentence' else '':<30} {mode:<9} {result['rows']:>6} {result['texts']:>6} "
+                  f"{result['forward_passes']:>7} {result['padded_tokens']:>11} {lost:>10} {result['ms']:>9.1f}")
+        saved = 1 - scene["texts"] / sentence["texts"] if sentence["texts"] else 0.0
+        print(f"{'':<30} scene windowing: {saved:.0%} fewer texts classified, "
+              f"{sentence['forward_passes'] - scene['forward_passes']} fewer forward passes\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forward passes and tokens classified per chunking mode (sentence vs scene windows).")
+    parser.add_argument("--classifier", choices=("stub", "model"), default="stub",
+                        help="'stub' counts whitespace words as tokens; 'model' uses the real tokenizer and model.")
+    parser.add_argument("--target-tokens", type=int, default=DEFAULT_SCENE_TOKENS)
+    parser.add_argument("--overlap", type=int, default=DEFAULT_WINDOW_OVERLAP)
+    parser.add_argument("--corpus", nargs="*", help="Only run these corpora (default: all).")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    corpora = load_corpora()
+    corpora["synthetic-fragments"] = fragmented_plot(1000, seed=7)
+    if args.corpus:
+        corpora = {title: text for title, text in corpora.items() if title in args.corpus}
+    setup(corpora, args.classifier)
+    # Forward passes are counted by the in-process batcher, so the score cache stays off (setup disables it)
+    emotion_utils.set_inference_runner(None)
+    run(corpora, args.target_tokens, args.overlap)
@@ -0,0 +1,113 @@
+# benchmarks/bench_workers.py
+import argparse
+import logging
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import emotion_utils
+from benchmarks.bench_pipeline import StubEmotionClassifier, synthetic_plot
+from worker_pool import available_cores, create_emotion_pool
+
+
+class WeightedStubClassifier(StubEmotionClassifier):
+    """
+    The stub classifier plus a block of read-only 'weights', to show how memory scales with workers.
+
+    Every call reads the whole block, as a forward pass reads every layer,
+    so any page a worker copied on write would show up in its private memory.
+    """
+
+    def __init__(self, weights_mib: int):
+        super().__init__()
+        self.weights = np.random.default_rng(0).random(weights_mib * 1024 * 1024 // 8)
+
+    def __call__(self, texts, **kwargs):
+        self.checksum = float(self.weights[::4096].sum())
+        return super().__call__(texts, **kwargs)
+
+
+def memory_kib(pid: int) -> dict[str, int]:
+    """Rss, Pss and private (Uss) memory of a process in KiB, from /proc/<pid>/smaps_rollup (Linux)."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                    values[key] = int(rest.split()[0])
+    except OSError:
+        return {}
+    return {"rss": values["Rss"], "pss": values["Pss"], "uss": values["Private_Clean"] + values["Private_Dirty"]}
+
+
+def run_load(runner, plots: list[list[str]], clients: int) -> tuple[float, list[float]]:
+    """Classifies every plot from `clients` concurrent threads. Returns wall time and per-request latencies."""
+    def request(sentences):
+        started = time.perf_counter()
+        runner(sentences)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        latencies = list(executor.map(request, plots))
+    return time.perf_counter() - started, latencies
+
+
+def print_row(label: str, sentences: int, wall: float, latencies: list[float], memory: dict[str, int] | None) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    row = f"{label:<12} {sentences / wall:>13.1f} {statistics.median(latencies) * 1000:>9.1f} {p95 * 1000:>9.1f}"
+    if memory:
+        row += f" {memory['rss'] / 1024:>14.1f} {memory['pss'] / 1024:>14.1f} {memory['uss'] / 1024:>15.1f}"
+    print(row)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inference throughput and memory versus number of worker processes.")
+    parser.add_argument("--classifier", choices=("stub", "model"), default="stub",
+                        help="'stub' is model-free (with --weights-mib of read-only ballast); 'model' uses the configured model.")
+    parser.add_argument("--workers", type=int, nargs="*", help="Worker counts to try (default: 1, 2, 4 ... up to the core count).")
+    parser.add_argument("--weights-mib", type=int, default=256, help="Size of the stub's read-only weights.")
+    parser.add_argument("--requests", type=int, default=32, help="Plots classified per configuration.")
+    parser.add_argument("--sentences", type=int, default=250, help="Sentences per plot.")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent requests.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    cores = available_cores()
+    worker_counts = args.workers or sorted({1, 2, 4, *[n for n in (8, 16, 32) if n <= cores], cores})
+    emotion_utils.set_score_cache(None) # Every request runs the model
+    if args.classifier == "stub":
+        emotion_utils.set_emotion_classifier(WeightedStubClassifier(args.weights_mib))
+    plots = [synthetic_plot(args.sentences, seed).replace(". ", ".\n").split("\n") for seed in range(args.requests)]
+    total_sentences = sum(len(plot) for plot in plots)
+    print(f"{cores} cores, {args.requests} plots x {args.sentences} sentences, {args.clients} concurrent clients\n")
+    print(f"{'workers':<12} {'sentences/s':>13} {'p50 ms':>9} {'p95 ms':>9} {'workers RSS MiB':>14} "
+          f"{'workers PSS MiB':>14} {'private MiB/wkr':>15}")
+
+    # Baseline: every client thread shares the in-process model (and the GIL)
+    emotion_utils.set_inference_runner(None)
+    wall, latencies = run_load(emotion_utils.get_batcher(), plots, args.clients)
+    print_row("in-process", total_sentences, wall, latencies, None)
+
+    for workers in worker_counts:
+        pool = create_emotion_pool(workers)
+        if pool is None:
+            raise SystemExit("The emotion model could not be loaded; use --classifier stub to run offline.")
+        pool(plots[0]) # Workers finish their warm-up before the clock starts
+        wall, latencies = run_load(pool, plots, args.clients)
+        usage = [memory_kib(pid) for pid in pool.pids()]
+        memory = {key: sum(u[key] for u in usage) for key in ("rss", "pss", "uss")} if all(usage) else None
+        if memory:
+            memory["uss"] = memory["uss"] / workers
+        print_row(f"{workers} x {pool.threads} thr", total_sentences, wall, latencies, memory)
+        pool.stop()
+
+    parent = memory_kib(os.getpid())
+    if parent:
+        print(f"\nParent process RSS {parent['rss'] / 1024:.1f} MiB. A worker's private memory is what it copied or "
+              f"allocated itself; the model pages are counted once in PSS across all sharers.")
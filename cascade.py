@@ -0,0 +1,323 @@
+# cascade.py
+import argparse
+import json
+import logging
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+import metrics
+from emotion_scores import EMOTION_LABELS
+
+logging.basicConfig(level=logging.INFO)
+
+# Cascade mode: a cheap first-stage model answers the sentences it is confident about, the transformer the rest
+CASCADE_ENABLED = os.environ.get("CINEMOOD_CASCADE") == "1"
+DEFAULT_CASCADE_PATH = os.environ.get("CINEMOOD_CASCADE_MODEL", os.path.join(".cache", "cascade.npz"))
+DEFAULT_THRESHOLD = float(os.environ.get("CINEMOOD_CASCADE_THRESHOLD", "0.9"))
+DEFAULT_HASH_BITS = 18
+REPORT_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 0.99)
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+
+class HashedNgramClassifier:
+    """
+    Multinomial logistic regression over hashed word unigrams and bigrams.
+
+    Trained by distillation: the targets are the transformer's full score vectors,
+    not just its labels, so the predicted probabilities track its confidence.
+
+    Args:
+        hash_bits: log2 of the number of feature buckets.
+    """
+
+    def __init__(self, hash_bits: int = DEFAULT_HASH_BITS):
+        self.hash_bits = hash_bits
+        self.weights = np.zeros((1 << hash_bits, len(EMOTION_LABELS)), dtype=np.float32)
+        self.bias = np.zeros(len(EMOTION_LABELS), dtype=np.float32)
+
+    def features(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Hashed features in CSR form: (indices, values, offsets), with texts[i] at offsets[i]:offsets[i + 1].
+
+        Every text has at least a start-of-sentence feature, and rows are L2-normalized.
+        """
+        mask = (1 << self.hash_bits) - 1
+        indices, values, offsets = [], [], [0]
+        for text in texts:
+            tokens = ["<s>", *_TOKEN.findall(text.lower())]
+            grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            indices.extend(zlib.crc32(gram.encode("utf-8")) & mask for gram in grams)
+            values.extend([len(grams) ** -0.5] * len(grams))
+            offsets.append(len(indices))
+        return np.asarray(indices, dtype=np.intp), np.asarray(values, dtype=np.float32), np.asarray(offsets, dtype=np.intp)
+
+    def _logits(self, indices: np.ndarray, values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        return np.add.reduceat(self.weights[indices] * values[:, None], offsets[:-1], axis=0) + self.bias
+
+    def predict_proba(self, texts: list[str]) -> np.ndarray:
+        """(texts x emotions) float32 probabilities, columns in EMOTION_LABELS order."""
+        if not texts:
+            return np.zeros((0, len(EMOTION_LABELS)), dtype=np.float32)
+        return _softmax(self._logits(*self.features(texts)))
+
+    def fit(self, texts: list[str], targets: np.ndarray, epochs: int = 8, learning_rate: float = 0.5,
+            batch_size: int = 256, l2: float = 1e-6, seed: int = 0) -> "HashedNgramClassifier":
+        """
+        Trains on soft targets with mini-batch AdaGrad (updates touch only the rows a batch uses).
+
+        Args:
+            texts: Training sentences.
+            targets: (texts x emotions) teacher probabilities.
+        """
+        targets = np.asarray(targets, dtype=np.float32)
+        indices, values, offsets = self.features(texts)
+        lengths = np.diff(offsets)
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        weight_sq = np.full(self.weights.shape[0], 1e-8, dtype=np.float32)
+        bias_sq = np.full_like(self.bias, 1e-8)
+        rng = np.random.default_rng(seed)
+        for epoch in range(epochs):
+            order = rng.permutation(len(texts))
+            loss = 0.0
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                nnz = np.concatenate([np.arange(offsets[i], offsets[i + 1]) for i in batch])
+                batch_offsets = np.concatenate([[0], np.cumsum(lengths[batch])])
+                probabilities = _softmax(self._logits(indices[nnz], values[nnz], batch_offsets))
+                loss -= float(np.sum(targets[batch] * np.log(probabilities + 1e-9)))
+                error = (probabilities - targets[batch]) / len(batch)
+                # Gradient rows for the feature buckets this batch touched
+                position = np.empty(len(texts), dtype=np.intp)
+                position[batch] = np.arange(len(batch))
+                touched, inverse = np.unique(indices[nnz], return_inverse=True)
+                grad = np.zeros((len(touched), self.weights.shape[1]), dtype=np.float32)
+                np.add.at(grad, inverse, values[nnz, None] * error[position[rows[nnz]]])
+                grad += l2 * self.weights[touched]
+                weight_sq[touched] += np.mean(grad * grad, axis=1)
+                self.weights[touched] -= learning_rate * grad / np.sqrt(weight_sq[touched])[:, None]
+                bias_grad = error.sum(axis=0)
+                bias_sq += bias_grad * bias_grad
+                self.bias -= learning_rate * bias_grad / np.sqrt(bias_sq)
+            logging.info(f"Distillation epoch {epoch + 1}/{epochs}: cross-entropy {loss / max(1, len(texts)):.4f}")
+        return self
+
+    def save(self, path: str, model_name: str, revision: str) -> None:
+        """Saves the weights (float16) with the teacher model they were distilled from."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        meta = {"model": model_name, "revision": revision, "hash_bits": self.hash_bits, "labels": list(EMOTION_LABELS)}
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, weights=self.weights.astype(np.float16), bias=self.bias,
+                            meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> tuple["HashedNgramClassifier", dict]:
+        """Returns the classifier and its metadata (teacher model and revision)."""
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            classifier = cls(meta["hash_bits"])
+            classifier.weights = data["weights"].astype(np.float32)
+            classifier.bias = data["bias"].astype(np.float32)
+        return classifier, meta
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return (exp / exp.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+def to_outputs(probabilities: np.ndarray) -> list:
+    """Probability rows in the pipeline's output format (one ranked list of {'label', 'score'} dicts per text)."""
+    outputs = []
+    for row in probabilities.tolist():
+        ranked = sorted(zip(EMOTION_LABELS, row), key=lambda item: -item[1])
+        outputs.append([{"label": label, "score": score} for label, score in ranked])
+    return outputs
+
+
+class Cascade:
+    """
+    Confidence-gated two-stage classifier.
+
+    The first stage scores every text; texts whose top probability reaches the threshold
+    keep its scores, the rest are escalated to the transformer.
+
+    Args:
+        first_stage: A HashedNgramClassifier distilled from the transformer.
+        threshold: Minimum first-stage confidence for a text to skip the transformer (above 1 disables skipping).
+    """
+
+    def __init__(self, first_stage: HashedNgramClassifier, threshold: float = DEFAULT_THRESHOLD):
+        self.first_stage = first_stage
+        self.threshold = threshold
+        self.sentences = 0
+        self.skipped = 0
+
+    def __call__(self, texts: list[str], infer) -> tuple[list, np.ndarray]:
+        """
+        Scores texts, escalating the uncertain ones through `infer` (the transformer runner).
+
+        Returns:
+            (outputs, escalated): pipeline-format outputs in input order, and a boolean
+            array marking the texts the transformer scored.
+        """
+        with metrics.span("cascade"):
+            probabilities = self.first_stage.predict_proba(texts)
+        escalated = probabilities.max(axis=1) < self.threshold
+        outputs = to_outputs(probabilities)
+        hard = np.flatnonzero(escalated)
+        if len(hard):
+            for i, output in zip(hard, infer([texts[i] for i in hard])):
+                outputs[i] = output
+        self.sentences += len(texts)
+        self.skipped += len(texts) - len(hard)
+        metrics.CASCADE_SENTENCES.inc(len(texts) - len(hard), "first_stage")
+        metrics.CASCADE_SENTENCES.inc(len(hard), "model")
+        return outputs, escalated
+
+    def stats(self) -> dict:
+        return {"threshold": self.threshold, "sentences": self.sentences, "skipped": self.skipped,
+                "skip_rate": round(self.skipped / self.sentences, 4) if self.sentences else 0.0}
+
+
+def load_cascade(model_name: str, revision: str, path: str = DEFAULT_CASCADE_PATH,
+                 threshold: float = DEFAULT_THRESHOLD) -> Cascade | None:
+    """
+    Loads the distilled first stage, or returns None (after logging) if it is missing
+    or was distilled from a different model or revision.
+    """
+    if not os.path.exists(path):
+        logging.warning(f"Cascade model '{path}' not found; run 'python cascade.py train'. Using the transformer only.")
+        return None
+    try:
+        first_stage, meta = HashedNgramClassifier.load(path)
+    except Exception as e:
+        logging.error(f"Failed to load cascade model '{path}', using the transformer only: {e}")
+        return None
+    if (meta.get("model"), meta.get("revision")) != (model_name, revision):
+        logging.warning(f"Cascade model '{path}' was distilled from {meta.get('model')}@{meta.get('revision')}, "
+                        f"not {model_name}@{revision}; retrain it. Using the transformer only.")
+        return None
+    logging.info(f"Cascade enabled: first stage '{path}', confidence threshold {threshold}.")
+    return Cascade(first_stage, threshold)
+
+
+def evaluate(first_stage: HashedNgramClassifier, texts: list[str], teacher: np.ndarray, model_seconds: float,
+             thresholds=REPORT_THRESHOLDS) -> list[dict]:
+    """
+    Held-out report per threshold: share of texts skipped, label agreement with the transformer
+    (overall and on the skipped texts) and estimated speedup.
+
+    The speedup assumes transformer time proportional to the texts it scores:
+    model_seconds / (first-stage seconds + escalated share x model_seconds).
+    """
+    started = time.perf_counter()
+    probabilities = first_stage.predict_proba(texts)
+    first_seconds = time.perf_counter() - started
+    teacher_labels = teacher.argmax(axis=1)
+    agrees = probabilities.argmax(axis=1) == teacher_labels
+    confidence = probabilities.max(axis=1)
+    rows = []
+    for threshold in thresholds:
+        skipped = confidence >= threshold
+        share = float(skipped.mean()) if len(texts) else 0.0
+        rows.append({
+            "threshold": threshold,
+            "skipped": round(share, 4),
+            "agreement": round(float(np.mean(np.where(skipped, agrees, True))) if len(texts) else 1.0, 4),
+            "skipped_agreement": round(float(agrees[skipped].mean()), 4) if skipped.any() else None,
+            "speedup": round(model_seconds / (first_seconds + (1 - share) * model_seconds), 2) if model_seconds else None,
+        })
+    return rows
+
+
+def print_report(rows: list[dict]) -> None:
+    print(f"{'threshold':>9} {'skipped':>8} {'agreement':>10} {'on skipped':>11} {'est. speedup':>13}")
+    for row in rows:
+        on_skipped = "-" if row["skipped_agreement"] is None else f"{row['skipped_agreement']:.3f}"
+        speedup = "-" if row["speedup"] is None else f"{row['speedup']:.2f}x"
+        print(f"{row['threshold']:>9.2f} {row['skipped']:>8.1%} {row['agreement']:>10.3f} {on_skipped:>11} {speedup:>13}")
+
+
+def collect_texts(items: list[str], plot_files: bool = False, fetch_workers: int = 8) -> list[list[str]]:
+    """The texts the model would classify for each plot (sentences, or scene windows), one list per plot."""
+    from batch_runner import iter_fetched
+    from scene_windows import Scene, window_texts
+    plots = []
+    for fetched in iter_fetched(items, plot_files, fetch_workers):
+        chunks = fetched["chunks"]
+        if chunks:
+            plots.append(window_texts(chunks) if isinstance(chunks[0], Scene) else list(chunks))
+    return plots
+
+
+def split_plots(plots: list[list[str]], holdout: float, seed: int = 0) -> tuple[list[str], list[str]]:
+    """Splits by plot, so held-out sentences come from films the first stage never saw."""
+    order = np.random.default_rng(seed).permutation(len(plots))
+    n_holdout = max(1, round(holdout * len(plots))) if holdout > 0 and len(plots) > 1 else 0
+    held_out = [text for i in order[:n_holdout] for text in plots[i]]
+    train = [text for i in order[n_holdout:] for text in plots[i]]
+    return train, held_out
+
+
+def teacher_scores(texts: list[str]) -> tuple[np.ndarray, float]:
+    """Transformer scores for texts, bypassing the score cache and the cascade, and the seconds they took."""
+    import emotion_utils
+    from emotion_scores import EmotionScores
+    started = time.perf_counter()
+    outputs = emotion_utils.get_batcher()(texts) if texts else []
+    return EmotionScores.from_outputs(outputs).matrix, time.perf_counter() - started
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distil and evaluate the first-stage model of the classification cascade.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train = subparsers.add_parser("train", help="Distil the first stage from the transformer's scores on a corpus.")
+    report = subparsers.add_parser("report", help="Skip rate, agreement and speedup of a saved first stage.")
+    for sub in (train, report):
+        sub.add_argument("input", help="Text file with one movie title (or plot file path) per line.")
+        sub.add_argument("--plot-files", action="store_true", help="Treat input lines as paths to plot text files.")
+        sub.add_argument("--model", default=DEFAULT_CASCADE_PATH, help="First-stage model file.")
+        sub.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Threshold for the measured run.")
+    train.add_argument("--holdout", type=float, default=0.2, help="Share of plots kept out of training for the report.")
+    train.add_argument("--hash-bits", type=int, default=DEFAULT_HASH_BITS)
+    train.add_argument("--epochs", type=int, default=8)
+    args = parser.parse_args()
+
+    import emotion_utils
+    from batch_runner import read_inputs
+    from emotion_scores import EmotionScores
+    emotion_utils.set_cascade(None) # Teacher scores must come from the transformer alone
+    if emotion_utils.get_emotion_classifier() is None:
+        raise SystemExit("The emotion model could not be loaded.")
+    plots = collect_texts(read_inputs(args.input), args.plot_files)
+
+    if args.command == "train":
+        train_texts, held_out = split_plots(plots, args.holdout)
+        logging.info(f"Distilling from {len(train_texts)} texts ({len(held_out)} held out)...")
+        # Training targets go through the score cache, so texts of already analysed films cost no forward pass
+        targets = EmotionScores.from_outputs(emotion_utils.score_chunks(train_texts)).matrix
+        first_stage = HashedNgramClassifier(args.hash_bits).fit(train_texts, targets, epochs=args.epochs)
+        first_stage.save(args.model, emotion_utils.MODEL_NAME, emotion_utils.CACHE_REVISION)
+        print(f"Saved first stage to {args.model}")
+    else:
+        first_stage, meta = HashedNgramClassifier.load(args.model)
+        held_out = [text for texts in plots for text in texts]
+
+    if held_out:
+        teacher, model_seconds = teacher_scores(held_out)
+        print(f"\nHeld-out report on {len(held_out)} texts (transformer: {len(held_out) / model_seconds:.1f} texts/s):")
+        print_report(evaluate(first_stage, held_out, teacher, model_seconds))
+        cascade = Cascade(first_stage, args.threshold)
+        started = time.perf_counter()
+        outputs, _ = cascade(held_out, emotion_utils.get_batcher())
+        cascade_seconds = time.perf_counter() - started
+        agreement = float(np.mean(EmotionScores.from_outputs(outputs).matrix.argmax(axis=1) == teacher.argmax(axis=1)))
+        print(f"\nMeasured at threshold {args.threshold}: {cascade.stats()['skip_rate']:.1%} skipped, "
+              f"agreement {agreement:.3f}, speedup {model_seconds / cascade_seconds:.2f}x")
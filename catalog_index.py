@@ -0,0 +1,308 @@
+# catalog_index.py
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from emotion_scores import EMOTION_LABELS, EmotionScores, get_emotion_scores
+from plot_store import normalize_title
+
+logging.basicConfig(level=logging.INFO)
+
+# Directory of the precomputed catalog; analyses of titles found there skip Wikipedia and the model
+DEFAULT_CATALOG_DIR = os.environ.get("CINEMOOD_CATALOG_DIR", os.path.join(".cache", "catalog"))
+FORMAT_VERSION = 1
+
+# One row per film. Offsets and lengths are in bytes into text.bin; scenes are rows of scenes.npy / scores.npy
+FILM_DTYPE = np.dtype([
+    ("title_off", np.int64), ("title_len", np.int32),
+    ("plot_off", np.int64), ("plot_len", np.int32),
+    ("insights_off", np.int64), ("insights_len", np.int32),
+    ("scene_start", np.int64), ("scene_count", np.int32),
+    ("digest", "S64"), # artifacts.analysis_digest, so downloads are shared with live analyses
+])
+# One row per scene; first/last sentence are -1 for sentence chunking (no 'Sentences' column)
+SCENE_DTYPE = np.dtype([
+    ("text_off", np.int64), ("text_len", np.int32),
+    ("first_sentence", np.int32), ("last_sentence", np.int32),
+])
+
+
+def title_key(title: str) -> np.uint64:
+    """64-bit hash of the normalized title; the index is a sorted array of these."""
+    digest = hashlib.blake2b(normalize_title(title).encode("utf-8"), digest_size=8).digest()
+    return np.frombuffer(digest, dtype="<u8")[0]
+
+
+class CatalogEntry(NamedTuple):
+    """A precomputed analysis, shaped like what process_analysis computes live."""
+    title: str
+    plot_text: str
+    analysis_df: pd.DataFrame
+    insights: str
+    digest: str
+
+
+class CatalogIndex:
+    """
+    Read-only, memory-mapped catalog of precomputed analyses.
+
+    Every column lives in a flat file mapped with mmap: the score matrices of
+    all films as one float32 array, the strings in one UTF-8 blob, and per-film
+    and per-scene offset tables pointing into them. Opening the index parses
+    nothing but meta.json, and a lookup is a binary search over sorted title
+    hashes followed by slicing, so a hit costs about as much as building its
+    DataFrame. Pages are shared by every process that maps the same files.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CATALOG_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT_VERSION or tuple(self.meta.get("labels", ())) != EMOTION_LABELS:
+            raise ValueError(f"Catalog in {directory} has an incompatible format.")
+        self.films = np.load(os.path.join(directory, "films.npy"), mmap_mode="r")
+        self.scenes = np.load(os.path.join(directory, "scenes.npy"), mmap_mode="r")
+        self.scores = np.load(os.path.join(directory, "scores.npy"), mmap_mode="r")
+        self.keys = np.load(os.path.join(directory, "keys.npy"), mmap_mode="r")
+        self.key_rows = np.load(os.path.join(directory, "key_rows.npy"), mmap_mode="r")
+        text_path = os.path.join(directory, "text.bin")
+        # np.memmap cannot map an empty file
+        self.text = np.memmap(text_path, dtype=np.uint8, mode="r") if os.path.getsize(text_path) else np.zeros(0, np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.films)
+
+    def _string(self, offset: int, length: int) -> str:
+        return self.text[offset:offset + length].tobytes().decode("utf-8")
+
+    def title(self, row: int) -> str:
+        """Display title of the film in `row`."""
+        film = self.films[row]
+        return self._string(int(film["title_off"]), int(film["title_len"]))
+
+    def find(self, title: str) -> int | None:
+        """Row of the film indexed under `title` (any spelling normalizing to the same key), or None."""
+        if not title or not len(self.keys):
+            return None
+        key = title_key(title)
+        position = int(np.searchsorted(self.keys, key))
+        if position < len(self.keys) and self.keys[position] == key:
+            return int(self.key_rows[position])
+        return None
+
+    def get(self, title: str) -> CatalogEntry | None:
+        """The precomputed analysis of `title`, or None on a miss."""
+        row = self.find(title)
+        if row is None:
+            return None
+        film = self.films[row]
+        start, count = int(film["scene_start"]), int(film["scene_count"])
+        scenes = self.scenes[start:start + count]
+        texts = [self._string(offset, length) for offset, length in zip(scenes["text_off"].tolist(), scenes["text_len"].tolist())]
+        # The score rows stay a view into the mapped file
+        analysis_df = EmotionScores(self.scores[start:start + count]).to_frame(texts)
+        if count and scenes["first_sentence"][0] >= 0:
+            first, last = scenes["first_sentence"] + 1, scenes["last_sentence"] + 1
+            analysis_df.insert(1, "Sentences", [str(f) if f == l else f"{f}-{l}" for f, l in zip(first.tolist(), last.tolist())])
+        return CatalogEntry(
+            self.title(row),
+            self._string(int(film["plot_off"]), int(film["plot_len"])),
+            analysis_df,
+            self._string(int(film["insights_off"]), int(film["insights_len"])),
+            film["digest"].decode("ascii"),
+        )
+
+    def stats(self) -> dict:
+        return {"films": len(self.films), "scenes": len(self.scenes), "keys": len(self.keys),
+                "text_bytes": len(self.text), "built_at": self.meta.get("built_at")}
+
+
+class CatalogWriter:
+    """
+    Builds a catalog in `<directory>.building` and swaps it into place on close().
+
+    Strings and score rows are streamed to disk as films are added; only the
+    small offset tables are kept in memory. Readers that still map the
+    previous catalog keep working on its (unlinked) files.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CATALOG_DIR, meta: dict | None = None):
+        self.directory = directory
+        self.building = directory.rstrip("/\\") + ".building"
+        shutil.rmtree(self.building, ignore_errors=True)
+        os.makedirs(self.building)
+        self.meta = dict(meta or {})
+        self._text = open(os.path.join(self.building, "text.bin"), "wb")
+        self._scores = open(os.path.join(self.building, "scores.f32"), "wb")
+        self._text_size = 0
+        self._films = []
+        self._scenes = []
+        self._keys = {} # title key -> film row
+
+    def _put_string(self, value: str) -> tuple[int, int]:
+        data = value.encode("utf-8")
+        offset = self._text_size
+        self._text.write(data)
+        self._text_size += len(data)
+        return offset, len(data)
+
+    def add(self, titles: list[str], display_title: str, plot_text: str, analysis_df: pd.DataFrame,
+            insights: str, digest: str, scene_sentences: list[tuple[int, int]] | None = None) -> None:
+        """
+        Appends one analysed film, indexed under every title in `titles`.
+
+        `scene_sentences` holds the (first, last) sentence index of each scene for
+        scene chunking; None for sentence chunking.
+        """
+        matrix = get_emotion_scores(analysis_df).matrix
+        scene_start = len(self._scenes)
+        for i, chunk in enumerate(analysis_df["Chunk"].tolist()):
+            first, last = scene_sentences[i] if scene_sentences else (-1, -1)
+            self._scenes.append((*self._put_string(str(chunk)), first, last))
+        self._scores.write(np.ascontiguousarray(matrix, dtype="<f4").tobytes())
+        row = len(self._films)
+        self._films.append((*self._put_string(display_title), *self._put_string(plot_text),
+                            *self._put_string(insights), scene_start, len(matrix), digest.encode("ascii")))
+        for title in titles:
+            self._keys.setdefault(title_key(title), row)
+
+    def __len__(self) -> int:
+        return len(self._films)
+
+    def close(self) -> str:
+        """Writes the offset tables and title index and moves the catalog into place. Returns its directory."""
+        self._text.close()
+        self._scores.close()
+        # Prefix the streamed score rows with an .npy header, copying in blocks rather than loading them
+        scores_path = os.path.join(self.building, "scores.f32")
+        header = {"descr": "<f4", "fortran_order": False, "shape": (len(self._scenes), len(EMOTION_LABELS))}
+        with open(os.path.join(self.building, "scores.npy"), "wb") as out, open(scores_path, "rb") as rows:
+            np.lib.format.write_array_header_1_0(out, header)
+            shutil.copyfileobj(rows, out)
+        os.remove(scores_path)
+        np.save(os.path.join(self.building, "films.npy"), np.array(self._films, dtype=FILM_DTYPE))
+        np.save(os.path.join(self.building, "scenes.npy"), np.array(self._scenes, dtype=SCENE_DTYPE))
+        keys = np.fromiter(self._keys.keys(), dtype=np.uint64, count=len(self._keys))
+        rows = np.fromiter(self._keys.values(), dtype=np.int32, count=len(self._keys))
+        order = np.argsort(keys, kind="stable")
+        np.save(os.path.join(self.building, "keys.npy"), keys[order])
+        np.save(os.path.join(self.building, "key_rows.npy"), rows[order])
+        meta = {**self.meta, "format": FORMAT_VERSION, "labels": list(EMOTION_LABELS),
+                "films": len(self._films), "built_at": time.time()}
+        with open(os.path.join(self.building, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        previous = self.directory.rstrip("/\\") + ".previous"
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.exists(self.directory):
+            os.replace(self.directory, previous)
+        os.replace(self.building, self.directory)
+        shutil.rmtree(previous, ignore_errors=True)
+        return self.directory
+
+
+def open_catalog(directory: str = DEFAULT_CATALOG_DIR) -> CatalogIndex | None:
+    """
+    Opens the catalog if one was built and matches the configured model and chunking; None otherwise.
+
+    A catalog scored by a different model or revision, or chunked with a different
+    chunking or segmenter mode, is ignored (with a warning) rather than served next
+    to live analyses that would disagree with it.
+    """
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        return None
+    try:
+        catalog = CatalogIndex(directory)
+    except Exception as e:
+        logging.error(f"Failed to open catalog index in {directory}: {e}")
+        return None
+    from emotion_utils import CACHE_REVISION, MODEL_NAME
+    if (catalog.meta.get("model"), catalog.meta.get("revision")) != (MODEL_NAME, CACHE_REVISION):
+        logging.warning(f"Catalog in {directory} was built with {catalog.meta.get('model')}@{catalog.meta.get('revision')}, "
+                        f"not {MODEL_NAME}@{CACHE_REVISION}; ignoring it.")
+        return None
+    from scene_windows import DEFAULT_CHUNKING
+    from segmentation import DEFAULT_SEGMENTER_MODE
+    if (catalog.meta.get("chunking"), catalog.meta.get("segmenter")) != (DEFAULT_CHUNKING, DEFAULT_SEGMENTER_MODE):
+        logging.warning(f"Catalog in {directory} was chunked with {catalog.meta.get('chunking')}/{catalog.meta.get('segmenter')}, "
+                        f"not {DEFAULT_CHUNKING}/{DEFAULT_SEGMENTER_MODE}; ignoring it.")
+        return None
+    logging.info(f"Catalog index loaded from {directory}: {catalog.stats()}")
+    return catalog
+
+
+def build_catalog(items: list[str], directory: str = DEFAULT_CATALOG_DIR, plot_files: bool = False,
+                  fetch_workers: int = 8, prefetch: int = 32) -> dict:
+    """
+    Analyses every title (or plot file) and writes the results as a catalog index.
+
+    Fetching runs ahead on a thread pool as in batch_runner; titles whose plot
+    cannot be found or classified are left out, so they fall back to live analysis.
+
+    Returns:
+        Counts of indexed and skipped items plus elapsed seconds.
+    """
+    from artifacts import analysis_digest
+    from batch_runner import iter_fetched
+    from emotion_utils import CACHE_REVISION, MODEL_NAME, classify_emotions, generate_insights
+    from scene_windows import DEFAULT_CHUNKING, Scene
+    from segmentation import DEFAULT_SEGMENTER_MODE
+
+    writer = CatalogWriter(directory, {"model": MODEL_NAME, "revision": CACHE_REVISION,
+                                       "chunking": DEFAULT_CHUNKING, "segmenter": DEFAULT_SEGMENTER_MODE})
+    summary = {"indexed": 0, "skipped": 0}
+    started = time.perf_counter()
+    for fetched in iter_fetched(list(dict.fromkeys(items)), plot_files, fetch_workers, prefetch):
+        chunks = fetched["chunks"]
+        analysis_df = classify_emotions(chunks) if chunks else None
+        if analysis_df is None or analysis_df.empty:
+            logging.warning(f"Not indexed (no plot or classification failed): {fetched['key']}")
+            summary["skipped"] += 1
+            continue
+        scene_sentences = [(c.first_sentence, c.last_sentence) for c in chunks] if isinstance(chunks[0], Scene) else None
+        titles = [fetched["title"]] if plot_files else [fetched["key"]]
+        writer.add(titles, fetched["title"], fetched["plot"], analysis_df, generate_insights(analysis_df),
+                   analysis_digest(analysis_df), scene_sentences)
+        summary["indexed"] += 1
+        if summary["indexed"] % 100 == 0:
+            logging.info(f"Catalog progress: {summary['indexed']} indexed, {summary['skipped']} skipped")
+    writer.close()
+    summary["elapsed_s"] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute analyses of a film catalog into a memory-mapped index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Analyse a list of titles (or plot files) and write the index.")
+    build.add_argument("input", help="Text file with one movie title (or plot file path) per line.")
+    build.add_argument("--dir", default=DEFAULT_CATALOG_DIR, help="Catalog directory.")
+    build.add_argument("--plot-files", action="store_true", help="Treat input lines as paths to plot text files.")
+    build.add_argument("--fetch-workers", type=int, default=8)
+    build.add_argument("--prefetch", type=int, default=32)
+    lookup = subparsers.add_parser("lookup", help="Print the indexed analysis of a title.")
+    lookup.add_argument("title")
+    lookup.add_argument("--dir", default=DEFAULT_CATALOG_DIR)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from batch_runner import read_inputs
+        from emotion_utils import warm_up
+        warm_up(background=False)
+        print(json.dumps(build_catalog(read_inputs(args.input), args.dir, args.plot_files,
+                                       args.fetch_workers, args.prefetch), indent=2))
+    else:
+        entry = CatalogIndex(args.dir).get(args.title)
+        if entry is None:
+            print(f"'{args.title}' is not in the catalog.")
+        else:
+            print(f"{entry.title}: {len(entry.analysis_df)} scenes\n{entry.insights}\n")
+            print(entry.analysis_df.head(10).to_string(index=False))
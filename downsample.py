@@ -0,0 +1,51 @@
+# downsample.py
+import numpy as np
+
+
+def bucket_edges(n: int, n_buckets: int) -> np.ndarray:
+    """Start index of each of `n_buckets` near-equal buckets over n points, plus n at the end."""
+    n_buckets = max(1, min(n_buckets, n))
+    return np.linspace(0, n, n_buckets + 1).astype(np.intp)
+
+
+def bucket_mean(values: np.ndarray, n_buckets: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Mean of every column per bucket.
+
+    Means preserve the area under each series, which is what a stacked
+    probability chart shows, so the picture stays faithful at any length.
+
+    Returns:
+        (centers, means): bucket centre positions (in original index units) and (buckets x columns) means.
+    """
+    values = np.asarray(values)
+    squeeze = values.ndim == 1
+    values = values[:, None] if squeeze else values
+    edges = bucket_edges(len(values), n_buckets)
+    sums = np.add.reduceat(values.astype(np.float64), edges[:-1], axis=0)
+    means = sums / np.diff(edges)[:, None]
+    centers = (edges[:-1] + edges[1:] - 1) / 2.0
+    return centers, (means[:, 0] if squeeze else means)
+
+
+def bucket_mode(labels: np.ndarray, n_buckets: int, n_labels: int) -> np.ndarray:
+    """Most frequent non-negative label per bucket (-1 if a bucket has none), via one 2-D bincount."""
+    labels = np.asarray(labels, dtype=np.intp)
+    edges = bucket_edges(len(labels), n_buckets)
+    bucket = np.repeat(np.arange(len(edges) - 1), np.diff(edges))
+    known = labels >= 0
+    counts = np.bincount(bucket[known] * n_labels + labels[known],
+                         minlength=(len(edges) - 1) * n_labels).reshape(-1, n_labels)
+    mode = counts.argmax(axis=1)
+    mode[counts.max(axis=1) == 0] = -1
+    return mode
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    probabilities = rng.dirichlet(np.ones(7), size=100000)
+    centers, means = bucket_mean(probabilities, 400)
+    ribbon = bucket_mode(probabilities.argmax(axis=1), 400, 7)
+    print("Downsampled", len(probabilities), "scenes to", len(centers), "buckets;",
+          "bucket means still sum to 1:", bool(np.allclose(means.sum(axis=1), 1.0)), "; ribbon labels:", np.unique(ribbon))
@@ -0,0 +1,271 @@
+# dump_ingest.py
+import argparse
+import bz2
+import gzip
+import html
+import json
+import logging
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from plot_store import PlotStore
+from wiki_fetcher import LocalPage, extract_plot
+
+logging.basicConfig(level=logging.INFO)
+
+# Parser processes (0 = one per core) and pages handed to a process at a time
+DEFAULT_INGEST_WORKERS = int(os.environ.get("CINEMOOD_INGEST_WORKERS", "0"))
+DEFAULT_INGEST_BATCH = int(os.environ.get("CINEMOOD_INGEST_BATCH", "64"))
+
+# Cheap test run on the raw wikitext while streaming, so only film articles are shipped to the parsers
+_FILM_MARKER = re.compile(r"\{\{\s*infobox[ _]+film\b|\[\[\s*category\s*:[^\]|]*\bfilms\s*[\]|]", re.IGNORECASE)
+# Disambiguators such as "(film)", "(2010 film)" or "(1933 American film)", also stored as an alias
+_FILM_DISAMBIGUATOR = re.compile(r"^(.+?)\s+\((?:\d{4}\s+)?(?:[^()]*\s)?film\)$", re.IGNORECASE)
+
+_HEADING = re.compile(r"^(={2,6})\s*(.+?)\s*\1\s*$", re.MULTILINE)
+_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+_REF = re.compile(r"<ref[^>]*/>|<ref[^>]*>.*?</ref>", re.DOTALL | re.IGNORECASE)
+_TABLE = re.compile(r"^\s*\{\|.*?^\s*\|\}", re.DOTALL | re.MULTILINE)
+_TAG = re.compile(r"</?[a-zA-Z][^>]*>")
+_EXTERNAL_LINK = re.compile(r"\[(?:https?:)?//[^\s\]]+\s*([^\]]*)\]")
+_QUOTES = re.compile(r"'{2,5}")
+_NON_PROSE_LINKS = ("file:", "image:", "category:")
+
+
+def _strip_templates(text: str) -> str:
+    """Removes {{...}} templates, including nested ones (infoboxes, citations)."""
+    out, depth, last = [], 0, 0
+    for m in re.finditer(r"\{\{|\}\}", text):
+        if m.group() == "{{":
+            if depth == 0:
+                out.append(text[last:m.start()])
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                last = m.end()
+    if depth == 0:
+        out.append(text[last:])
+    return "".join(out)
+
+
+def _resolve_links(text: str) -> str:
+    """Replaces [[target|label]] with its label; drops file, image and category links (which may nest)."""
+    out, depth, last, start = [], 0, 0, 0
+    for m in re.finditer(r"\[\[|\]\]", text):
+        if m.group() == "[[":
+            if depth == 0:
+                out.append(text[last:m.start()])
+                start = m.end()
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                link = text[start:m.start()]
+                if not link.lstrip().lower().startswith(_NON_PROSE_LINKS):
+                    out.append(link.rsplit("|", 1)[-1] or link.split("|", 1)[0])
+                last = m.end()
+    if depth == 0:
+        out.append(text[last:])
+    return "".join(out)
+
+
+def wikitext_to_text(wikitext: str) -> str:
+    """
+    Reduces wikitext to plain prose paragraphs, close to what the live API returns for a section.
+
+    Templates, references, tables, files and markup are removed; links keep their visible label.
+    """
+    text = _COMMENT.sub("", wikitext)
+    text = _REF.sub("", text)
+    text = _strip_templates(text)
+    text = _TABLE.sub("", text)
+    text = _resolve_links(text)
+    text = _EXTERNAL_LINK.sub(r"\1", text)
+    text = _TAG.sub("", _QUOTES.sub("", text))
+    paragraphs = []
+    for line in html.unescape(text).splitlines():
+        line = line.strip()
+        if not line or line.startswith(("|", "!", "__")) or _HEADING.match(line):
+            continue
+        paragraphs.append(re.sub(r"\s+", " ", line.lstrip("*#:; ")))
+    return "\n".join(p for p in paragraphs if p)
+
+
+def parse_page(page_id, title: str, wikitext: str) -> LocalPage:
+    """
+    Builds a LocalPage from an article's wikitext: level-2 sections (with their subsections) and the lead as summary.
+    """
+    headings = [m for m in _HEADING.finditer(wikitext) if len(m.group(1)) == 2]
+    lead_end = headings[0].start() if headings else len(wikitext)
+    sections = {}
+    for i, m in enumerate(headings):
+        body_end = headings[i + 1].start() if i + 1 < len(headings) else len(wikitext)
+        name = wikitext_to_text(m.group(2))
+        if name not in sections:
+            sections[name] = wikitext_to_text(wikitext[m.end():body_end])
+    return LocalPage(page_id, title, sections, wikitext_to_text(wikitext[:lead_end]))
+
+
+def is_film_article(wikitext: str) -> bool:
+    """True for articles with a film infobox or in a '... films' category."""
+    return _FILM_MARKER.search(wikitext) is not None
+
+
+def title_aliases(title: str) -> list[str]:
+    """Alternative titles a page is also found under, e.g. 'Inception' for 'Inception (film)'."""
+    m = _FILM_DISAMBIGUATOR.match(title)
+    return [m.group(1)] if m else []
+
+
+def _extract_batch(pages: list[tuple]) -> list[tuple]:
+    """Worker task: (page_id, title, plot) for every page of the batch with a plot."""
+    results = []
+    for page_id, title, wikitext in pages:
+        plot = extract_plot(parse_page(page_id, title, wikitext), title)
+        if plot:
+            results.append((page_id, title, plot))
+    return results
+
+
+def _quiet_worker() -> None:
+    # extract_plot logs per page, which would drown the progress log over a full dump
+    logging.getLogger().setLevel(logging.ERROR)
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def open_dump(path: str):
+    """Opens a dump as a binary stream, decompressing .bz2 (including multistream) and .gz on the fly."""
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_pages(stream, stats: dict | None = None):
+    """
+    Streams (page_id, title, wikitext) for main-namespace, non-redirect film articles of a pages-articles dump.
+
+    Memory stays bounded by the largest page: every element is cleared once read,
+    and the root is emptied so finished pages are not kept as its children.
+
+    Args:
+        stream: Binary file object of the (decompressed) XML dump.
+        stats: Optional dict whose 'pages' and 'films' counters are updated while streaming.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("pages", 0)
+    stats.setdefault("films", 0)
+    context = ET.iterparse(stream, events=("start", "end"))
+    _, root = next(context)
+    page_id = title = ns = text = None
+    redirect = False
+    in_revision = False
+    for event, elem in context:
+        tag = _local(elem.tag)
+        if event == "start":
+            if tag == "page":
+                page_id = title = ns = text = None
+                redirect = False
+            elif tag == "revision":
+                in_revision = True
+            continue
+        if tag == "title":
+            title = elem.text
+        elif tag == "ns":
+            ns = elem.text
+        elif tag == "id" and not in_revision and page_id is None:
+            page_id = elem.text
+        elif tag == "redirect":
+            redirect = True
+        elif tag == "text":
+            text = elem.text or ""
+        elif tag == "revision":
+            in_revision = False
+        elif tag == "page":
+            stats["pages"] += 1
+            if ns == "0" and not redirect and title and text and is_film_article(text):
+                stats["films"] += 1
+                yield page_id, title, text
+            root.clear()
+        elem.clear()
+
+
+def ingest_dump(path: str, store: PlotStore | None = None, workers: int = DEFAULT_INGEST_WORKERS,
+                batch_size: int = DEFAULT_INGEST_BATCH, limit: int | None = None) -> dict:
+    """
+    Extracts the plots of every film article in a pages-articles dump into the plot store.
+
+    The dump is streamed and filtered in this process; wikitext parsing and plot extraction
+    (the same Plot / Synopsis / summary order as fetch_movie_plot) run in a process pool.
+    At most two batches per worker are in flight, so memory does not grow with the dump.
+    Plots are stored under the page title and, for disambiguated titles such as
+    'Heat (1995 film)', also under 'Heat' unless that title is already taken.
+
+    Args:
+        path: Dump file (.xml, .xml.bz2 or .xml.gz).
+        store: Target plot store (default: the configured one).
+        workers: Parser processes; 0 means one per core.
+        batch_size: Pages per task.
+        limit: Stop after this many film articles (for trial runs).
+
+    Returns:
+        Counts of pages read, film articles, plots stored and elapsed seconds.
+    """
+    store = store or PlotStore()
+    workers = workers or os.cpu_count() or 1
+    stats = {"pages": 0, "films": 0, "stored": 0}
+    started = time.perf_counter()
+
+    def write(results):
+        rows = [(title, page_id, title, plot) for page_id, title, plot in results]
+        aliases = [(alias, page_id) for page_id, title, _ in results for alias in title_aliases(title)]
+        store.put_many(rows, aliases)
+        stats["stored"] += len(rows)
+
+    with open_dump(path) as stream, ProcessPoolExecutor(max_workers=workers, initializer=_quiet_worker) as executor:
+        pending = set()
+        batch = []
+        for page in iter_pages(stream, stats):
+            batch.append(page)
+            if limit and stats["films"] >= limit:
+                break
+            if len(batch) < batch_size:
+                continue
+            pending.add(executor.submit(_extract_batch, batch))
+            batch = []
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write(future.result())
+                logging.info(f"Read {stats['pages']} pages, {stats['films']} films, stored {stats['stored']} plots")
+        if batch:
+            pending.add(executor.submit(_extract_batch, batch))
+        for future in pending:
+            write(future.result())
+
+    stats["elapsed_s"] = round(time.perf_counter() - started, 3)
+    logging.info(f"Ingested {path}: {stats}")
+    return stats
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load film plots from a Wikipedia pages-articles dump into the plot store.")
+    parser.add_argument("dump", help="Path to enwiki-...-pages-articles.xml.bz2 (or .xml / .xml.gz).")
+    parser.add_argument("--store", default=None, help="Plot store path (default: CINEMOOD_PLOT_STORE).")
+    parser.add_argument("--workers", type=int, default=DEFAULT_INGEST_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_INGEST_BATCH)
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many film articles.")
+    args = parser.parse_args()
+
+    target = PlotStore(args.store) if args.store else PlotStore()
+    print(json.dumps(ingest_dump(args.dump, target, args.workers, args.batch_size, args.limit), indent=2))
+    print(json.dumps(target.stats(), indent=2))
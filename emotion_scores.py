@@ -0,0 +1,153 @@
+# emotion_scores.py
+import numpy as np
+import pandas as pd
+
+# Fixed column order of the score matrix: the labels of j-hartmann/emotion-english-distilroberta-base
+EMOTION_LABELS = ("anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise")
+LABEL_INDEX = {label: i for i, label in enumerate(EMOTION_LABELS)}
+UNKNOWN_LABEL = "unknown"
+
+# Key under which classify_emotions attaches the matrix to its DataFrame (DataFrame.attrs)
+ATTRS_KEY = "emotion_scores"
+
+
+class EmotionScores:
+    """
+    Full per-scene emotion probabilities as a contiguous float32 (scenes x emotions) matrix.
+
+    Columns follow EMOTION_LABELS. A row of zeros marks a scene that could not
+    be classified (its dominant label is 'unknown'). Instances are treated as
+    immutable, so copies made by pandas when propagating DataFrame.attrs share
+    the same array.
+    """
+
+    __slots__ = ("matrix", "labels")
+
+    def __init__(self, matrix: np.ndarray, labels: tuple[str, ...] = EMOTION_LABELS):
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32).reshape(-1, len(labels))
+        self.labels = tuple(labels)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @classmethod
+    def empty(cls) -> "EmotionScores":
+        return cls(np.zeros((0, len(EMOTION_LABELS)), dtype=np.float32))
+
+    @classmethod
+    def from_outputs(cls, outputs: list) -> "EmotionScores":
+        """Builds the matrix from pipeline outputs (one list of {'label', 'score'} dicts per scene)."""
+        matrix = np.zeros((len(outputs), len(EMOTION_LABELS)), dtype=np.float32)
+        for row, output in enumerate(outputs):
+            if isinstance(output, list):
+                for item in output:
+                    column = LABEL_INDEX.get(item.get("label"))
+                    if column is not None:
+                        matrix[row, column] = item["score"]
+        return cls(matrix)
+
+    @classmethod
+    def from_frame(cls, analysis_df: pd.DataFrame) -> "EmotionScores":
+        """
+        Rebuilds scores from a DataFrame without attached scores (e.g. a reloaded CSV).
+
+        Only the dominant emotion and its score are known there, so every other
+        emotion gets zero probability.
+        """
+        matrix = np.zeros((len(analysis_df), len(EMOTION_LABELS)), dtype=np.float32)
+        if len(analysis_df) and "Emotion" in analysis_df.columns:
+            columns = analysis_df["Emotion"].map(LABEL_INDEX).to_numpy()
+            known = ~pd.isna(columns)
+            scores = analysis_df["Score"].to_numpy(dtype=np.float32) if "Score" in analysis_df.columns \
+                else np.ones(len(analysis_df), dtype=np.float32)
+            matrix[np.flatnonzero(known), columns[known].astype(np.intp)] = scores[known]
+        return cls(matrix)
+
+    @classmethod
+    def concatenate(cls, parts: list["EmotionScores"]) -> "EmotionScores":
+        if not parts:
+            return cls.empty()
+        return cls(np.concatenate([part.matrix for part in parts]))
+
+    def dominant_index(self) -> np.ndarray:
+        """Column index of each scene's dominant emotion, or -1 for unclassified scenes."""
+        if not len(self):
+            return np.zeros(0, dtype=np.intp)
+        index = self.matrix.argmax(axis=1)
+        index[self.matrix.max(axis=1) <= 0] = -1
+        return index
+
+    def dominant_labels(self) -> np.ndarray:
+        """Dominant emotion label per scene ('unknown' for unclassified scenes)."""
+        lookup = np.array(self.labels + (UNKNOWN_LABEL,), dtype=object)
+        return lookup[self.dominant_index()] # -1 selects the trailing 'unknown'
+
+    def dominant_scores(self) -> np.ndarray:
+        """Probability of each scene's dominant emotion (0.0 for unclassified scenes)."""
+        if not len(self):
+            return np.zeros(0, dtype=np.float32)
+        return self.matrix.max(axis=1)
+
+    def arc(self, label: str) -> np.ndarray:
+        """Probability of one emotion across all scenes, as a view into the matrix."""
+        return self.matrix[:, self.labels.index(label)]
+
+    def counts(self) -> pd.Series:
+        """Number of scenes per dominant emotion, most common first (like Series.value_counts)."""
+        index = self.dominant_index()
+        index = np.where(index < 0, len(self.labels), index) # Last bin holds 'unknown'
+        bins = np.bincount(index, minlength=len(self.labels) + 1)
+        names = self.labels + (UNKNOWN_LABEL,)
+        counts = pd.Series(bins, index=names, name="count")
+        counts = counts[counts > 0]
+        return counts.sort_values(ascending=False, kind="stable")
+
+    def mean(self) -> np.ndarray:
+        """Mean probability per emotion over all scenes."""
+        if not len(self):
+            return np.zeros(len(self.labels), dtype=np.float32)
+        return self.matrix.mean(axis=0)
+
+    def to_frame(self, chunks: list[str], scene_offset: int = 0) -> pd.DataFrame:
+        """Builds the 'Scene', 'Chunk', 'Emotion', 'Score' table and attaches these scores to it."""
+        analysis_df = pd.DataFrame({
+            "Scene": np.arange(scene_offset + 1, scene_offset + len(self) + 1),
+            "Chunk": list(chunks),
+            "Emotion": self.dominant_labels(),
+            "Score": np.round(self.dominant_scores().astype(np.float64), 4),
+        })
+        analysis_df.attrs[ATTRS_KEY] = self
+        return analysis_df
+
+
+def get_emotion_scores(analysis_df: pd.DataFrame) -> EmotionScores:
+    """Returns the score matrix attached to an analysis DataFrame, or rebuilds it from the table."""
+    scores = analysis_df.attrs.get(ATTRS_KEY)
+    if isinstance(scores, EmotionScores) and len(scores) == len(analysis_df):
+        return scores
+    return EmotionScores.from_frame(analysis_df)
+
+
+def concat_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenates streamed analysis slices, keeping their score matrices attached."""
+    if not frames:
+        return pd.DataFrame(columns=["Scene", "Chunk", "Emotion", "Score"])
+    analysis_df = pd.concat(frames, ignore_index=True)
+    analysis_df.attrs[ATTRS_KEY] = EmotionScores.concatenate([get_emotion_scores(f) for f in frames])
+    return analysis_df
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    outputs = [
+        [{"label": "joy", "score": 0.8}, {"label": "neutral", "score": 0.2}],
+        [{"label": "fear", "score": 0.6}, {"label": "sadness", "score": 0.4}],
+        [],
+    ]
+    scores = EmotionScores.from_outputs(outputs)
+    print("Matrix:", scores.matrix.shape, scores.matrix.dtype, f"{scores.matrix.nbytes} bytes")
+    print(scores.to_frame(["Happy scene.", "Scary scene.", "???"]))
+    print(scores.counts())
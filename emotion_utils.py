@@ -1,46 +1,230 @@
 # emotion_utils.py
-import nltk
-from transformers import pipeline
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+import numpy as np
 import pandas as pd
 import logging
-import spacy
+import os
+import threading
+import metrics
+from score_cache import ScoreCache, sentence_key
+from batching import TokenBudgetBatcher
+from emotion_scores import EmotionScores, UNKNOWN_LABEL, get_emotion_scores
+from arc_analytics import HIGH_INTENSITY_THRESHOLD, analyze_film, describe_shape
+from worker_pool import PoolBusyError
+from cascade import CASCADE_ENABLED, Cascade, load_cascade
+from segmentation import DEFAULT_SEGMENTER_MODE, Segment, get_segmenter, segment_texts
+from scene_windows import (CHUNKING_MODES, DEFAULT_CHUNKING, DEFAULT_SCENE_TOKENS, DEFAULT_WINDOW_OVERLAP, Scene,
+                           aggregate_windows, build_scenes, sentence_scenes, window_texts)
 
 logging.basicConfig(level=logging.INFO)
 
-# Load SpaCy model once
-try:
-    nlp = spacy.load("en_core_web_sm")
-    logging.info("SpaCy model 'en_core_web_sm' loaded successfully.")
-except OSError:
-    logging.error("SpaCy model 'en_core_web_sm' not found. Please run: python -m spacy download en_core_web_sm")
-    nlp = None
-
-# Load NLTK sentence tokenizer data
-try:
-    nltk.data.find('tokenizers/punkt')
-except nltk.downloader.DownloadError:
-    logging.info("NLTK 'punkt' not found. Downloading...")
-    nltk.download('punkt', quiet=True)
-    logging.info("NLTK 'punkt' downloaded.")
-
-# Load emotion classification pipeline once
-try:
-    emotion_classifier = pipeline(
-        "text-classification",
-        model="j-hartmann/emotion-english-distilroberta-base",
-        top_k=None # Get all scores initially if needed, or top_k=1 for just dominant
-        # return_all_scores=False # Deprecated, use top_k=1 instead
-    )
-    logging.info("Emotion classification model loaded successfully.")
-except Exception as e:
-    logging.error(f"Failed to load emotion classification model: {e}")
-    emotion_classifier = None
+MODEL_NAME = "j-hartmann/emotion-english-distilroberta-base"
+MODEL_REVISION = os.environ.get("CINEMOOD_MODEL_REVISION", "main")
+
+# Inference backend: 'torch' (transformers pipeline), 'onnx' or 'onnx-int8' (ONNX Runtime, see onnx_backend.py)
+INFERENCE_BACKENDS = ("torch", "onnx", "onnx-int8")
+INFERENCE_BACKEND = os.environ.get("CINEMOOD_BACKEND", "torch")
+# Scores differ slightly between backends, so the backend is part of the score cache key
+CACHE_REVISION = MODEL_REVISION if INFERENCE_BACKEND == "torch" else f"{MODEL_REVISION}+{INFERENCE_BACKEND}"
+
+# Models are loaded lazily on first use (or by warm_up) rather than at import time.
+# nltk, spacy and transformers are imported inside the loaders for the same reason.
+_model_lock = threading.RLock()
+_punkt_checked = False
+_emotion_classifier = None
+_batcher = None
+_classifier_loaded = False
+
+# Cold-start timings, reported by cold_start_report()
+_timings = {}
+
+def _record_timing(name: str, started: float) -> None:
+    _timings[name] = round(time.perf_counter() - started, 4)
+
+def get_nlp(mode: str = DEFAULT_SEGMENTER_MODE):
+    """Returns the SpaCy pipeline used for sentence segmentation, loading it on first call (None if unavailable)."""
+    timing_key = f"spacy_{mode}_load_s"
+    if timing_key in _timings:
+        return get_segmenter(mode)
+    started = time.perf_counter()
+    nlp = get_segmenter(mode)
+    _record_timing(timing_key, started)
+    return nlp
+
+def ensure_punkt() -> None:
+    """Makes sure the NLTK 'punkt' sentence tokenizer data is available, downloading it once if needed."""
+    global _punkt_checked
+    if _punkt_checked:
+        return
+    with _model_lock:
+        if not _punkt_checked:
+            started = time.perf_counter()
+            import nltk
+            try:
+                nltk.data.find('tokenizers/punkt')
+            except LookupError:
+                logging.info("NLTK 'punkt' not found. Downloading...")
+                nltk.download('punkt', quiet=True)
+                logging.info("NLTK 'punkt' downloaded.")
+            _record_timing("punkt_check_s", started)
+            _punkt_checked = True
+
+def _build_classifier(backend: str):
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}'. Expected one of {INFERENCE_BACKENDS}.")
+    if backend == "torch":
+        from transformers import pipeline
+        return pipeline(
+            "text-classification",
+            model=MODEL_NAME,
+            revision=MODEL_REVISION,
+            top_k=None # Get all scores initially if needed, or top_k=1 for just dominant
+            # return_all_scores=False # Deprecated, use top_k=1 instead
+        )
+    from onnx_backend import (DEFAULT_ONNX_DIR, QUANTIZED_FILENAME, OnnxEmotionClassifier, export_onnx, exported_model,
+                              quantize_onnx)
+    exported = exported_model(DEFAULT_ONNX_DIR)
+    if exported != (MODEL_NAME, MODEL_REVISION):
+        reason = "No exported ONNX model" if exported is None else f"ONNX export of {exported[0]}@{exported[1]}"
+        logging.info(f"{reason} in {DEFAULT_ONNX_DIR}; exporting {MODEL_NAME}@{MODEL_REVISION} (requires PyTorch).")
+        export_onnx(MODEL_NAME, MODEL_REVISION, DEFAULT_ONNX_DIR, quantize=True)
+    elif backend == "onnx-int8" and not os.path.exists(os.path.join(DEFAULT_ONNX_DIR, QUANTIZED_FILENAME)):
+        # Exported with --no-quantize; the int8 copy is built from the existing model.onnx
+        logging.info(f"No {QUANTIZED_FILENAME} in {DEFAULT_ONNX_DIR}; quantizing the exported model.")
+        quantize_onnx(DEFAULT_ONNX_DIR)
+    return OnnxEmotionClassifier(DEFAULT_ONNX_DIR, quantized=backend == "onnx-int8",
+                                 model_name=MODEL_NAME, revision=MODEL_REVISION)
+
+def get_emotion_classifier():
+    """Returns the emotion classification pipeline, building it on first call (None if it fails to load)."""
+    global _emotion_classifier, _batcher, _classifier_loaded
+    if _classifier_loaded:
+        return _emotion_classifier
+    with _model_lock:
+        if not _classifier_loaded:
+            started = time.perf_counter()
+            try:
+                _emotion_classifier = _build_classifier(INFERENCE_BACKEND)
+                # Length-sorted, token-budgeted batching in front of the pipeline (stats via get_batcher().stats())
+                _batcher = TokenBudgetBatcher(_emotion_classifier)
+                logging.info(f"Emotion classification model loaded successfully ({INFERENCE_BACKEND} backend).")
+            except Exception as e:
+                logging.error(f"Failed to load emotion classification model: {e}")
+                _emotion_classifier = None
+                _batcher = None
+            _record_timing("classifier_load_s", started)
+            _classifier_loaded = True
+    return _emotion_classifier
+
+def set_emotion_classifier(classifier) -> None:
+    """
+    Installs `classifier` instead of loading the model, e.g. a deterministic stub for offline benchmarks.
+
+    It must be callable like a transformers text-classification pipeline and
+    expose its `tokenizer`. Pass None to load the configured model on next use.
+    """
+    global _emotion_classifier, _batcher, _classifier_loaded
+    with _model_lock:
+        _emotion_classifier = classifier
+        _batcher = TokenBudgetBatcher(classifier) if classifier is not None else None
+        _classifier_loaded = classifier is not None
+
+def get_batcher() -> TokenBudgetBatcher | None:
+    """Returns the token-budget batcher wrapping the classifier (loads the classifier if needed)."""
+    get_emotion_classifier()
+    return _batcher
+
+def warm_up(background: bool = True, forward_pass: bool = True) -> threading.Thread | None:
+    """
+    Loads every model and runs a dummy forward pass so the first real request is fast.
+
+    Args:
+        background: Run in a daemon thread and return it instead of blocking.
+        forward_pass: Run the dummy forward pass here (False when worker processes serve inference).
+    """
+    def _warm():
+        started = time.perf_counter()
+        get_nlp()
+        ensure_punkt()
+        classifier = get_emotion_classifier()
+        if classifier is not None and forward_pass:
+            forward_started = time.perf_counter()
+            try:
+                classifier(["Warm-up sentence."])
+            except Exception as e:
+                logging.error(f"Warm-up forward pass failed: {e}")
+            _record_timing("warmup_forward_s", forward_started)
+        _record_timing("warmup_total_s", started)
+        logging.info(f"Model warm-up finished: {cold_start_report()}")
+
+    if not background:
+        _warm()
+        return None
+    thread = threading.Thread(target=_warm, name="emotion-utils-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def cold_start_report() -> dict:
+    """Returns import time, model load times, warm-up time and first-request latency in seconds."""
+    return dict(_timings)
+
+# Sentences per slice when classification is streamed to the UI
+STREAM_SLICE_SIZE = int(os.environ.get("CINEMOOD_STREAM_SLICE_SIZE", "16"))
+
+# Optional replacement for the in-process batcher (e.g. an InferenceScheduler shared by all requests)
+_inference_runner = None
+
+def set_inference_runner(runner) -> None:
+    """
+    Routes cache misses through `runner` (a callable taking a list of sentences and
+    returning one pipeline output per sentence) instead of calling the batcher directly.
+    Pass None to restore the default.
+    """
+    global _inference_runner
+    _inference_runner = runner
+
+def _infer(texts: list[str]) -> list:
+    if _inference_runner is not None:
+        return _inference_runner(texts)
+    return get_batcher()(texts)
+
+# Optional first stage that answers confident sentences before the transformer (CINEMOOD_CASCADE=1, see cascade.py)
+_cascade = load_cascade(MODEL_NAME, CACHE_REVISION) if CASCADE_ENABLED else None
+
+def set_cascade(cascade: Cascade | None) -> None:
+    """Replaces the classification cascade (None sends every sentence to the transformer)."""
+    global _cascade
+    _cascade = cascade
+
+def _classify(texts: list[str]) -> tuple[list, np.ndarray]:
+    """Outputs for texts, and which of them the transformer produced (the rest came from the cascade's first stage)."""
+    if _cascade is None:
+        return _infer(texts), np.ones(len(texts), dtype=bool)
+    return _cascade(texts, _infer)
+
+# Persistent per-sentence score cache (set CINEMOOD_SCORE_CACHE_DISABLED=1 to bypass)
+score_cache = None
+if os.environ.get("CINEMOOD_SCORE_CACHE_DISABLED") != "1":
+    try:
+        score_cache = ScoreCache()
+    except Exception as e:
+        logging.error(f"Failed to open emotion score cache, continuing without it: {e}")
+        score_cache = None
+
+def set_score_cache(cache: ScoreCache | None) -> None:
+    """Replaces the per-sentence score cache (None disables caching)."""
+    global score_cache
+    score_cache = cache
 
 def chunk_text_nltk(text: str) -> list[str]:
     """Chunks text into sentences using NLTK."""
     if not text:
         return []
     try:
+        import nltk
+        ensure_punkt()
         sentences = nltk.sent_tokenize(text)
         return [s.strip() for s in sentences if s.strip()] # Remove empty strings
     except Exception as e:
@@ -48,78 +232,230 @@ def chunk_text_nltk(text: str) -> list[str]:
         # Fallback: split by newline if NLTK fails
         return [s.strip() for s in text.split('\n') if s.strip()]
 
-def chunk_text_spacy(text: str) -> list[str]:
-    """Chunks text into sentences using SpaCy."""
+def chunk_text_spacy(text: str, mode: str = DEFAULT_SEGMENTER_MODE) -> list[str]:
+    """
+    Chunks text into sentences using SpaCy.
+
+    `mode` selects how much of the pipeline runs (see segmentation.SEGMENTER_MODES);
+    the default 'full' runs the whole model, 'senter' only the sentence recognizer.
+    """
+    return [segment.text for segment in chunk_text_spacy_offsets(text, mode)]
+
+def chunk_text_spacy_offsets(text: str, mode: str = DEFAULT_SEGMENTER_MODE) -> list[Segment]:
+    """Like chunk_text_spacy, but returns Segment(text, start, end) with character offsets into `text`."""
+    nlp = get_nlp(mode) if text else None
     if not text or not nlp:
-        return chunk_text_nltk(text) # Fallback to NLTK if SpaCy not loaded or text empty
+        return _nltk_segments(text) # Fallback to NLTK if SpaCy not loaded or text empty
     try:
-        doc = nlp(text)
-        sentences = [sent.text.strip() for sent in doc.sents if sent.text.strip()]
-        return sentences
+        with metrics.span("segment"):
+            return segment_texts([text], mode=mode, n_process=1)[0]
     except Exception as e:
         logging.error(f"Error during SpaCy sentence tokenization: {e}")
-        return chunk_text_nltk(text) # Fallback to NLTK
+        return _nltk_segments(text) # Fallback to NLTK
+
+def chunk_text_scenes(text: str, mode: str = DEFAULT_SEGMENTER_MODE,
+                      target_tokens: int = DEFAULT_SCENE_TOKENS,
+                      overlap: int = DEFAULT_WINDOW_OVERLAP) -> list[Scene]:
+    """
+    Chunks text into token-sized scenes using the classifier's own tokenizer.
+
+    Short consecutive sentences are merged up to `target_tokens`; sentences longer
+    than the model accepts are split into overlapping windows (see scene_windows).
+    Falls back to one scene per sentence if the classifier is unavailable.
+    """
+    segments = chunk_text_spacy_offsets(text, mode)
+    batcher = get_batcher() if segments else None
+    if batcher is None:
+        return sentence_scenes(segments)
+    with metrics.span("scene_windows"):
+        # The batcher's counting tokenizer, safe to share with concurrent inference
+        return build_scenes(text, segments, batcher.tokenizer, target_tokens, overlap)
+
+def chunk_text(text: str, chunking: str = DEFAULT_CHUNKING) -> list[str] | list[Scene]:
+    """
+    Chunks text for classification in the configured chunking mode.
+
+    Returns sentences for 'sentence' (chunk_text_spacy) and Scene objects for
+    'scene' (chunk_text_scenes); classify_emotions accepts either.
+    """
+    if chunking not in CHUNKING_MODES:
+        raise ValueError(f"Unknown chunking mode '{chunking}'. Expected one of {CHUNKING_MODES}.")
+    if chunking == "scene":
+        return chunk_text_scenes(text)
+    return chunk_text_spacy(text)
+
+def _is_scenes(chunks: list) -> bool:
+    return bool(chunks) and isinstance(chunks[0], Scene)
+
+def _nltk_segments(text: str) -> list[Segment]:
+    """Locates NLTK sentences in the source text to recover their character offsets."""
+    segments = []
+    cursor = 0
+    for sentence in chunk_text_nltk(text):
+        start = text.find(sentence, cursor)
+        if start < 0:
+            start = cursor
+        segments.append(Segment(sentence, start, start + len(sentence)))
+        cursor = start + len(sentence)
+    return segments
+
+def iter_score_chunks(chunks: list[str], slice_size: int | None = None):
+    """
+    Scores chunks slice by slice, in scene order.
+
+    Scores are looked up in the persistent score cache first; only the misses
+    are classified, in length-sorted token-budgeted batches, and written back.
+    In cascade mode the first stage answers the misses it is confident about.
+
+    Args:
+        chunks: Sentences to score.
+        slice_size: Sentences per slice; None scores everything as a single slice.
+
+    Yields:
+        (offset, outputs) where outputs[i] is the score vector of chunks[offset + i].
+    """
+    slice_size = slice_size or max(1, len(chunks))
+    for offset in range(0, len(chunks), slice_size):
+        part = chunks[offset:offset + slice_size]
+        metrics.SENTENCES_CLASSIFIED.inc(len(part))
+        if score_cache is None:
+            with metrics.span("inference"):
+                outputs, _ = _classify(part)
+            yield offset, outputs
+            continue
+
+        keys = [sentence_key(chunk, MODEL_NAME, CACHE_REVISION) for chunk in part]
+        cached = score_cache.get_many(keys)
+        # Deduplicate misses so repeated sentences cost a single forward pass
+        missing = {}
+        for key, chunk in zip(keys, part):
+            if key not in cached and key not in missing:
+                missing[key] = chunk
+        metrics.SCORE_CACHE.inc(len(part) - len(missing), "hit")
+        metrics.SCORE_CACHE.inc(len(missing), "miss")
+        if missing:
+            logging.info(f"Score cache: {len(part) - len(missing)} cached, {len(missing)} to classify.")
+            with metrics.span("inference"):
+                outputs, modelled = _classify(list(missing.values()))
+            fresh = dict(zip(missing.keys(), outputs))
+            # Only transformer scores are cached; first-stage answers are cheap to recompute
+            score_cache.put_many({key: output for (key, output), keep in zip(fresh.items(), modelled) if keep})
+            cached.update(fresh)
+        yield offset, [cached[key] for key in keys]
+
+def score_chunks(chunks: list[str]) -> list[list[dict]]:
+    """Returns the full emotion score vector for every chunk, in input order (cache first, then the model)."""
+    outputs = []
+    for _, part in iter_score_chunks(chunks):
+        outputs.extend(part)
+    return outputs
+
+def _iter_chunk_scores(chunks: list[str] | list[Scene], slice_size: int | None = None):
+    """
+    Like iter_score_chunks, but yields (offset, EmotionScores) and also accepts scenes.
+
+    The windows of a slice of scenes are scored together (through the cache) and
+    averaged back into one row per scene.
+    """
+    if not _is_scenes(chunks):
+        for offset, outputs in iter_score_chunks(chunks, slice_size):
+            yield offset, EmotionScores.from_outputs(outputs)
+        return
+    slice_size = slice_size or max(1, len(chunks))
+    for offset in range(0, len(chunks), slice_size):
+        part = chunks[offset:offset + slice_size]
+        window_scores = EmotionScores.from_outputs(score_chunks(window_texts(part)))
+        yield offset, EmotionScores(aggregate_windows(window_scores.matrix, part))
+
+def _scores_frame(offset: int, chunks: list[str] | list[Scene], scores: EmotionScores) -> pd.DataFrame:
+    """
+    Builds the analysis table with the full score matrix attached (scenes numbered from offset + 1).
+
+    Scenes get an extra 'Sentences' column with the sentence numbers each row covers.
+    """
+    texts = [scene.text for scene in chunks] if _is_scenes(chunks) else chunks
+    for i in np.flatnonzero(scores.dominant_index() < 0):
+        # Handle cases where the classifier might return an unexpected format or empty result
+        logging.warning(f"Could not classify emotion for chunk {offset + i + 1}: '{texts[i][:50]}...'")
+    analysis_df = scores.to_frame(texts, scene_offset=offset)
+    if _is_scenes(chunks):
+        analysis_df.insert(1, "Sentences", [scene.sentence_label() for scene in chunks])
+    return analysis_df
 
-def classify_emotions(chunks: list[str]) -> pd.DataFrame:
+def classify_emotions_stream(chunks: list[str] | list[Scene], slice_size: int = STREAM_SLICE_SIZE):
+    """
+    Classifies chunks incrementally, for progressive display.
+
+    Yields:
+        A DataFrame ('Scene', 'Chunk', 'Emotion', 'Score') per completed slice, in
+        scene order.
+
+    Raises:
+        PoolBusyError: If the inference workers reject the request.
+        Exception: Whatever the pipeline raised (after logging it), so a stream that
+            fails partway is never mistaken for a complete analysis.
+    """
+    if not chunks or not get_emotion_classifier():
+        logging.warning("Emotion classification skipped: No chunks or classifier unavailable.")
+        return
+
+    logging.info(f"Streaming emotion classification for {len(chunks)} chunks...")
+    busy = 0.0 # Time spent classifying, excluding the consumer's work between slices
+    started = time.perf_counter()
+    try:
+        for offset, scores in _iter_chunk_scores(chunks, slice_size):
+            frame = _scores_frame(offset, chunks[offset:offset + len(scores)], scores)
+            busy += time.perf_counter() - started
+            yield frame
+            started = time.perf_counter()
+    except PoolBusyError:
+        raise # Backpressure; the caller tells the user to retry
+    except Exception as e:
+        logging.error(f"Error during emotion classification pipeline: {e}")
+        raise
+    _observe_classify(len(chunks), busy)
+    logging.info("Emotion classification completed.")
+
+def classify_emotions(chunks: list[str] | list[Scene]) -> pd.DataFrame:
     """
     Classifies the dominant emotion for each text chunk.
 
     Args:
-        chunks: A list of text strings (scenes/sentences).
+        chunks: A list of text strings (scenes/sentences), or Scene objects
+            from chunk_text_scenes (adds a 'Sentences' column).
 
     Returns:
         A pandas DataFrame with columns: 'Scene', 'Chunk', 'Emotion', 'Score'.
+        The full (scenes x emotions) float32 score matrix is attached as
+        an EmotionScores; retrieve it with emotion_scores.get_emotion_scores(df).
         Returns an empty DataFrame if classification fails or input is empty.
     """
-    if not chunks or not emotion_classifier:
+    if not chunks or not get_emotion_classifier():
         logging.warning("Emotion classification skipped: No chunks or classifier unavailable.")
         return pd.DataFrame(columns=['Scene', 'Chunk', 'Emotion', 'Score'])
 
-    results = []
+    first_request = "first_request_s" not in _timings
+    request_started = time.perf_counter()
+
     logging.info(f"Classifying emotions for {len(chunks)} chunks...")
     try:
-        # Process chunks in batches if needed (Hugging Face pipeline handles this efficiently)
-        # The pipeline can take a list of strings directly
-        model_outputs = emotion_classifier(chunks)
-
-        for i, (chunk, output) in enumerate(zip(chunks, model_outputs)):
-             # output is potentially a list of dicts [{'label': '...', 'score': ...}, ...]
-             # If top_k=None, find the one with the highest score
-             # If top_k=1 (or default), the first element is the dominant one
-             # Need to handle both possibilities depending on pipeline setup
-
-             if isinstance(output, list) and output: # Check if it's a list and not empty
-                 # If top_k=None, find max score emotion
-                 if len(output) > 1:
-                     dominant_emotion = max(output, key=lambda x: x['score'])
-                 # If top_k=1 (or default), the first element is the dominant one
-                 else:
-                      dominant_emotion = output[0]
-
-                 results.append({
-                     "Scene": i + 1,
-                     "Chunk": chunk,
-                     "Emotion": dominant_emotion['label'],
-                     "Score": round(dominant_emotion['score'], 4)
-                 })
-             else:
-                 # Handle cases where the classifier might return an unexpected format or empty result
-                 logging.warning(f"Could not classify emotion for chunk {i+1}: '{chunk[:50]}...'")
-                 results.append({
-                     "Scene": i + 1,
-                     "Chunk": chunk,
-                     "Emotion": "unknown",
-                     "Score": 0.0
-                 })
-
+        # Cached scores are reused; only unseen sentences reach the pipeline
+        scores = EmotionScores.concatenate([scores for _, scores in _iter_chunk_scores(chunks)])
+        analysis_df = _scores_frame(0, chunks, scores)
     except Exception as e:
         logging.error(f"Error during emotion classification pipeline: {e}")
-        # Return partial results if any, or an empty DataFrame
-        if not results:
-             return pd.DataFrame(columns=['Scene', 'Chunk', 'Emotion', 'Score'])
+        return pd.DataFrame(columns=['Scene', 'Chunk', 'Emotion', 'Score'])
 
+    if first_request:
+        _record_timing("first_request_s", request_started)
+    _observe_classify(len(chunks), time.perf_counter() - request_started)
     logging.info("Emotion classification completed.")
-    return pd.DataFrame(results)
+    return analysis_df
+
+def _observe_classify(n_chunks: int, seconds: float) -> None:
+    metrics.SPAN_SECONDS.observe(seconds, "classify")
+    if seconds > 0:
+        metrics.CLASSIFY_RATE.observe(n_chunks / seconds)
 
 
 def generate_insights(analysis_df: pd.DataFrame) -> str:
@@ -136,8 +472,13 @@ def generate_insights(analysis_df: pd.DataFrame) -> str:
         return "No analysis data available to generate insights."
 
     try:
+        # Every figure below comes from the vectorized arc analytics over the score matrix
+        scores = get_emotion_scores(analysis_df)
+        arc = analyze_film(scores)
         total_scenes = len(analysis_df)
-        emotion_counts = analysis_df['Emotion'].value_counts()
+        emotion_counts = pd.Series(arc["emotion_counts"], index=scores.labels)
+        emotion_counts[UNKNOWN_LABEL] = total_scenes - emotion_counts.sum()
+        emotion_counts = emotion_counts[emotion_counts > 0].sort_values(ascending=False, kind="stable")
         most_common_emotion = emotion_counts.idxmax()
         most_common_count = emotion_counts.max()
         most_common_perc = round((most_common_count / total_scenes) * 100, 1)
@@ -146,11 +487,6 @@ def generate_insights(analysis_df: pd.DataFrame) -> str:
         insight = f"The analysis covers {total_scenes} scenes (text chunks).\n\n"
         insight += f"The most dominant emotion throughout the plot is **{most_common_emotion}**, appearing in {most_common_count} scenes ({most_common_perc}%).\n\n"
 
-        # Add more insights (optional)
-        # - Emotion shifts: Look for sequences like joy -> sadness
-        # - Intensity: Are scores generally high or low?
-        # - Climax hint: Is there a peak of negative emotions like fear/anger/sadness around the middle/end?
-
         # Example: Mention top 3 emotions
         top_3 = emotion_counts.head(3).index.tolist()
         insight += f"Other prominent emotions include: {', '.join(top_3[1:])}." # Assuming at least 2 emotions exist
@@ -168,12 +504,35 @@ def generate_insights(analysis_df: pd.DataFrame) -> str:
         # Add significance of the *most common* emotion
         insight += f"\n\nThe prevalence of **{most_common_emotion}** often indicates that {significance.get(most_common_emotion, 'the emotional core revolves around this feeling.')}"
 
+        # Emotion shifts: how often the dominant emotion changes between consecutive scenes
+        if arc["shift_counts"] > 0:
+            shift_from = scores.labels[arc["top_shift_from"]]
+            shift_to = scores.labels[arc["top_shift_to"]]
+            insight += f"\n\nThe dominant emotion shifts {arc['shift_counts']} times; the most frequent shift is **{shift_from} -> {shift_to}**."
+
+        # Intensity: are the scores generally high or low?
+        high_share = round(float(arc["high_intensity_share"]) * 100, 1)
+        tone = "strongly expressed" if arc["mean_intensity"] >= HIGH_INTENSITY_THRESHOLD else "fairly muted"
+        insight += f"\n\nEmotions are {tone} overall (average confidence {arc['mean_intensity']:.2f}), with {high_share}% of scenes highly intense."
+
+        # Climax hint: peak of smoothed negative emotions (fear/anger/sadness/disgust)
+        if total_scenes > 2 and arc["climax_tension"] > 0:
+            position = float(arc["climax_position"])
+            stage = "early" if position < 1 / 3 else "in the middle" if position < 2 / 3 else "late"
+            insight += f"\n\nTension peaks around scene {arc['climax_scene'] + 1} ({position:.0%} of the way through), suggesting a climax {stage} in the story."
+
+        # Arc shape: overall trajectory of positive vs negative emotion
+        if total_scenes > 2:
+            insight += f"\n\nThe emotional arc follows {describe_shape(arc['shape_signs'])}."
+
         return insight
 
     except Exception as e:
         logging.error(f"Error generating insights: {e}")
         return "Could not generate insights due to an error."
 
+_record_timing("import_s", _IMPORT_STARTED)
+
 # Example usage (optional)
 if __name__ == "__main__":
     sample_plot = """
@@ -185,7 +544,7 @@ if __name__ == "__main__":
     chunks = chunk_text_spacy(sample_plot) # Use SpaCy
     print("Chunks:", chunks)
 
-    if emotion_classifier:
+    if get_emotion_classifier():
         analysis = classify_emotions(chunks)
         print("\nAnalysis DataFrame:")
         print(analysis)
@@ -194,4 +553,5 @@ if __name__ == "__main__":
         print("\nInsights:")
         print(insights)
     else:
-        print("\nEmotion classifier not loaded, skipping analysis.") 
\ No newline at end of file
+        print("\nEmotion classifier not loaded, skipping analysis.")
+    print("\nCold start:", cold_start_report())
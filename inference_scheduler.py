@@ -0,0 +1,187 @@
+# inference_scheduler.py
+import collections
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get("CINEMOOD_SCHEDULER_MAX_BATCH", "64"))
+DEFAULT_MAX_WAIT_MS = float(os.environ.get("CINEMOOD_SCHEDULER_MAX_WAIT_MS", "15"))
+# Number of recent waits kept for the p50/p99 figures
+_WAIT_WINDOW = 10000
+
+
+class _Request:
+    """Sentences from one caller, with a slot for each result and the future to resolve."""
+
+    def __init__(self, sentences: list[str]):
+        self.sentences = sentences
+        self.results = [None] * len(sentences)
+        self.remaining = len(sentences)
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class InferenceScheduler:
+    """
+    Cross-request micro-batching in front of a single model instance.
+
+    Every caller's sentences go onto one queue. A single worker thread forms a
+    batch as soon as `max_batch_size` sentences are waiting or the oldest one
+    has waited `max_wait_ms`, runs it through `run_batch`, and routes each
+    output back to the request it came from. Requests larger than a batch are
+    simply spread over several batches.
+
+    Args:
+        run_batch: Callable taking a list of sentences and returning one output per sentence.
+        max_batch_size: Maximum sentences per forward pass.
+        max_wait_ms: Longest time a sentence waits for its batch to fill.
+    """
+
+    def __init__(self, run_batch,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._pending = collections.deque()  # (request, index) pairs taken off the queue but not yet batched
+        self._stats_lock = threading.Lock()
+        self._waits_ms = collections.deque(maxlen=_WAIT_WINDOW)
+        self._batches = 0
+        self._batched_sentences = 0
+        self._queued_sentences = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="inference-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, sentences: list[str]) -> Future:
+        """Queues sentences for classification and returns a Future of their outputs in input order."""
+        request = _Request(list(sentences))
+        if not request.sentences:
+            request.future.set_result([])
+            return request.future
+        if self._stopped.is_set():
+            raise RuntimeError("Inference scheduler has been stopped.")
+        with self._stats_lock:
+            self._queued_sentences += len(request.sentences)
+        self._queue.put(request)
+        return request.future
+
+    def __call__(self, sentences: list[str]) -> list:
+        """Blocking helper: submit and wait for the outputs."""
+        return self.submit(sentences).result()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        """Stops the worker after the current batch; queued requests fail with RuntimeError."""
+        self._stopped.set()
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _take(self, block_until: float | None) -> bool:
+        """Moves one request from the queue to the pending deque. Returns False on timeout or stop."""
+        try:
+            if block_until is None:
+                request = self._queue.get()
+            else:
+                remaining = block_until - time.perf_counter()
+                if remaining <= 0:
+                    request = self._queue.get_nowait()
+                else:
+                    request = self._queue.get(timeout=remaining)
+        except queue.Empty:
+            return False
+        if request is None:
+            return False
+        self._pending.extend((request, i) for i in range(len(request.sentences)))
+        return True
+
+    def _loop(self) -> None:
+        while not self._stopped.is_set():
+            if not self._pending and not self._take(None):
+                continue
+            # The deadline is set by the oldest waiting sentence
+            deadline = self._pending[0][0].enqueued_at + self.max_wait
+            while len(self._pending) < self.max_batch_size and not self._stopped.is_set():
+                if not self._take(deadline):
+                    break
+            batch = [self._pending.popleft() for _ in range(min(self.max_batch_size, len(self._pending)))]
+            self._run(batch)
+        self._fail_pending(RuntimeError("Inference scheduler has been stopped."))
+
+    def _run(self, batch: list) -> None:
+        started = time.perf_counter()
+        with self._stats_lock:
+            self._batches += 1
+            self._batched_sentences += len(batch)
+            self._queued_sentences -= len(batch)
+            self._waits_ms.extend((started - request.enqueued_at) * 1000 for request, _ in batch)
+        try:
+            outputs = self.run_batch([request.sentences[i] for request, i in batch])
+        except Exception as e:
+            logging.error(f"Inference scheduler batch failed: {e}")
+            for request, _ in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        for (request, i), output in zip(batch, outputs):
+            if request.future.done():
+                continue # Already failed by an earlier batch
+            request.results[i] = output
+            request.remaining -= 1
+            if request.remaining == 0:
+                request.future.set_result(request.results)
+
+    def _fail_pending(self, error: Exception) -> None:
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                self._pending.extend((request, i) for i in range(len(request.sentences)))
+        for request, _ in self._pending:
+            if not request.future.done():
+                request.future.set_exception(error)
+        self._pending.clear()
+
+    def stats(self) -> dict:
+        """Returns queue depth, batch fill ratio and p50/p99 queue wait in milliseconds."""
+        with self._stats_lock:
+            waits = sorted(self._waits_ms)
+            batches, batched, queued = self._batches, self._batched_sentences, self._queued_sentences
+        return {
+            "queue_depth": queued,
+            "batches": batches,
+            "sentences": batched,
+            "batch_fill_ratio": round(batched / (batches * self.max_batch_size), 4) if batches else 0.0,
+            "wait_p50_ms": round(_percentile(waits, 0.50), 3),
+            "wait_p99_ms": round(_percentile(waits, 0.99), 3),
+        }
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    def fake_model(sentences):
+        time.sleep(0.02) # One forward pass, regardless of batch size
+        return [[{"label": "neutral", "score": 1.0}] for _ in sentences]
+
+    scheduler = InferenceScheduler(fake_model, max_batch_size=32, max_wait_ms=10)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda n: scheduler([f"Sentence {n}.{i}" for i in range(n % 7 + 1)]), range(200)))
+    print("Requests served:", len(results))
+    print("Stats:", scheduler.stats())
+    scheduler.stop()
@@ -0,0 +1,421 @@
+# metrics.py
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logging.basicConfig(level=logging.INFO)
+
+# Collection is on by default; with CINEMOOD_METRICS=0 every call returns after a single flag check
+ENABLED = os.environ.get("CINEMOOD_METRICS", "1") == "1"
+# Address of the Prometheus text endpoint started by app.py (GET /metrics); loopback only unless set
+METRICS_HOST = os.environ.get("CINEMOOD_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("CINEMOOD_METRICS_PORT", "9464"))
+# If set, every analysis writes its per-stage trace as JSON into this directory
+TRACE_DIR = os.environ.get("CINEMOOD_TRACE_DIR")
+
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def set_enabled(enabled: bool) -> None:
+    """Turns collection on or off at runtime (e.g. to measure instrumentation overhead)."""
+    global ENABLED
+    ENABLED = enabled
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic count per label combination, exported as the `<name>_total` family."""
+
+    kind = "counter"
+    suffix = "_total" # Part of the family name in # HELP / # TYPE too, as strict parsers require
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labelvalues) -> None:
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        with self._lock:
+            return self._values.get(labelvalues, 0)
+
+    def drain(self) -> dict:
+        """Returns and clears the counts recorded so far (see Registry.drain)."""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: dict) -> None:
+        with self._lock:
+            for labels, value in values.items():
+                self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self.suffix}{_format_labels(self.labelnames, labels)} {_format_number(value)}"
+                for labels, value in items]
+
+
+class Gauge(Counter):
+    """Last value set per label combination."""
+
+    kind = "gauge"
+    suffix = ""
+
+    def set(self, value: float, *labelvalues) -> None:
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def drain(self) -> dict:
+        return {} # A last value is only meaningful in the process that set it
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_number(value)}"
+                for labels, value in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination, exported in the Prometheus format."""
+
+    kind = "histogram"
+    suffix = "" # Samples add _bucket/_sum/_count to the family name
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = TIME_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {} # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues) -> None:
+        if not ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labelvalues) -> int:
+        with self._lock:
+            series = self._series.get(labelvalues)
+            return sum(series[:-1]) if series else 0
+
+    def drain(self) -> dict:
+        """Returns and clears the observations recorded so far (see Registry.drain)."""
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def merge(self, series: dict) -> None:
+        with self._lock:
+            for labels, values in series.items():
+                current = self._series.get(labels)
+                if current is None:
+                    self._series[labels] = list(values)
+                else:
+                    self._series[labels] = [a + b for a, b in zip(current, values)]
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = []
+        for labels, series in items:
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                running += count
+                le = "+Inf" if bound == float("inf") else _format_number(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {running}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_number(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {running}")
+        return lines
+
+
+class Registry:
+    """Named metrics, rendered together as one Prometheus text exposition."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = TIME_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def drain(self) -> dict:
+        """
+        Returns and clears everything counted or observed here since the last drain.
+
+        Inference workers drain their registry after each task and send the result
+        back with it; the parent merges it into its own, so worker-side metrics
+        (forward passes, batch sizes) appear on the parent's endpoint. Gauges stay local.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: values for metric in metrics if (values := metric.drain())}
+
+    def merge(self, snapshot: dict) -> None:
+        """Adds a snapshot from drain() (e.g. sent by a worker process) to this registry."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        for name, values in snapshot.items():
+            if name in metrics:
+                metrics[name].merge(values)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            family = metric.name + metric.suffix
+            lines.append(f"# HELP {family} {metric.help}")
+            lines.append(f"# TYPE {family} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Shared metrics; modules import these instead of registering their own duplicates
+SPAN_SECONDS = registry.histogram("cinemood_span_seconds", "Duration of instrumented pipeline spans.", ("span",))
+PLOT_FETCHES = registry.counter("cinemood_plot_fetches", "Plot lookups by where they were answered from.", ("source",))
+SENTENCES_CLASSIFIED = registry.counter("cinemood_sentences_classified", "Sentences scored (cache hits included).")
+CLASSIFY_RATE = registry.histogram("cinemood_classify_sentences_per_second", "Sentences per second of each classification call.",
+                                   buckets=(10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+BATCH_SIZE = registry.histogram("cinemood_inference_batch_size", "Sentences per model forward pass.", buckets=SIZE_BUCKETS)
+SCORE_CACHE = registry.counter("cinemood_score_cache_lookups", "Per-sentence score cache lookups.", ("result",))
+RENDER_CACHE = registry.counter("cinemood_render_cache_lookups", "Chart render cache lookups.", ("chart", "result"))
+ANALYSES = registry.counter("cinemood_analyses", "Finished analyses by outcome.", ("status",))
+POOL_IN_FLIGHT = registry.gauge("cinemood_pool_tasks_in_flight", "Inference tasks queued or running in the worker pool.")
+POOL_TASKS = registry.counter("cinemood_pool_tasks", "Worker pool tasks by outcome.", ("result",))
+CASCADE_SENTENCES = registry.counter("cinemood_cascade_sentences", "Texts scored in cascade mode, by the stage that answered.", ("route",))
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """Times a block into cinemood_span_seconds{span=name}; attributes only reach the trace, if any."""
+
+    __slots__ = ("name", "trace", "attrs", "started", "duration")
+
+    def __init__(self, name: str, trace: "Trace | None" = None, attrs: dict | None = None):
+        self.name = name
+        self.trace = trace
+        self.attrs = attrs or {}
+        self.started = 0.0
+        self.duration = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.started
+        SPAN_SECONDS.observe(self.duration, self.name)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        if self.trace is not None:
+            self.trace._add(self)
+        return False
+
+    def set(self, **attrs) -> None:
+        """Adds attributes (e.g. sentence counts) to the span's trace entry."""
+        self.attrs.update(attrs)
+
+
+def span(name: str, **attrs):
+    """Context manager timing a pipeline stage; a shared no-op when metrics are disabled."""
+    if not ENABLED:
+        return _NOOP_SPAN
+    return Span(name, None, attrs)
+
+
+def timed(name: str):
+    """Decorator recording every call of the function as a span."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class Trace:
+    """
+    Spans of one request, dumped as JSON to CINEMOOD_TRACE_DIR when finished.
+
+    Traces are passed explicitly rather than kept in a context variable,
+    because Gradio may advance a streaming handler on a different worker
+    thread at every yield.
+    """
+
+    def __init__(self, name: str, **attrs):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.attrs = attrs
+        self.wall_started = time.time()
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attrs):
+        if not ENABLED:
+            return _NOOP_SPAN
+        return Span(name, self, attrs)
+
+    def record(self, name: str, started: float, duration: float, **attrs) -> None:
+        """Adds a stage timed elsewhere (e.g. across the yields of a streaming handler) to this trace only."""
+        if not ENABLED:
+            return
+        finished = Span(name, self, attrs)
+        finished.started, finished.duration = started, duration
+        self._add(finished)
+
+    def _add(self, finished: Span) -> None:
+        with self._lock:
+            self.spans.append({
+                "name": finished.name,
+                "start_ms": round((finished.started - self.started) * 1000, 3),
+                "duration_ms": round(finished.duration * 1000, 3),
+                **({"attrs": finished.attrs} if finished.attrs else {}),
+            })
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        return {"id": self.id, "name": self.name, "started": self.wall_started,
+                "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+                "attrs": self.attrs, "spans": spans}
+
+    def finish(self, **attrs) -> str | None:
+        """
+        Records final attributes and the end-to-end duration (as span `name`), then writes
+        the trace if CINEMOOD_TRACE_DIR is set. Returns the file path.
+        """
+        self.attrs.update(attrs)
+        SPAN_SECONDS.observe(time.perf_counter() - self.started, self.name)
+        if not (ENABLED and TRACE_DIR):
+            return None
+        try:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            path = os.path.join(TRACE_DIR, f"{int(self.wall_started)}-{self.name}-{self.id}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, indent=2, default=str)
+            return path
+        except OSError as e:
+            logging.error(f"Failed to write trace {self.id}: {e}")
+            return None
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes every few seconds would flood the log
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> ThreadingHTTPServer:
+    """
+    Serves GET /metrics in the Prometheus text format on a daemon thread.
+
+    Listens on loopback by default, so a public Gradio share link does not expose it;
+    set CINEMOOD_METRICS_HOST=0.0.0.0 for a scraper on another host.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.info(f"Metrics endpoint listening on http://{host}:{server.server_port}/metrics")
+    return server
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    trace = Trace("demo", title="Inception")
+    with trace.span("fetch"):
+        PLOT_FETCHES.inc(1, "backend")
+    with trace.span("classify") as current:
+        time.sleep(0.01)
+        SENTENCES_CLASSIFIED.inc(42)
+        current.set(sentences=42)
+    print(registry.render())
+    print(json.dumps(trace.to_dict(), indent=2))
+
+    set_enabled(False)
+    started = time.perf_counter()
+    for _ in range(100000):
+        with span("noop"):
+            pass
+    print(f"Disabled span overhead: {(time.perf_counter() - started) * 10:.3f} us per span")
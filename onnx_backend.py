@@ -0,0 +1,224 @@
+# onnx_backend.py
+import argparse
+import glob
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_ONNX_DIR = os.environ.get("CINEMOOD_ONNX_DIR", os.path.join(".cache", "onnx"))
+ONNX_FILENAME = "model.onnx"
+QUANTIZED_FILENAME = "model.int8.onnx"
+LABELS_FILENAME = "labels.json"
+MODEL_MAX_LENGTH = 512
+
+
+def export_onnx(model_name: str, revision: str = "main",
+                output_dir: str = DEFAULT_ONNX_DIR,
+                quantize: bool = True) -> str:
+    """
+    Exports the Hugging Face classifier to ONNX, optionally with a dynamic int8 copy.
+
+    The tokenizer and the id -> label mapping are saved next to the model so
+    the ONNX backend does not need PyTorch at inference time.
+
+    Returns:
+        The output directory.
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name, revision=revision)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name, revision=revision)
+    model.eval()
+
+    dummy = tokenizer(["Export sentence."], return_tensors="pt")
+    onnx_path = os.path.join(output_dir, ONNX_FILENAME)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"]),
+            onnx_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=14,
+        )
+    tokenizer.save_pretrained(output_dir)
+    labels = [model.config.id2label[i] for i in range(model.config.num_labels)]
+    with open(os.path.join(output_dir, LABELS_FILENAME), "w", encoding="utf-8") as f:
+        json.dump({"model": model_name, "revision": revision, "labels": labels}, f)
+    logging.info(f"Exported ONNX model to {onnx_path}")
+
+    if quantize:
+        quantize_onnx(output_dir)
+    return output_dir
+
+
+def quantize_onnx(model_dir: str = DEFAULT_ONNX_DIR) -> str:
+    """Writes the dynamic int8 copy of the exported model in `model_dir` and returns its path."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantized_path = os.path.join(model_dir, QUANTIZED_FILENAME)
+    quantize_dynamic(os.path.join(model_dir, ONNX_FILENAME), quantized_path, weight_type=QuantType.QInt8)
+    logging.info(f"Wrote dynamically quantized int8 model to {quantized_path}")
+    return quantized_path
+
+
+def exported_model(model_dir: str = DEFAULT_ONNX_DIR) -> tuple[str, str] | None:
+    """Returns the (model, revision) an export in `model_dir` was made from, or None if there is none."""
+    labels_path = os.path.join(model_dir, LABELS_FILENAME)
+    if not os.path.exists(os.path.join(model_dir, ONNX_FILENAME)) or not os.path.exists(labels_path):
+        return None
+    with open(labels_path, encoding="utf-8") as f:
+        exported = json.load(f)
+    return exported.get("model"), exported.get("revision")
+
+
+class OnnxEmotionClassifier:
+    """
+    ONNX Runtime drop-in for the transformers text-classification pipeline (top_k=None).
+
+    Calling it with a list of sentences returns, per sentence, a list of
+    {'label', 'score'} dicts sorted by descending score, exactly like the
+    PyTorch pipeline, so the batcher, cache and classify_emotions are unchanged.
+
+    Raises:
+        ValueError: If `model_name`/`revision` are given and the export in
+            `model_dir` was made from a different model or revision.
+        FileNotFoundError: If the requested model file (e.g. the int8 copy) is missing.
+    """
+
+    def __init__(self, model_dir: str = DEFAULT_ONNX_DIR, quantized: bool = False,
+                 intra_op_threads: int | None = None,
+                 model_name: str | None = None, revision: str | None = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, LABELS_FILENAME), encoding="utf-8") as f:
+            exported = json.load(f)
+        expected = (model_name or exported.get("model"), revision or exported.get("revision"))
+        if (exported.get("model"), exported.get("revision")) != expected:
+            raise ValueError(f"ONNX export in {model_dir} is {exported.get('model')}@{exported.get('revision')}, "
+                             f"not {expected[0]}@{expected[1]}; re-export it with `python onnx_backend.py export`.")
+        self.labels = exported["labels"]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        model_path = os.path.join(model_dir, QUANTIZED_FILENAME if quantized else ONNX_FILENAME)
+        if not os.path.exists(model_path):
+            hint = "run `python onnx_backend.py export` without --no-quantize" if quantized else "run `python onnx_backend.py export`"
+            raise FileNotFoundError(f"{model_path} does not exist; {hint}.")
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.quantized = quantized
+
+    def predict_proba(self, texts: list[str], batch_size: int | None = None) -> np.ndarray:
+        """Returns a (len(texts), n_labels) float32 array of softmax probabilities."""
+        batch_size = batch_size or len(texts) or 1
+        probabilities = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                     max_length=MODEL_MAX_LENGTH, return_tensors="np")
+            (logits,) = self.session.run(["logits"], {
+                "input_ids": encoded["input_ids"].astype(np.int64),
+                "attention_mask": encoded["attention_mask"].astype(np.int64),
+            })
+            logits = logits - logits.max(axis=1, keepdims=True)
+            exp = np.exp(logits)
+            probabilities.append((exp / exp.sum(axis=1, keepdims=True)).astype(np.float32))
+        if not probabilities:
+            return np.zeros((0, len(self.labels)), dtype=np.float32)
+        return np.concatenate(probabilities)
+
+    def __call__(self, texts, batch_size: int | None = None, truncation: bool = True, **kwargs):
+        single = isinstance(texts, str)
+        probabilities = self.predict_proba([texts] if single else list(texts), batch_size)
+        outputs = []
+        for row in probabilities:
+            order = np.argsort(-row)
+            outputs.append([{"label": self.labels[i], "score": float(row[i])} for i in order])
+        return outputs[0] if single else outputs
+
+
+def _reference_corpus(paths: list[str]) -> list[str]:
+    from emotion_utils import chunk_text_spacy
+    sentences = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            sentences.extend(chunk_text_spacy(f.read()))
+    return sentences
+
+
+def parity_report(sentences: list[str], reference, candidate, batch_size: int = 32) -> dict:
+    """
+    Compares two classifiers on the same sentences.
+
+    Returns:
+        Dominant-label agreement, mean/max absolute score drift over all labels,
+        and sentences/second for both classifiers.
+    """
+    def run(classifier):
+        started = time.perf_counter()
+        outputs = []
+        for start in range(0, len(sentences), batch_size):
+            outputs.extend(classifier(sentences[start:start + batch_size], batch_size=batch_size, truncation=True))
+        return outputs, time.perf_counter() - started
+
+    reference_outputs, reference_s = run(reference)
+    candidate_outputs, candidate_s = run(candidate)
+
+    agree = 0
+    drifts = []
+    for ref, cand in zip(reference_outputs, candidate_outputs):
+        ref_scores = {item["label"]: item["score"] for item in ref}
+        cand_scores = {item["label"]: item["score"] for item in cand}
+        agree += max(ref_scores, key=ref_scores.get) == max(cand_scores, key=cand_scores.get)
+        drifts.extend(abs(ref_scores[label] - cand_scores.get(label, 0.0)) for label in ref_scores)
+
+    drifts = np.asarray(drifts) if drifts else np.zeros(1)
+    return {
+        "sentences": len(sentences),
+        "label_agreement": round(agree / len(sentences), 4) if sentences else 0.0,
+        "mean_abs_score_drift": round(float(drifts.mean()), 5),
+        "max_abs_score_drift": round(float(drifts.max()), 5),
+        "reference_sentences_per_s": round(len(sentences) / reference_s, 1) if reference_s else 0.0,
+        "candidate_sentences_per_s": round(len(sentences) / candidate_s, 1) if candidate_s else 0.0,
+        "speedup": round(reference_s / candidate_s, 2) if candidate_s else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    from emotion_utils import MODEL_NAME, MODEL_REVISION
+
+    parser = argparse.ArgumentParser(description="Export the emotion model to ONNX and check parity with PyTorch.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Export to ONNX (and int8).")
+    export_parser.add_argument("--output-dir", default=DEFAULT_ONNX_DIR)
+    export_parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 model.")
+    parity_parser = subparsers.add_parser("parity", help="Compare ONNX against the PyTorch pipeline.")
+    parity_parser.add_argument("--model-dir", default=DEFAULT_ONNX_DIR)
+    parity_parser.add_argument("--quantized", action="store_true", help="Compare the int8 model.")
+    parity_parser.add_argument("--corpus", nargs="*", help="Plot text files (default: benchmarks/data/*_plot.txt).")
+    parity_parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(MODEL_NAME, MODEL_REVISION, args.output_dir, quantize=not args.no_quantize)
+    else:
+        from transformers import pipeline
+        corpus = args.corpus or sorted(glob.glob(os.path.join(os.path.dirname(__file__), "benchmarks", "data", "*_plot.txt")))
+        torch_classifier = pipeline("text-classification", model=MODEL_NAME, revision=MODEL_REVISION, top_k=None)
+        onnx_classifier = OnnxEmotionClassifier(args.model_dir, quantized=args.quantized,
+                                                model_name=MODEL_NAME, revision=MODEL_REVISION)
+        report = parity_report(_reference_corpus(corpus), torch_classifier, onnx_classifier, args.batch_size)
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,193 @@
+# plot_store.py
+import contextlib
+import logging
+import os
+import re
+import sqlite3
+import time
+
+logging.basicConfig(level=logging.INFO)
+
+# Default location and freshness of the local plot store (overridable via environment)
+DEFAULT_STORE_PATH = os.environ.get("CINEMOOD_PLOT_STORE", os.path.join(".cache", "plots.sqlite3"))
+DEFAULT_TTL = float(os.environ.get("CINEMOOD_PLOT_TTL", str(30 * 24 * 3600)))          # 30 days
+DEFAULT_NEGATIVE_TTL = float(os.environ.get("CINEMOOD_PLOT_NEGATIVE_TTL", str(24 * 3600)))  # 1 day
+
+# Sentinel returned by PlotStore.lookup for titles that are cached as "not found"
+NOT_FOUND = object()
+
+
+def normalize_title(title: str) -> str:
+    """Normalizes a user supplied title so trivially different spellings share a store entry."""
+    return re.sub(r"\s+", " ", title).strip().casefold()
+
+
+class PlotStore:
+    """
+    Persistent local store of fetched movie plots.
+
+    Two tables are kept: `titles` maps a normalized title to the resolved
+    Wikipedia page id (NULL for a cached "not found"), and `plots` holds the
+    plot text per page id, so different titles resolving to the same page
+    share one copy. Positive and negative entries expire after separate TTLs.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH,
+                 ttl: float = DEFAULT_TTL,
+                 negative_ttl: float = DEFAULT_NEGATIVE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS titles ("
+                " title TEXT PRIMARY KEY,"
+                " page_id TEXT,"
+                " fetched_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS plots ("
+                " page_id TEXT PRIMARY KEY,"
+                " page_title TEXT,"
+                " plot TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL)"
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Yields a connection in a transaction (committed, or rolled back on error), then closes it."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def lookup(self, title: str, allow_stale: bool = False):
+        """
+        Looks up a title in the store.
+
+        Args:
+            title: The movie title as entered by the user.
+            allow_stale: If True, expired entries are still returned (used in offline mode).
+
+        Returns:
+            The stored plot text, NOT_FOUND for a cached negative result, or None on a miss.
+        """
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT t.page_id, t.fetched_at, p.plot, p.fetched_at"
+                    " FROM titles t LEFT JOIN plots p ON p.page_id = t.page_id"
+                    " WHERE t.title = ?",
+                    (normalize_title(title),)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logging.error(f"Plot store lookup failed for '{title}': {e}")
+            return None
+
+        if row is None:
+            return None
+        page_id, title_fetched_at, plot, plot_fetched_at = row
+        if page_id is None:
+            if allow_stale or now - title_fetched_at < self.negative_ttl:
+                return NOT_FOUND
+            return None
+        if plot is None:
+            return None
+        if allow_stale or now - plot_fetched_at < self.ttl:
+            return plot
+        return None
+
+    def page_title(self, title: str) -> str | None:
+        """The Wikipedia page title a stored title resolved to (None if unknown or not found)."""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT p.page_title FROM titles t JOIN plots p ON p.page_id = t.page_id WHERE t.title = ?",
+                    (normalize_title(title),)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logging.error(f"Plot store page title lookup failed for '{title}': {e}")
+            return None
+        return row[0] if row else None
+
+    def put(self, title: str, page_id, page_title: str | None, plot: str) -> None:
+        """Stores a resolved plot for a title and its page id."""
+        now = time.time()
+        page_id = str(page_id)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO plots (page_id, page_title, plot, fetched_at) VALUES (?, ?, ?, ?)",
+                    (page_id, page_title, plot, now)
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO titles (title, page_id, fetched_at) VALUES (?, ?, ?)",
+                    (normalize_title(title), page_id, now)
+                )
+        except sqlite3.Error as e:
+            logging.error(f"Plot store write failed for '{title}': {e}")
+
+    def put_many(self, rows: list[tuple], aliases: list[tuple] = ()) -> None:
+        """
+        Stores many resolved plots in one transaction (bulk ingestion).
+
+        Args:
+            rows: (title, page_id, page_title, plot) tuples, as for put().
+            aliases: (title, page_id) pairs for alternative titles; an alias never
+                replaces an existing title entry.
+        """
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO plots (page_id, page_title, plot, fetched_at) VALUES (?, ?, ?, ?)",
+                    [(str(page_id), page_title, plot, now) for _, page_id, page_title, plot in rows]
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO titles (title, page_id, fetched_at) VALUES (?, ?, ?)",
+                    [(normalize_title(title), str(page_id), now) for title, page_id, _, _ in rows]
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO titles (title, page_id, fetched_at) VALUES (?, ?, ?)",
+                    [(normalize_title(title), str(page_id), now) for title, page_id in aliases]
+                )
+        except sqlite3.Error as e:
+            logging.error(f"Plot store bulk write of {len(rows)} plots failed: {e}")
+
+    def put_not_found(self, title: str) -> None:
+        """Records that a title could not be resolved, so it is not fetched again until the negative TTL expires."""
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO titles (title, page_id, fetched_at) VALUES (?, NULL, ?)",
+                    (normalize_title(title), time.time())
+                )
+        except sqlite3.Error as e:
+            logging.error(f"Plot store write failed for '{title}': {e}")
+
+    def stats(self) -> dict:
+        """Returns the number of stored titles, negative entries and plots."""
+        with self._connect() as conn:
+            titles = conn.execute("SELECT COUNT(*) FROM titles").fetchone()[0]
+            negatives = conn.execute("SELECT COUNT(*) FROM titles WHERE page_id IS NULL").fetchone()[0]
+            plots = conn.execute("SELECT COUNT(*) FROM plots").fetchone()[0]
+        return {"titles": titles, "not_found": negatives, "plots": plots}
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PlotStore(os.path.join(tmp, "plots.sqlite3"), ttl=60, negative_ttl=60)
+        store.put("Inception", 27009, "Inception", "Cobb enters a dream.")
+        store.put_not_found("NonExistent Movie 12345")
+        print("Lookup:", store.lookup("  inception "))
+        print("Negative:", store.lookup("NonExistent Movie 12345") is NOT_FOUND)
+        print("Stats:", store.stats())
@@ -0,0 +1,407 @@
+# recommender.py
+import argparse
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from arc_analytics import single_offsets
+from emotion_scores import EMOTION_LABELS, EmotionScores
+from plot_store import normalize_title
+
+logging.basicConfig(level=logging.INFO)
+
+# Saved index, loaded by the app at start (built from the catalog with `python recommender.py build`)
+DEFAULT_INDEX_PATH = os.environ.get("CINEMOOD_ARC_INDEX", os.path.join(".cache", "arc_index.npz"))
+# Points each per-emotion curve is resampled to
+SIGNATURE_SAMPLES = 16
+SIGNATURE_DIM = len(EMOTION_LABELS) * (SIGNATURE_SAMPLES + 1)
+# Weight of the overall emotion distribution relative to the whole arc block
+DISTRIBUTION_WEIGHT = 1.0
+# Films below which search is always brute force (an inverted file only pays off on large catalogs)
+IVF_MIN_FILMS = 20000
+# Films added one by one (live analyses) kept in the index; the least recently added beyond this are dropped
+DEFAULT_MAX_LIVE_FILMS = int(os.environ.get("CINEMOOD_ARC_MAX_LIVE_FILMS", "10000"))
+# Inverted lists probed per query
+DEFAULT_NPROBE = 8
+
+
+def arc_signatures(matrix: np.ndarray, offsets: np.ndarray, samples: int = SIGNATURE_SAMPLES) -> np.ndarray:
+    """
+    Fixed-length arc signatures of many films at once.
+
+    Each emotion's probability curve is resampled to `samples` segments of
+    equal relative length by averaging over them (exactly, via the cumulative
+    sum, so a 3-scene film and a 3,000-scene film are comparable). The film's
+    mean distribution is appended. The arc block is scaled by 1/sqrt(samples)
+    so that, in Euclidean distance, the shape of the arc and the overall mix
+    of emotions weigh about the same whatever `samples` is.
+
+    Args:
+        matrix: (total scenes x emotions) scores of all films, stacked.
+        offsets: Film offsets (see arc_analytics.stack_corpus).
+        samples: Segments per curve.
+
+    Returns:
+        (films x emotions * (samples + 1)) float32 signatures; zeros for empty films.
+    """
+    n_labels = matrix.shape[1] if matrix.ndim == 2 else len(EMOTION_LABELS)
+    lengths = np.diff(offsets).astype(np.float64)
+    cumulative = np.concatenate([np.zeros((1, n_labels)), np.cumsum(matrix, axis=0, dtype=np.float64)])
+    # Fractional row positions of every segment edge, per film
+    positions = offsets[:-1, None] + np.linspace(0.0, 1.0, samples + 1)[None, :] * lengths[:, None]
+    low = np.minimum(np.floor(positions).astype(np.intp), len(matrix))
+    high = np.minimum(low + 1, len(matrix))
+    fraction = (positions - low)[..., None]
+    at_edges = cumulative[low] + fraction * (cumulative[high] - cumulative[low])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        curves = np.diff(at_edges, axis=1) / (lengths / samples)[:, None, None] # (films, samples, emotions)
+        distribution = (cumulative[offsets[1:]] - cumulative[offsets[:-1]]) / lengths[:, None]
+    signatures = np.concatenate([
+        curves.transpose(0, 2, 1).reshape(len(lengths), -1) / np.sqrt(samples),
+        distribution * DISTRIBUTION_WEIGHT,
+    ], axis=1)
+    signatures[lengths == 0] = 0
+    return signatures.astype(np.float32)
+
+
+def arc_signature(scores: EmotionScores, samples: int = SIGNATURE_SAMPLES) -> np.ndarray:
+    """Signature of one film (or of a user's text classified with classify_emotions)."""
+    return arc_signatures(scores.matrix, single_offsets(len(scores)), samples)[0]
+
+
+def _squared_distances(vectors: np.ndarray, norms: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """(queries x vectors) squared Euclidean distances, via ||v||^2 - 2 q.v + ||q||^2."""
+    distances = norms[None, :] - 2.0 * (queries @ vectors.T)
+    distances += np.einsum("ij,ij->i", queries, queries)[:, None]
+    return np.maximum(distances, 0.0, out=distances)
+
+
+def _top_k(distances: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k smallest distances in each row, nearest first."""
+    k = min(k, distances.shape[1])
+    if k <= 0:
+        return np.zeros((len(distances), 0), dtype=np.intp)
+    part = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(distances, part, axis=1).argsort(axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+def kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd's k-means; empty clusters are re-seeded from random points. Returns the centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(centroids, vectors)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        sums = np.zeros_like(centroids, dtype=np.float64)
+        np.add.at(sums, assignment, vectors)
+        filled = counts > 0
+        centroids[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+        empty = np.flatnonzero(~filled)
+        centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+    return centroids
+
+
+def _nearest(centroids: np.ndarray, vectors: np.ndarray, block: int = 8192) -> np.ndarray:
+    """Nearest centroid of every vector, in blocks to bound the distance matrix."""
+    norms = np.einsum("ij,ij->i", centroids, centroids)
+    return np.concatenate([_squared_distances(centroids, norms, vectors[start:start + block]).argmin(axis=1)
+                           for start in range(0, len(vectors), block)]) if len(vectors) else np.zeros(0, np.intp)
+
+
+class ArcIndex:
+    """
+    Nearest-neighbour index of film arc signatures, for "films that feel like this" recommendations.
+
+    Vectors live in one growable float32 array, so search is a single matrix
+    product over all films (brute force, exact). After train() an inverted
+    file (IVF) is kept as well: films are bucketed by their nearest k-means
+    centroid and a query scans only the `nprobe` closest buckets, trading a
+    little recall for far fewer distance computations on large catalogs.
+    add() inserts incrementally in both structures; re-adding a title
+    replaces its signature. Films added with add() (live analyses) are capped
+    at `max_live_films`, dropping the least recently added first; bulk-loaded
+    films (catalog, saved index) are never dropped.
+    """
+
+    def __init__(self, samples: int = SIGNATURE_SAMPLES, max_live_films: int = DEFAULT_MAX_LIVE_FILMS):
+        self.samples = samples
+        self.max_live_films = max_live_films
+        self._live = OrderedDict() # normalized title -> None, for films added with add(), oldest first
+        self.dim = len(EMOTION_LABELS) * (samples + 1)
+        self.titles = []
+        self._rows = {} # normalized title -> row
+        self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._size = 0
+        self.centroids = None
+        self._assignment = np.zeros(0, dtype=np.intp)
+        self._lists = [] # Rows per inverted list
+        self._list_arrays = [] # Cached np.array of each list, None once it changes
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, title: str) -> bool:
+        return normalize_title(title) in self._rows
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._size + extra
+        if needed <= len(self._vectors):
+            return
+        capacity = max(needed, 2 * len(self._vectors), 1024)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        norms = np.zeros(capacity, dtype=np.float32)
+        norms[:self._size] = self._norms[:self._size]
+        assignment = np.full(capacity, -1, dtype=np.intp)
+        assignment[:self._size] = self._assignment[:self._size]
+        self._vectors, self._norms, self._assignment = vectors, norms, assignment
+
+    def add_signatures(self, titles: list[str], signatures: np.ndarray) -> None:
+        """Inserts (or replaces) many films' signatures."""
+        signatures = np.asarray(signatures, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            self._reserve(len(titles))
+            rows = []
+            for title in titles:
+                key = normalize_title(title)
+                row = self._rows.get(key)
+                if row is None:
+                    row = self._size
+                    self._rows[key] = row
+                    self.titles.append(title)
+                    self._size += 1
+                rows.append(row)
+            rows = np.array(rows, dtype=np.intp)
+            self._vectors[rows] = signatures
+            self._norms[rows] = np.einsum("ij,ij->i", signatures, signatures)
+            if self.centroids is not None:
+                self._assign(rows, _nearest(self.centroids, signatures))
+
+    def add(self, title: str, scores: EmotionScores) -> None:
+        """Inserts (or replaces) one analysed film, dropping the oldest live additions beyond the cap."""
+        key = normalize_title(title)
+        with self._lock:
+            bulk_loaded = key in self._rows and key not in self._live
+            self.add_signatures([title], arc_signature(scores, self.samples)[None, :])
+            if bulk_loaded:
+                return
+            self._live[key] = None
+            self._live.move_to_end(key)
+            while len(self._live) > self.max_live_films:
+                oldest, _ = self._live.popitem(last=False)
+                self._remove_row(self._rows[oldest])
+
+    def remove(self, title: str) -> bool:
+        """Drops a film from the index. Returns False if it was not indexed."""
+        with self._lock:
+            row = self._rows.get(normalize_title(title))
+            if row is None:
+                return False
+            self._live.pop(normalize_title(title), None)
+            self._remove_row(row)
+            return True
+
+    def _remove_row(self, row: int) -> None:
+        """Removes a row by moving the last row into its place (called with the lock held)."""
+        last = self._size - 1
+        del self._rows[normalize_title(self.titles[row])]
+        if self.centroids is not None:
+            self._lists[self._assignment[row]].remove(row)
+            self._list_arrays[self._assignment[row]] = None
+        if row != last:
+            self._vectors[row] = self._vectors[last]
+            self._norms[row] = self._norms[last]
+            self.titles[row] = self.titles[last]
+            self._rows[normalize_title(self.titles[row])] = row
+            if self.centroids is not None:
+                target = self._assignment[last]
+                self._lists[target][self._lists[target].index(last)] = row
+                self._list_arrays[target] = None
+                self._assignment[row] = target
+        self.titles.pop()
+        self._assignment[last] = -1
+        self._size -= 1
+
+    def add_films(self, titles: list[str], films: list[EmotionScores]) -> None:
+        """Inserts many analysed films, computing their signatures in one vectorized pass."""
+        from arc_analytics import stack_corpus
+        matrix, offsets = stack_corpus(films)
+        self.add_signatures(titles, arc_signatures(matrix, offsets, self.samples))
+
+    def _assign(self, rows: np.ndarray, lists: np.ndarray) -> None:
+        for row, target in zip(rows.tolist(), lists.tolist()):
+            previous = self._assignment[row]
+            if previous == target:
+                continue
+            if previous >= 0:
+                self._lists[previous].remove(row)
+                self._list_arrays[previous] = None
+            self._lists[target].append(row)
+            self._list_arrays[target] = None
+            self._assignment[row] = target
+
+    def train(self, n_lists: int | None = None, iterations: int = 10, sample: int = 50000, seed: int = 0) -> None:
+        """
+        Builds the inverted file: k-means on (a sample of) the signatures, then assigns every film.
+
+        n_lists defaults to about 4 * sqrt(films).
+        """
+        with self._lock:
+            if not self._size:
+                return
+            n_lists = min(n_lists or int(4 * np.sqrt(self._size)), self._size)
+            rng = np.random.default_rng(seed)
+            vectors = self._vectors[:self._size]
+            training = vectors if self._size <= sample else vectors[rng.choice(self._size, sample, replace=False)]
+            self.centroids = kmeans(training, n_lists, iterations, seed)
+            self._lists = [[] for _ in range(n_lists)]
+            self._list_arrays = [None] * n_lists
+            self._assignment[:] = -1
+            self._assign(np.arange(self._size), _nearest(self.centroids, vectors))
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        centroid_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        probes = _top_k(_squared_distances(self.centroids, centroid_norms, query[None, :]), nprobe)[0]
+        arrays = []
+        for probe in probes.tolist():
+            if self._list_arrays[probe] is None:
+                self._list_arrays[probe] = np.array(self._lists[probe], dtype=np.intp)
+            arrays.append(self._list_arrays[probe])
+        return np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.intp)
+
+    def search_signature(self, query: np.ndarray, k: int = 10, nprobe: int | None = DEFAULT_NPROBE,
+                         exclude: str | None = None) -> list[tuple[str, float]]:
+        """
+        The k films whose signatures are closest to `query`.
+
+        Uses the inverted file when trained and the catalog has at least IVF_MIN_FILMS
+        films; nprobe=None forces exact brute-force search.
+
+        Returns:
+            (title, distance) pairs, nearest first.
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            excluded = self._rows.get(normalize_title(exclude)) if exclude else None
+            extra = 1 if excluded is not None else 0
+            if nprobe and self.centroids is not None and self._size >= IVF_MIN_FILMS:
+                rows = self._candidates(query, nprobe)
+                vectors, norms = self._vectors[rows], self._norms[rows]
+            else:
+                rows = None
+                vectors, norms = self._vectors[:self._size], self._norms[:self._size]
+            distances = _squared_distances(vectors, norms, query[None, :])
+            nearest = _top_k(distances, k + extra)[0]
+            found = nearest if rows is None else rows[nearest]
+            results = [(self.titles[row], float(np.sqrt(distances[0, i])))
+                       for i, row in zip(nearest.tolist(), found.tolist()) if row != excluded]
+        return results[:k]
+
+    def search(self, scores: EmotionScores, k: int = 10, nprobe: int | None = DEFAULT_NPROBE,
+               exclude: str | None = None) -> list[tuple[str, float]]:
+        """The k films whose arcs are closest to these scores (a film, or a user's classified text)."""
+        return self.search_signature(arc_signature(scores, self.samples), k, nprobe, exclude)
+
+    def similar_to(self, title: str, k: int = 10, nprobe: int | None = DEFAULT_NPROBE) -> list[tuple[str, float]]:
+        """The k films closest to an indexed film (itself excluded); empty if the title is not indexed."""
+        with self._lock:
+            row = self._rows.get(normalize_title(title))
+            if row is None:
+                return []
+            query = self._vectors[row].copy()
+        return self.search_signature(query, k, nprobe, exclude=title)
+
+    def save(self, path: str = DEFAULT_INDEX_PATH) -> None:
+        """Writes signatures, titles and the inverted file (atomically) as a .npz."""
+        with self._lock:
+            arrays = {"samples": np.array(self.samples), "titles": np.array(self.titles, dtype=str),
+                      "vectors": self._vectors[:self._size], "assignment": self._assignment[:self._size]}
+            if self.centroids is not None:
+                arrays["centroids"] = self.centroids
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        part = path + ".part.npz"
+        np.savez(part, **arrays)
+        os.replace(part, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_INDEX_PATH) -> "ArcIndex":
+        with np.load(path) as data:
+            index = cls(int(data["samples"]))
+            index.add_signatures(data["titles"].tolist(), data["vectors"])
+            if "centroids" in data:
+                index.centroids = data["centroids"]
+                n_lists = len(index.centroids)
+                index._lists = [[] for _ in range(n_lists)]
+                index._list_arrays = [None] * n_lists
+                index._assign(np.arange(len(index)), data["assignment"])
+        return index
+
+    @classmethod
+    def from_catalog(cls, catalog, samples: int = SIGNATURE_SAMPLES) -> "ArcIndex":
+        """Indexes every film of a catalog_index.CatalogIndex straight from its memory-mapped scores."""
+        index = cls(samples)
+        if not len(catalog):
+            return index
+        starts = catalog.films["scene_start"].astype(np.intp)
+        offsets = np.concatenate([starts, [starts[-1] + int(catalog.films["scene_count"][-1])]])
+        titles = [catalog.title(row) for row in range(len(catalog))]
+        index.add_signatures(titles, arc_signatures(np.asarray(catalog.scores), offsets, samples))
+        return index
+
+    def stats(self) -> dict:
+        return {"films": self._size, "live_films": len(self._live), "dim": self.dim,
+                "lists": len(self.centroids) if self.centroids is not None else 0,
+                "vector_bytes": int(self._size * self.dim * 4)}
+
+
+def load_arc_index(path: str = DEFAULT_INDEX_PATH, catalog=None) -> ArcIndex:
+    """The saved index if there is one, else one built from the catalog (or an empty index)."""
+    if os.path.exists(path):
+        try:
+            index = ArcIndex.load(path)
+            logging.info(f"Arc index loaded from {path}: {index.stats()}")
+            return index
+        except Exception as e:
+            logging.error(f"Failed to load arc index from {path}: {e}")
+    if catalog is not None:
+        started = time.perf_counter()
+        index = ArcIndex.from_catalog(catalog)
+        if len(index) >= IVF_MIN_FILMS:
+            index.train()
+        logging.info(f"Arc index built from the catalog in {time.perf_counter() - started:.2f}s: {index.stats()}")
+        return index
+    return ArcIndex()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the emotion-arc recommendation index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Index every film of the catalog and save the index.")
+    build.add_argument("--catalog", default=None, help="Catalog directory (default: CINEMOOD_CATALOG_DIR).")
+    build.add_argument("--output", default=DEFAULT_INDEX_PATH)
+    similar = subparsers.add_parser("similar", help="Films whose arc is closest to an indexed film.")
+    similar.add_argument("title")
+    similar.add_argument("-k", type=int, default=10)
+    similar.add_argument("--index", default=DEFAULT_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from catalog_index import DEFAULT_CATALOG_DIR, CatalogIndex
+        started = time.perf_counter()
+        index = ArcIndex.from_catalog(CatalogIndex(args.catalog or DEFAULT_CATALOG_DIR))
+        if len(index) >= IVF_MIN_FILMS:
+            index.train()
+        index.save(args.output)
+        print(f"Indexed {len(index)} films in {time.perf_counter() - started:.2f}s -> {args.output}")
+    else:
+        for title, distance in ArcIndex.load(args.index).similar_to(args.title, args.k):
+            print(f"{distance:8.4f}  {title}")
@@ -2,10 +2,10 @@
 from fpdf import FPDF
 import pandas as pd
 import io
-import tempfile
-import os
 import logging
-import matplotlib.pyplot as plt # Needed to save the buffer to a temporary file
+import numpy as np
+from emotion_scores import get_emotion_scores
+import metrics
 
 logging.basicConfig(level=logging.INFO)
 
@@ -23,13 +23,158 @@ class PDF(FPDF):
         self.set_font('Helvetica', 'I', 8)
         self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
 
-def generate_pdf_report(movie_title: str,
-                        plot_summary: str,
-                        analysis_df: pd.DataFrame,
-                        insights: str,
-                        plot_buffer: io.BytesIO | None) -> str | None:
+def _latin1(text: str) -> str:
+    """Core PDF fonts only cover latin-1; unsupported characters become '?'."""
+    return str(text).encode('latin-1', 'replace').decode('latin-1')
+
+def _embed_chart(pdf: FPDF, heading: str, image_buffer: io.BytesIO) -> None:
+    """Adds a headed chart image at 80% of the page width, read straight from the in-memory buffer."""
+    pdf.set_font('Helvetica', 'B', 12)
+    pdf.cell(0, 10, heading, 0, 1, 'L')
+    pdf.ln(2)
+    try:
+        # Calculate image width to fit page (A4 width ~ 210mm, margins ~15mm each side)
+        available_width = pdf.w - 2 * pdf.l_margin
+        image_buffer.seek(0)
+        # With no y given, fpdf2 breaks the page if needed and moves below the image's real height
+        pdf.image(image_buffer, w=available_width * 0.8) # Use 80% width
+        pdf.ln(5)
+    except Exception as img_err:
+        logging.error(f"Error embedding graph image in PDF: {img_err}")
+        pdf.set_font('Helvetica', 'I', 10)
+        pdf.cell(0, 5, "[Error displaying emotion graph]", 0, 1, 'L')
+        pdf.ln(5)
+
+# Scene table layout: column widths in mm (the chunk column takes the rest of the line) and line height
+TABLE_COLUMNS = ('Scene', 'Emotion', 'Score', 'Chunk Text')
+TABLE_FIXED_WIDTHS = (15, 25, 15)
+TABLE_LINE_HEIGHT = 5
+TABLE_CELL_PADDING = 1
+
+def _scene_rows(analysis_df: pd.DataFrame):
+    """Yields the (scene, emotion, score, chunk) text of every table row, reading columns in bulk."""
+    # Read dominant labels/scores straight from the score matrix instead of boxing every row
+    scores = get_emotion_scores(analysis_df)
+    yield from zip(analysis_df['Scene'].astype(str).tolist(),
+                   scores.dominant_labels().tolist(),
+                   np.round(scores.dominant_scores().astype(np.float64), 4).astype(str).tolist(),
+                   analysis_df['Chunk'].tolist())
+
+class _TextWrapper:
+    """
+    Greedy word wrapping for one font, with each distinct word measured once.
+
+    fpdf2's multi_cell measures text character by character on every call,
+    which dominates long tables; scene chunks reuse a small vocabulary, so
+    caching word widths makes wrapping close to a dictionary lookup per word.
+    """
+
+    def __init__(self, pdf: FPDF):
+        self.pdf = pdf
+        self.space = pdf.get_string_width(' ')
+        self._widths = {}
+
+    def width(self, word: str) -> float:
+        width = self._widths.get(word)
+        if width is None:
+            width = self._widths[word] = self.pdf.get_string_width(word)
+        return width
+
+    def wrap(self, text: str, max_width: float) -> list[str]:
+        lines, current, current_width = [], [], 0.0
+        for word in text.split():
+            word_width = self.width(word)
+            if word_width > max_width: # Longer than a whole line: hard-split it by characters
+                for piece in self._split_word(word, max_width):
+                    if current:
+                        lines.append(' '.join(current))
+                    current, current_width = [piece], self.width(piece)
+                continue
+            needed = word_width if not current else current_width + self.space + word_width
+            if needed <= max_width:
+                current.append(word)
+                current_width = needed
+            else:
+                lines.append(' '.join(current))
+                current, current_width = [word], word_width
+        if current:
+            lines.append(' '.join(current))
+        return lines or ['']
+
+    def _split_word(self, word: str, max_width: float) -> list[str]:
+        pieces, start = [], 0
+        for end in range(1, len(word) + 1):
+            if self.pdf.get_string_width(word[start:end]) > max_width and end - 1 > start:
+                pieces.append(word[start:end - 1])
+                start = end - 1
+        pieces.append(word[start:])
+        return pieces
+
+def _add_scene_table(pdf: FPDF, analysis_df: pd.DataFrame) -> None:
+    """
+    Renders the scene table from pre-wrapped rows.
+
+    Each row's text is wrapped once with cached word widths, which gives its
+    height up front; the row is then drawn with one border rectangle per
+    cell and one text call per line. Rows that do not fit move to a new page
+    under a repeated heading row, and a row taller than a whole page
+    continues across pages.
+    """
+    usable_width = pdf.w - pdf.l_margin - pdf.r_margin
+    widths = TABLE_FIXED_WIDTHS + (usable_width - sum(TABLE_FIXED_WIDTHS),)
+    lefts = [pdf.l_margin + sum(widths[:i]) for i in range(len(widths))]
+    aligns = ('C', 'C', 'C', 'L')
+    line_height = TABLE_LINE_HEIGHT
+
+    def draw_row(cells: list[list[str]], y: float, n_lines: int) -> None:
+        height = n_lines * line_height
+        baseline = 0.5 * line_height + 0.3 * pdf.font_size # Same vertical placement as FPDF.cell
+        for left, width, align, lines in zip(lefts, widths, aligns, cells):
+            pdf.rect(left, y, width, height)
+            for i, line in enumerate(lines[:n_lines]):
+                if align == 'C':
+                    x = left + (width - pdf.get_string_width(line)) / 2
+                else:
+                    x = left + TABLE_CELL_PADDING
+                pdf.text(x, y + i * line_height + baseline, line)
+
+    def draw_heading() -> None:
+        pdf.set_font('Helvetica', 'B', 9)
+        draw_row([[name] for name in TABLE_COLUMNS], pdf.get_y(), 1)
+        pdf.set_y(pdf.get_y() + line_height)
+        pdf.set_font('Helvetica', '', 8)
+
+    draw_heading()
+    wrapper = _TextWrapper(pdf) # Measures with the body font set by draw_heading
+    page_top = pdf.get_y()
+    inner_width = widths[-1] - 2 * TABLE_CELL_PADDING
+    for scene, emotion, score, chunk in _scene_rows(analysis_df):
+        cells = [[scene], [emotion], [score], wrapper.wrap(_latin1(chunk), inner_width)]
+        remaining = len(cells[-1])
+        while remaining:
+            y = pdf.get_y()
+            fits = int((pdf.page_break_trigger - y) // line_height)
+            if fits < remaining and (y > page_top or fits < 1):
+                # Move the row (or what is left of it) to a fresh page rather than splitting it mid-page
+                pdf.add_page()
+                draw_heading()
+                page_top = y = pdf.get_y()
+                fits = int((pdf.page_break_trigger - y) // line_height)
+            n_lines = min(remaining, fits)
+            draw_row(cells, y, n_lines)
+            pdf.set_y(y + n_lines * line_height)
+            cells = [lines[n_lines:] for lines in cells]
+            remaining -= n_lines
+
+@metrics.timed("report")
+def build_pdf_report(movie_title: str,
+                     plot_summary: str,
+                     analysis_df: pd.DataFrame,
+                     insights: str,
+                     plot_buffer: io.BytesIO | None,
+                     timeline_buffer: io.BytesIO | None = None) -> bytes:
     """
-    Generates a PDF report summarizing the analysis.
+    Builds the PDF report entirely in memory.
 
     Args:
         movie_title: The title of the movie analyzed.
@@ -37,138 +182,86 @@ def generate_pdf_report(movie_title: str,
         analysis_df: DataFrame with scene-by-scene emotion analysis.
         insights: Textual summary of the emotional arc.
         plot_buffer: BytesIO buffer containing the emotion distribution graph PNG.
+        timeline_buffer: Optional BytesIO buffer containing the scene timeline PNG.
 
     Returns:
-        File path to the generated temporary PDF file, or None if error.
+        The PDF document as bytes.
     """
     pdf = PDF()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.set_font('Helvetica', '', 12)
 
-    try:
-        # --- Movie Title ---
-        pdf.set_font('Helvetica', 'B', 16)
-        pdf.cell(0, 10, f"Analysis for: {movie_title}", 0, 1, 'L')
-        pdf.ln(5)
+    # --- Movie Title ---
+    pdf.set_font('Helvetica', 'B', 16)
+    pdf.cell(0, 10, _latin1(f"Analysis for: {movie_title}"), 0, 1, 'L')
+    pdf.ln(5)
 
-        # --- Plot Summary ---
-        pdf.set_font('Helvetica', 'B', 12)
-        pdf.cell(0, 10, "Plot Summary Used:", 0, 1, 'L')
-        pdf.set_font('Helvetica', '', 10)
-        # Use multi_cell for long text, handle potential encoding issues
-        try:
-            pdf.multi_cell(0, 5, plot_summary.encode('latin-1', 'replace').decode('latin-1'))
-        except Exception as e:
-            logging.error(f"Encoding error adding plot summary to PDF: {e}")
-            pdf.multi_cell(0, 5, "Error displaying plot summary due to character encoding issues.")
-        pdf.ln(5)
+    # --- Plot Summary ---
+    pdf.set_font('Helvetica', 'B', 12)
+    pdf.cell(0, 10, "Plot Summary Used:", 0, 1, 'L')
+    pdf.set_font('Helvetica', '', 10)
+    pdf.multi_cell(0, 5, _latin1(plot_summary))
+    pdf.ln(5)
+
+    # --- Storytelling Insights ---
+    pdf.set_font('Helvetica', 'B', 12)
+    pdf.cell(0, 10, "Emotional Arc Insights:", 0, 1, 'L')
+    pdf.set_font('Helvetica', '', 10)
+    # Clean up insights text formatting slightly for PDF
+    insights_pdf = insights.replace("**", "") # Remove markdown bold
+    pdf.multi_cell(0, 5, _latin1(insights_pdf))
+    pdf.ln(5)
+
+    # --- Emotion Distribution Graph ---
+    if plot_buffer:
+        _embed_chart(pdf, "Overall Emotion Distribution:", plot_buffer)
 
-        # --- Storytelling Insights ---
+    # --- Emotion Timeline Graph ---
+    if timeline_buffer:
+        _embed_chart(pdf, "Emotional Arc Over Time:", timeline_buffer)
+
+    # --- Scene-by-Scene Analysis Table ---
+    if not analysis_df.empty:
+        pdf.add_page() # Start table on a new page for clarity
         pdf.set_font('Helvetica', 'B', 12)
-        pdf.cell(0, 10, "Emotional Arc Insights:", 0, 1, 'L')
-        pdf.set_font('Helvetica', '', 10)
-        # Clean up insights text formatting slightly for PDF
-        insights_pdf = insights.replace("**", "") # Remove markdown bold
-        pdf.multi_cell(0, 5, insights_pdf.encode('latin-1', 'replace').decode('latin-1'))
+        pdf.cell(0, 10, "Scene-by-Scene Emotion Details:", 0, 1, 'L')
         pdf.ln(5)
+        _add_scene_table(pdf, analysis_df)
+
+    return bytes(pdf.output()) # No file name: fpdf2 returns the document as a bytearray
 
-        # --- Emotion Distribution Graph ---
-        if plot_buffer:
-            pdf.set_font('Helvetica', 'B', 12)
-            pdf.cell(0, 10, "Overall Emotion Distribution:", 0, 1, 'L')
-            pdf.ln(2)
-            try:
-                # Save buffer to a temporary image file for FPDF
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_img:
-                    temp_img.write(plot_buffer.getvalue())
-                    temp_img_path = temp_img.name
-
-                # Calculate image width to fit page (A4 width ~ 210mm, margins ~15mm each side)
-                available_width = pdf.w - 2 * pdf.l_margin
-                pdf.image(temp_img_path, x=pdf.get_x(), y=pdf.get_y(), w=available_width * 0.8) # Use 80% width
-                pdf.ln(available_width * 0.8 * 0.6) # Adjust line break based on image height (estimate aspect ratio)
-
-                os.remove(temp_img_path) # Clean up temporary image file
-                pdf.ln(5)
-            except Exception as img_err:
-                logging.error(f"Error embedding graph image in PDF: {img_err}")
-                pdf.set_font('Helvetica', 'I', 10)
-                pdf.cell(0, 5, "[Error displaying emotion graph]", 0, 1, 'L')
-                pdf.ln(5)
-
-
-        # --- Scene-by-Scene Analysis Table ---
-        if not analysis_df.empty:
-             pdf.add_page() # Start table on a new page for clarity
-             pdf.set_font('Helvetica', 'B', 12)
-             pdf.cell(0, 10, "Scene-by-Scene Emotion Details:", 0, 1, 'L')
-             pdf.ln(5)
-
-             pdf.set_font('Helvetica', 'B', 9)
-             col_widths = {'Scene': 15, 'Emotion': 25, 'Score': 15, 'Chunk': pdf.w - pdf.l_margin - pdf.r_margin - 15 - 25 - 15 - 5} # Adjust widths
-
-             # Table Header
-             pdf.cell(col_widths['Scene'], 7, 'Scene', 1, 0, 'C')
-             pdf.cell(col_widths['Emotion'], 7, 'Emotion', 1, 0, 'C')
-             pdf.cell(col_widths['Score'], 7, 'Score', 1, 0, 'C')
-             pdf.cell(col_widths['Chunk'], 7, 'Chunk Text', 1, 1, 'C')
-
-             # Table Rows
-             pdf.set_font('Helvetica', '', 8)
-             for index, row in analysis_df.iterrows():
-                 current_y = pdf.get_y()
-                 # Use multi_cell for the chunk text to allow wrapping
-                 pdf.multi_cell(col_widths['Scene'], 5, str(row['Scene']), 1, 'C')
-                 x_after_scene = pdf.l_margin + col_widths['Scene']
-                 pdf.set_xy(x_after_scene, current_y) # Reset X position
-
-                 pdf.multi_cell(col_widths['Emotion'], 5, str(row['Emotion']), 1, 'C')
-                 x_after_emotion = x_after_scene + col_widths['Emotion']
-                 pdf.set_xy(x_after_emotion, current_y) # Reset X position
-
-                 pdf.multi_cell(col_widths['Score'], 5, str(row['Score']), 1, 'C')
-                 x_after_score = x_after_emotion + col_widths['Score']
-                 pdf.set_xy(x_after_score, current_y) # Reset X position
-
-                 # Handle chunk encoding and wrapping
-                 chunk_text = str(row['Chunk']).encode('latin-1', 'replace').decode('latin-1')
-                 pdf.multi_cell(col_widths['Chunk'], 5, chunk_text, 1, 'L')
-                 # The multi_cell for Chunk automatically moves Y, so no need for pdf.ln() here
-
-                 # Check if page break needed manually (fpdf might handle this with set_auto_page_break)
-                 if pdf.get_y() > pdf.h - pdf.b_margin - 15: # Check if near bottom margin
-                      pdf.add_page()
-                      # Re-draw header if needed (optional)
-                      pdf.set_font('Helvetica', 'B', 9)
-                      pdf.cell(col_widths['Scene'], 7, 'Scene', 1, 0, 'C')
-                      pdf.cell(col_widths['Emotion'], 7, 'Emotion', 1, 0, 'C')
-                      pdf.cell(col_widths['Score'], 7, 'Score', 1, 0, 'C')
-                      pdf.cell(col_widths['Chunk'], 7, 'Chunk Text', 1, 1, 'C')
-                      pdf.set_font('Helvetica', '', 8)
-
-
-        # Save PDF to a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-            pdf_output_path = temp_pdf.name
-
-        pdf.output(pdf_output_path, "F") # 'F' saves to local file
-        logging.info(f"PDF report generated successfully at: {pdf_output_path}")
-        return pdf_output_path
+def generate_pdf_report(movie_title: str,
+                        plot_summary: str,
+                        analysis_df: pd.DataFrame,
+                        insights: str,
+                        plot_buffer: io.BytesIO | None,
+                        output_path: str,
+                        timeline_buffer: io.BytesIO | None = None) -> str | None:
+    """
+    Generates a PDF report summarizing the analysis and saves it to `output_path`.
+
+    Args:
+        movie_title: The title of the movie analyzed.
+        plot_summary: The plot text used for analysis.
+        analysis_df: DataFrame with scene-by-scene emotion analysis.
+        insights: Textual summary of the emotional arc.
+        plot_buffer: BytesIO buffer containing the emotion distribution graph PNG.
+        output_path: Where to write the PDF; the caller owns the file.
+        timeline_buffer: Optional BytesIO buffer containing the scene timeline PNG.
+
+    Returns:
+        `output_path`, or None if error.
+    """
+    try:
+        pdf_bytes = build_pdf_report(movie_title, plot_summary, analysis_df, insights, plot_buffer, timeline_buffer)
+        with open(output_path, "wb") as f:
+            f.write(pdf_bytes)
+        logging.info(f"PDF report generated successfully at: {output_path}")
+        return output_path
 
     except Exception as e:
         logging.error(f"Failed to generate PDF report: {e}")
-        # Clean up temp file if it exists and failed mid-generation
-        if 'temp_pdf' in locals() and os.path.exists(temp_pdf.name):
-             try:
-                 os.remove(temp_pdf.name)
-             except OSError:
-                 pass # Ignore error if removal fails
-        if 'temp_img_path' in locals() and os.path.exists(temp_img_path):
-             try:
-                 os.remove(temp_img_path)
-             except OSError:
-                 pass
         return None
 
 # Example usage (optional)
@@ -181,14 +274,14 @@ if __name__ == "__main__":
     dummy_df = pd.DataFrame(data)
     dummy_plot = "This is a short dummy plot summary.\nIt has multiple lines."
     dummy_insights = "The most common emotion is joy (33%). Anger is also prominent. This suggests a mix of positive moments and conflict."
-    from visuals import create_emotion_distribution_graph # Import for example
+    from visuals import create_emotion_distribution_graph, create_emotion_timeline_graph # Import for example
     dummy_plot_buffer = create_emotion_distribution_graph(dummy_df)
+    dummy_timeline_buffer = create_emotion_timeline_graph(dummy_df)
 
-    pdf_path = generate_pdf_report("Dummy Movie", dummy_plot, dummy_df, dummy_insights, dummy_plot_buffer)
+    pdf_path = generate_pdf_report("Dummy Movie", dummy_plot, dummy_df, dummy_insights, dummy_plot_buffer,
+                                   "dummy_report.pdf", dummy_timeline_buffer)
 
     if pdf_path:
         print(f"PDF report saved to: {pdf_path}")
-        # Keep the file for inspection: print(f"Temporary PDF path: {pdf_path}")
-        # To auto-delete, you would manage the tempfile differently or clean up later.
     else:
         print("Failed to generate PDF report.") 
\ No newline at end of file
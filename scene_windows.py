@@ -0,0 +1,194 @@
+# scene_windows.py
+import logging
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+from batching import MODEL_MAX_LENGTH
+from segmentation import Segment
+
+logging.basicConfig(level=logging.INFO)
+
+# Chunking modes:
+#   sentence - one scene per sentence (legacy behaviour)
+#   scene    - consecutive short sentences merged up to CINEMOOD_SCENE_TOKENS, over-length
+#              sentences split into overlapping windows whose scores are averaged
+CHUNKING_MODES = ("sentence", "scene")
+DEFAULT_CHUNKING = os.environ.get("CINEMOOD_CHUNKING", "sentence")
+# Target tokens per merged scene (excluding special tokens)
+DEFAULT_SCENE_TOKENS = int(os.environ.get("CINEMOOD_SCENE_TOKENS", "128"))
+# Tokens shared by consecutive windows of a split sentence
+DEFAULT_WINDOW_OVERLAP = int(os.environ.get("CINEMOOD_SCENE_OVERLAP", "64"))
+
+
+class Scene(NamedTuple):
+    """
+    A unit of classification built from one or more consecutive sentences.
+
+    `text` is the display text (source[start:end]); `windows` are the texts
+    actually sent to the model, usually just `text`, several overlapping
+    pieces for a sentence longer than the model accepts. `weights` holds
+    each window's token count, used to average their scores.
+    """
+    text: str
+    start: int
+    end: int
+    first_sentence: int # Index of the first sentence in the scene
+    last_sentence: int  # Index of the last sentence (inclusive)
+    windows: tuple[str, ...]
+    weights: tuple[int, ...]
+
+    def sentence_label(self) -> str:
+        """1-based sentence number or range, for display ('4' or '4-7')."""
+        if self.first_sentence == self.last_sentence:
+            return str(self.first_sentence + 1)
+        return f"{self.first_sentence + 1}-{self.last_sentence + 1}"
+
+
+def special_token_count(tokenizer) -> int:
+    """Special tokens the tokenizer adds around every sequence (<s> and </s> for RoBERTa)."""
+    try:
+        return int(tokenizer.num_special_tokens_to_add())
+    except Exception:
+        return 2
+
+
+def token_counts(tokenizer, texts: list[str]) -> list[int]:
+    """Untruncated token count of each text, without special tokens."""
+    if not texts:
+        return []
+    encoded = tokenizer(texts, add_special_tokens=False, truncation=False)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def split_windows(text: str, tokenizer, max_tokens: int, overlap: int) -> list[tuple[str, int]]:
+    """
+    Splits an over-length text into windows of at most `max_tokens` tokens.
+
+    Consecutive windows share `overlap` tokens so no part of the text is seen
+    without context. Windows are cut at token boundaries taken from the
+    tokenizer's offset mapping.
+
+    Returns:
+        (window_text, token_count) per window, in text order.
+    """
+    encoded = tokenizer(text, add_special_tokens=False, truncation=False, return_offsets_mapping=True)
+    offsets = encoded["offset_mapping"]
+    if len(offsets) <= max_tokens:
+        return [(text, len(offsets))]
+    stride = max(1, max_tokens - max(0, min(overlap, max_tokens - 1)))
+    windows = []
+    for first in range(0, len(offsets), stride):
+        last = min(first + max_tokens, len(offsets))
+        windows.append((text[offsets[first][0]:offsets[last - 1][1]].strip(), last - first))
+        if last == len(offsets):
+            break
+    return windows
+
+
+def build_scenes(source: str, segments: list[Segment], tokenizer,
+                 target_tokens: int = DEFAULT_SCENE_TOKENS,
+                 overlap: int = DEFAULT_WINDOW_OVERLAP) -> list[Scene]:
+    """
+    Groups sentences into scenes sized for the classifier.
+
+    Consecutive sentences are merged while the scene stays within `target_tokens`.
+    A sentence longer than the model limit becomes a scene of its own, classified
+    as overlapping windows. Sentences are never reordered or dropped, so every
+    sentence belongs to exactly one scene.
+
+    Args:
+        source: The text the segments were taken from (scene text is sliced from it).
+        segments: Sentences with character offsets, e.g. from chunk_text_spacy_offsets.
+        tokenizer: A transformers fast tokenizer, or a batching.CountingTokenizer when called from request threads.
+        target_tokens: Token budget of a merged scene, excluding special tokens.
+        overlap: Tokens shared by consecutive windows of a split sentence.
+
+    Returns:
+        Scenes in text order.
+    """
+    max_tokens = MODEL_MAX_LENGTH - special_token_count(tokenizer)
+    target_tokens = max(1, min(target_tokens, max_tokens))
+    counts = token_counts(tokenizer, [segment.text for segment in segments])
+
+    scenes = []
+    group = [] # Indices of the sentences being merged
+    group_tokens = 0
+
+    def flush():
+        nonlocal group, group_tokens
+        if group:
+            first, last = segments[group[0]], segments[group[-1]]
+            text = source[first.start:last.end]
+            scenes.append(Scene(text, first.start, last.end, group[0], group[-1], (text,), (group_tokens,)))
+        group, group_tokens = [], 0
+
+    for index, (segment, count) in enumerate(zip(segments, counts)):
+        if count > max_tokens:
+            flush()
+            pieces = split_windows(segment.text, tokenizer, max_tokens, overlap)
+            scenes.append(Scene(segment.text, segment.start, segment.end, index, index,
+                                tuple(text for text, _ in pieces), tuple(n for _, n in pieces)))
+            continue
+        if group and group_tokens + count > target_tokens:
+            flush()
+        group.append(index)
+        group_tokens += count
+    flush()
+    return scenes
+
+
+def sentence_scenes(segments: list[Segment]) -> list[Scene]:
+    """One scene per sentence, without tokenizing (the 'sentence' chunking mode)."""
+    return [Scene(segment.text, segment.start, segment.end, index, index, (segment.text,), (1,))
+            for index, segment in enumerate(segments)]
+
+
+def window_texts(scenes: list[Scene]) -> list[str]:
+    """Every window of every scene, flattened in scene order (the texts to classify)."""
+    return [text for scene in scenes for text in scene.windows]
+
+
+def aggregate_windows(matrix: np.ndarray, scenes: list[Scene]) -> np.ndarray:
+    """
+    Collapses per-window score rows into one row per scene.
+
+    `matrix` has one row per window, in window_texts order. A split scene gets
+    the token-weighted mean of its windows' probabilities.
+    """
+    sizes = np.fromiter((len(scene.windows) for scene in scenes), dtype=np.intp, count=len(scenes))
+    if not len(sizes) or (sizes == 1).all():
+        return matrix
+    weights = np.fromiter((w for scene in scenes for w in scene.weights), dtype=np.float32, count=int(sizes.sum()))
+    weights = np.maximum(weights, 1.0)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    totals = np.add.reduceat(matrix * weights[:, None], starts, axis=0)
+    return totals / np.add.reduceat(weights, starts)[:, None]
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    import re
+
+    class WhitespaceTokenizer:
+        """One token per word; stands in for the model's tokenizer."""
+
+        def num_special_tokens_to_add(self):
+            return 2
+
+        def __call__(self, texts, add_special_tokens=True, truncation=False, return_offsets_mapping=False):
+            single = isinstance(texts, str)
+            words = [list(re.finditer(r"\S+", text)) for text in ([texts] if single else texts)]
+            encoded = {"input_ids": [[0] * len(w) for w in words]}
+            if return_offsets_mapping:
+                encoded["offset_mapping"] = [[m.span() for m in w] for w in words]
+            return {key: value[0] for key, value in encoded.items()} if single else encoded
+
+    text = "He runs. She waits. " + " ".join(["word"] * 1200) + ". They meet again."
+    segments = []
+    for match in re.finditer(r"[^.]+\.", text):
+        start = match.start() + len(match.group()) - len(match.group().lstrip())
+        segments.append(Segment(text[start:match.end()], start, match.end()))
+    for scene in build_scenes(text, segments, WhitespaceTokenizer(), target_tokens=16, overlap=64):
+        print(f"Sentences {scene.sentence_label():>5}: {len(scene.windows)} window(s), tokens {scene.weights}")
@@ -0,0 +1,164 @@
+# score_cache.py
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+
+# Default location and size of the on-disk score cache (overridable via environment)
+DEFAULT_CACHE_PATH = os.environ.get("CINEMOOD_SCORE_CACHE", os.path.join(".cache", "emotion_scores.sqlite3"))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("CINEMOOD_SCORE_CACHE_MAX_ENTRIES", "200000"))
+
+
+def sentence_key(sentence: str, model_id: str, revision: str = "main") -> str:
+    """Returns the content address of a sentence for a given model id/revision."""
+    digest = hashlib.sha256()
+    digest.update(model_id.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(revision.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(sentence.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ScoreCache:
+    """
+    Disk-backed, content-addressed cache of per-sentence emotion score vectors.
+
+    Entries are keyed by sha256(model id, revision, sentence) and hold the full
+    list of {'label', 'score'} dicts returned by the pipeline. The store is a
+    SQLite database in WAL mode, so several processes can share one cache file.
+    Size is bounded by `max_entries`; the least recently used rows are evicted.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                " key TEXT PRIMARY KEY,"
+                " scores TEXT NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_scores_last_access ON scores(last_access)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Yields a connection in a transaction (committed, or rolled back on error), then closes it."""
+        # A fresh connection per operation keeps the cache safe across threads and forks
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, keys: list[str]) -> dict[str, list[dict]]:
+        """Looks up several keys at once. Returns a mapping of the keys that were found."""
+        if not keys:
+            return {}
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        try:
+            with self._connect() as conn:
+                # SQLite limits the number of bound parameters, so query in slices
+                for start in range(0, len(unique_keys), 500):
+                    batch = unique_keys[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = conn.execute(
+                        f"SELECT key, scores FROM scores WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                    for key, payload in rows:
+                        found[key] = json.loads(payload)
+                if found:
+                    now = time.time()
+                    conn.executemany(
+                        "UPDATE scores SET last_access = ? WHERE key = ?",
+                        [(now, key) for key in found]
+                    )
+        except sqlite3.Error as e:
+            logging.error(f"Score cache lookup failed: {e}")
+            found = {}
+
+        with self._lock:
+            hit_count = sum(1 for key in keys if key in found)
+            self.hits += hit_count
+            self.misses += len(keys) - hit_count
+        return found
+
+    def put_many(self, items: dict[str, list[dict]]) -> None:
+        """Stores several score vectors and evicts least recently used rows beyond the limit."""
+        if not items:
+            return
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO scores (key, scores, last_access) VALUES (?, ?, ?)",
+                    [(key, json.dumps(scores), now) for key, scores in items.items()]
+                )
+                (count,) = conn.execute("SELECT COUNT(*) FROM scores").fetchone()
+                overflow = count - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM scores WHERE key IN ("
+                        " SELECT key FROM scores ORDER BY last_access ASC LIMIT ?)",
+                        (overflow,)
+                    )
+                    logging.info(f"Score cache evicted {overflow} least recently used entries.")
+        except sqlite3.Error as e:
+            logging.error(f"Score cache write failed: {e}")
+
+    def __len__(self) -> int:
+        try:
+            with self._connect() as conn:
+                return conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def clear(self) -> None:
+        """Removes every entry and resets the counters."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM scores")
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters for this process plus the current entry count."""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+        }
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ScoreCache(os.path.join(tmp, "scores.sqlite3"), max_entries=2)
+        keys = [sentence_key(s, "dummy-model") for s in ["A.", "B.", "C."]]
+        cache.put_many({k: [{"label": "neutral", "score": 1.0}] for k in keys})
+        print("Entries after eviction:", len(cache))
+        print("Lookup:", len(cache.get_many(keys)), "found")
+        print("Stats:", cache.stats())
@@ -0,0 +1,123 @@
+# segmentation.py
+import logging
+import os
+import threading
+from typing import NamedTuple
+
+logging.basicConfig(level=logging.INFO)
+
+# Segmentation modes, fastest last. Only 'full' and 'parser' produce the sentences the app always had;
+# 'senter' and 'sentencizer' are opt-in and can split differently (and so change scores):
+#   full        - the complete en_core_web_sm pipeline (tagger, parser, NER, lemmatizer); the default
+#   parser      - only tok2vec + dependency parser, which is what sets sentence boundaries in 'full'
+#   senter      - only the small statistical sentence recognizer shipped with en_core_web_sm
+#   sentencizer - rule-based punctuation splitter on a blank English pipeline (no model download needed)
+SEGMENTER_MODES = ("full", "parser", "senter", "sentencizer")
+DEFAULT_SEGMENTER_MODE = os.environ.get("CINEMOOD_SEGMENTER", "full")
+DEFAULT_N_PROCESS = int(os.environ.get("CINEMOOD_SEGMENTER_PROCESSES", "1"))
+
+# Components of en_core_web_sm that sentence boundaries never need
+_NON_SENTENCE_PIPES = ["tagger", "attribute_ruler", "lemmatizer", "ner"]
+
+
+class Segment(NamedTuple):
+    """A sentence and its character offsets in the source text (text == source[start:end])."""
+    text: str
+    start: int
+    end: int
+
+
+_segmenters = {}
+_segmenter_lock = threading.Lock()
+
+
+def _load_segmenter(mode: str):
+    import spacy
+    if mode == "sentencizer":
+        nlp = spacy.blank("en")
+        nlp.add_pipe("sentencizer")
+        return nlp
+    if mode == "full":
+        return spacy.load("en_core_web_sm")
+    if mode == "parser":
+        return spacy.load("en_core_web_sm", exclude=_NON_SENTENCE_PIPES)
+    if mode == "senter":
+        nlp = spacy.load("en_core_web_sm", exclude=_NON_SENTENCE_PIPES + ["parser"])
+        nlp.enable_pipe("senter")
+        return nlp
+    raise ValueError(f"Unknown segmenter mode '{mode}'. Expected one of {SEGMENTER_MODES}.")
+
+
+def get_segmenter(mode: str = DEFAULT_SEGMENTER_MODE):
+    """
+    Returns the SpaCy pipeline for a segmentation mode, loading it once.
+
+    Model-based modes fall back to the rule-based sentencizer when
+    en_core_web_sm is not installed. Returns None only if SpaCy itself is missing.
+    """
+    if mode not in SEGMENTER_MODES:
+        raise ValueError(f"Unknown segmenter mode '{mode}'. Expected one of {SEGMENTER_MODES}.")
+    if mode in _segmenters:
+        return _segmenters[mode]
+    with _segmenter_lock:
+        if mode not in _segmenters:
+            try:
+                _segmenters[mode] = _load_segmenter(mode)
+                logging.info(f"SpaCy segmenter '{mode}' loaded successfully.")
+            except ImportError:
+                logging.error("SpaCy is not installed; sentence segmentation will fall back to NLTK.")
+                _segmenters[mode] = None
+            except OSError:
+                if mode == "full":
+                    logging.error("SpaCy model 'en_core_web_sm' not found. Please run: python -m spacy download en_core_web_sm")
+                    _segmenters[mode] = None
+                else:
+                    logging.warning(f"SpaCy model 'en_core_web_sm' not found; segmenter '{mode}' falls back to the rule-based sentencizer.")
+                    _segmenters[mode] = _load_segmenter("sentencizer")
+    return _segmenters[mode]
+
+
+def _doc_segments(doc) -> list[Segment]:
+    segments = []
+    for sent in doc.sents:
+        raw = sent.text
+        stripped = raw.strip()
+        if not stripped:
+            continue
+        start = sent.start_char + (len(raw) - len(raw.lstrip()))
+        segments.append(Segment(stripped, start, start + len(stripped)))
+    return segments
+
+
+def segment_texts(texts: list[str],
+                  mode: str = DEFAULT_SEGMENTER_MODE,
+                  n_process: int = DEFAULT_N_PROCESS,
+                  batch_size: int = 32) -> list[list[Segment]]:
+    """
+    Splits many documents into sentences in one `nlp.pipe` pass.
+
+    Args:
+        texts: The documents to segment.
+        mode: One of SEGMENTER_MODES.
+        n_process: Worker processes for `nlp.pipe` (1 = in-process).
+        batch_size: Documents per `nlp.pipe` batch.
+
+    Returns:
+        One list of Segment (text, start, end) per input document.
+
+    Raises:
+        RuntimeError: If SpaCy is unavailable for the requested mode.
+    """
+    nlp = get_segmenter(mode)
+    if nlp is None:
+        raise RuntimeError(f"No SpaCy pipeline available for segmenter mode '{mode}'.")
+    # Multiprocessing only pays off when there is more than one document to spread out
+    n_process = max(1, min(n_process, len(texts)))
+    return [_doc_segments(doc) for doc in nlp.pipe(texts, n_process=n_process, batch_size=batch_size)]
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    sample = "The team lands in a dream. Things look good initially.  Suddenly, projections attack!"
+    for segment in segment_texts([sample], mode="sentencizer")[0]:
+        print(segment, repr(sample[segment.start:segment.end]))
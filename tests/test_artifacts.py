@@ -0,0 +1,34 @@
+# tests/test_artifacts.py
+import threading
+import time
+
+from artifacts import ArtifactStore
+
+
+def test_concurrent_requests_build_once(tmp_path):
+    store = ArtifactStore(str(tmp_path), ttl=3600, max_bytes=10**9)
+    calls = []
+    barrier = threading.Barrier(16)
+
+    def build():
+        calls.append(threading.get_ident())
+        time.sleep(0.05) # Keep the other threads queued on the key lock
+        return b"contents"
+
+    def request(i):
+        barrier.wait()
+        paths.append(store.get_or_build("same-key", "csv", build, session=f"session-{i}"))
+
+    for _ in range(5):
+        calls.clear()
+        paths = []
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+        assert len(set(paths)) == 1 and len(paths) == 16
+        assert store._key_locks == {}
+        for i in range(16):
+            store.release_session(f"session-{i}")
@@ -0,0 +1,58 @@
+# tests/test_batch_runner.py
+import json
+
+import pytest
+
+import emotion_utils
+from batch_runner import ParquetSink, load_checkpoint, run_batch
+from benchmarks.bench_pipeline import StubEmotionClassifier
+
+
+def ok_record(key: str) -> dict:
+    return {
+        "key": key, "title": key, "status": "ok", "scene_count": 2,
+        "emotion_counts": {"joy": 1, "fear": 1},
+        "mean_scores": {"joy": 0.5, "fear": 0.5},
+        "insights": "Mostly joy.",
+        "scenes": [{"Scene": 1, "Emotion": "joy"}, {"Scene": 2, "Emotion": "fear"}],
+    }
+
+
+def test_parquet_part_keeps_ok_columns_when_it_starts_with_a_failure(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    sink = ParquetSink(str(tmp_path), rows_per_part=3)
+    sink.write({"key": "Missing", "title": "Missing", "status": "not_found"})
+    sink.write(ok_record("Film"))
+    assert sink.write({"key": "Empty", "title": "Empty", "status": "no_chunks"}) == ["Missing", "Film", "Empty"]
+    sink.write(ok_record("Other"))
+    sink.close()
+
+    table = pq.read_table(str(tmp_path)) # Both parts read as one dataset
+    rows = {row["key"]: row for row in table.to_pylist()}
+    assert table.num_rows == 4
+    assert rows["Film"]["scene_count"] == 2
+    assert json.loads(rows["Film"]["mean_scores"]) == {"joy": 0.5, "fear": 0.5}
+    assert json.loads(rows["Film"]["scenes"])[1]["Emotion"] == "fear"
+    assert rows["Film"]["insights"] == "Mostly joy."
+    assert rows["Missing"]["scene_count"] is None and rows["Missing"]["scenes"] is None
+
+
+def test_only_final_statuses_are_checkpointed(tmp_path):
+    emotion_utils.set_emotion_classifier(StubEmotionClassifier())
+    emotion_utils.set_score_cache(None)
+    emotion_utils.set_inference_runner(None)
+    emotion_utils.set_cascade(None)
+    try:
+        found = tmp_path / "Found.txt"
+        found.write_text("The hero laughs.\nThe villain shouts.\n", encoding="utf-8")
+        missing = tmp_path / "Missing.txt" # Unreadable, like a title whose fetch timed out
+        output = str(tmp_path / "results.jsonl")
+        summary = run_batch([str(found), str(missing)], output, plot_files=True, fetch_workers=2)
+        assert summary["statuses"] == {"ok": 1, "not_found": 1}
+        assert load_checkpoint(output + ".checkpoint") == {str(found)}
+
+        missing.write_text("A storm suddenly hits.\n", encoding="utf-8")
+        summary = run_batch([str(found), str(missing)], output, plot_files=True, fetch_workers=2)
+        assert summary["skipped"] == 1 and summary["statuses"] == {"ok": 1}
+    finally:
+        emotion_utils.set_emotion_classifier(None)
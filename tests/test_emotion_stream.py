@@ -0,0 +1,39 @@
+# tests/test_emotion_stream.py
+import pytest
+
+import emotion_utils
+from benchmarks.bench_pipeline import StubEmotionClassifier
+
+
+class FailingClassifier(StubEmotionClassifier):
+    """Stub that fails once `fail_after` sentences have been classified."""
+
+    def __init__(self, fail_after: int):
+        super().__init__()
+        self.fail_after = fail_after
+        self.classified = 0
+
+    def __call__(self, texts, **kwargs):
+        if self.classified + len(texts) > self.fail_after:
+            raise RuntimeError("model crashed")
+        self.classified += len(texts)
+        return super().__call__(texts, **kwargs)
+
+
+@pytest.fixture
+def failing_model():
+    emotion_utils.set_emotion_classifier(FailingClassifier(fail_after=16))
+    emotion_utils.set_score_cache(None)
+    emotion_utils.set_inference_runner(None)
+    emotion_utils.set_cascade(None)
+    yield
+    emotion_utils.set_emotion_classifier(None)
+
+
+def test_stream_failure_is_raised_not_truncated(failing_model):
+    chunks = [f"Sentence number {i} of the plot." for i in range(40)]
+    rows = []
+    with pytest.raises(RuntimeError, match="model crashed"):
+        for frame in emotion_utils.classify_emotions_stream(chunks, slice_size=8):
+            rows.extend(frame["Chunk"])
+    assert 0 < len(rows) < len(chunks)
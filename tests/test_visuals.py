@@ -0,0 +1,29 @@
+# tests/test_visuals.py
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from emotion_scores import EMOTION_LABELS, EmotionScores
+from visuals import ChartRenderer
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def test_concurrent_renders_match_serial_renders():
+    rng = np.random.default_rng(0)
+    counts = [pd.Series(rng.integers(0, 50, size=len(EMOTION_LABELS)), index=EMOTION_LABELS).sort_values(ascending=False)
+              for _ in range(16)]
+    timelines = [EmotionScores(rng.dirichlet(np.ones(len(EMOTION_LABELS)), size=int(n)))
+                 for n in rng.integers(5, 600, size=8)]
+    renderer = ChartRenderer(cache_size=0) # Every call draws, so threads really render at the same time
+    expected_counts = [renderer.render_counts(c) for c in counts]
+    expected_timelines = [renderer.render_timeline(t) for t in timelines]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        actual_counts = list(pool.map(renderer.render_counts, counts))
+        actual_timelines = list(pool.map(renderer.render_timeline, timelines))
+
+    assert all(data.startswith(PNG_SIGNATURE) for data in actual_counts + actual_timelines)
+    assert actual_counts == expected_counts
+    assert actual_timelines == expected_timelines
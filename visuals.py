@@ -1,10 +1,18 @@
 # visuals.py
-import matplotlib
-matplotlib.use('Agg') # Use non-interactive backend suitable for web servers/Gradio
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import ListedColormap
+import numpy as np
 import pandas as pd
+import hashlib
 import io
 import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from emotion_scores import EmotionScores, get_emotion_scores
+from downsample import bucket_mean, bucket_mode
+import metrics
 
 logging.basicConfig(level=logging.INFO)
 
@@ -23,56 +31,259 @@ EMOTION_COLORS = {
     'unknown': 'black'
 }
 
-def create_emotion_distribution_graph(analysis_df: pd.DataFrame) -> io.BytesIO | None:
+CHART_FORMATS = ("png", "svg")
+
+
+# Upper bound on plotted buckets; beyond this, timeline scenes are averaged so render cost stays flat
+DEFAULT_TIMELINE_POINTS = 400
+
+
+@dataclass(frozen=True)
+class TimelineStyle:
+    """Appearance of the scene timeline chart."""
+    figsize: tuple[float, float] = (10, 5)
+    title: str = 'Emotional Arc Across Scenes'
+    xlabel: str = 'Scene'
+    ylabel: str = 'Emotion probability'
+
+
+@dataclass(frozen=True)
+class ChartStyle:
+    """Appearance of the distribution chart; part of the render cache key, so it must stay hashable."""
+    figsize: tuple[float, float] = (10, 6)
+    title: str = 'Overall Emotion Distribution in Movie Plot'
+    xlabel: str = 'Emotion'
+    ylabel: str = 'Number of Scenes (Chunks)'
+    show_counts: bool = True
+
+
+class ChartRenderer:
+    """
+    Thread-safe renderer for the emotion distribution and timeline charts.
+
+    Each render builds its own `Figure` and Agg canvas, so no pyplot global
+    state is touched and concurrent Gradio requests cannot interfere. Output
+    bytes are memoized in an LRU keyed by the emotion-count vector, style,
+    format and DPI; identical analyses reuse the rendered image.
+    """
+
+    def __init__(self, cache_size: int = 256):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render_counts(self, emotion_counts: pd.Series,
+                      style: ChartStyle = ChartStyle(),
+                      fmt: str = "png",
+                      dpi: int = 100) -> bytes:
+        """Renders a bar chart of emotion -> count and returns the encoded image bytes."""
+        if fmt not in CHART_FORMATS:
+            raise ValueError(f"Unsupported chart format '{fmt}'. Expected one of {CHART_FORMATS}.")
+        counts = tuple((str(emotion), int(count)) for emotion, count in emotion_counts.items())
+        key = (counts, style, fmt, dpi)
+        if self.cache_size:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    metrics.RENDER_CACHE.inc(1, "distribution", "hit")
+                    return cached
+                self.misses += 1
+        metrics.RENDER_CACHE.inc(1, "distribution", "miss")
+
+        with metrics.span("render_distribution"):
+            data = self._draw(counts, style, fmt, dpi)
+
+        if self.cache_size:
+            with self._lock:
+                self._cache[key] = data
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return data
+
+    def _draw(self, counts: tuple, style: ChartStyle, fmt: str, dpi: int) -> bytes:
+        fig = Figure(figsize=style.figsize)
+        FigureCanvasAgg(fig) # Attach a canvas so savefig works without pyplot
+        ax = fig.add_subplot()
+
+        emotions = [emotion for emotion, _ in counts]
+        values = [count for _, count in counts]
+        # Get colors for the emotions present, default to grey if not in map
+        colors = [EMOTION_COLORS.get(emotion, 'grey') for emotion in emotions]
+
+        bars = ax.bar(emotions, values, color=colors)
+
+        ax.set_title(style.title, fontsize=16)
+        ax.set_xlabel(style.xlabel, fontsize=12)
+        ax.set_ylabel(style.ylabel, fontsize=12)
+        ax.tick_params(axis='x', labelrotation=45)
+        for label in ax.get_xticklabels():
+            label.set_horizontalalignment('right') # Rotate labels for better readability
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+        # Add counts on top of bars (optional)
+        if style.show_counts:
+            for bar in bars:
+                yval = bar.get_height()
+                ax.text(bar.get_x() + bar.get_width()/2.0, yval, int(yval), va='bottom', ha='center') # Add text labels
+
+        fig.tight_layout() # Adjust layout to prevent labels overlapping
+        buf = io.BytesIO()
+        fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches='tight')
+        return buf.getvalue()
+
+    def render_timeline(self, scores: EmotionScores,
+                        style: TimelineStyle = TimelineStyle(),
+                        fmt: str = "png",
+                        dpi: int = 100,
+                        max_points: int = DEFAULT_TIMELINE_POINTS) -> bytes:
+        """
+        Renders per-scene emotion probabilities as a stacked area chart with a dominant-emotion ribbon.
+
+        Inputs longer than `max_points` scenes are bucket-averaged first (means
+        keep each emotion's area, the ribbon takes each bucket's most frequent
+        dominant emotion), so render time and image size do not grow with the
+        number of scenes.
+        """
+        if fmt not in CHART_FORMATS:
+            raise ValueError(f"Unsupported chart format '{fmt}'. Expected one of {CHART_FORMATS}.")
+        digest = hashlib.sha1(scores.matrix.tobytes()).hexdigest()
+        key = ("timeline", digest, scores.matrix.shape, style, fmt, dpi, max_points)
+        if self.cache_size:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    metrics.RENDER_CACHE.inc(1, "timeline", "hit")
+                    return cached
+                self.misses += 1
+        metrics.RENDER_CACHE.inc(1, "timeline", "miss")
+
+        with metrics.span("render_timeline"):
+            data = self._draw_timeline(scores, style, fmt, dpi, max_points)
+
+        if self.cache_size:
+            with self._lock:
+                self._cache[key] = data
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return data
+
+    def _draw_timeline(self, scores: EmotionScores, style: TimelineStyle, fmt: str, dpi: int, max_points: int) -> bytes:
+        centers, means = bucket_mean(scores.matrix, max_points)
+        scene_positions = centers + 1 # Scenes are numbered from 1
+        modes = bucket_mode(scores.dominant_index(), max_points, len(scores.labels))
+        colors = [EMOTION_COLORS.get(label, 'grey') for label in scores.labels]
+
+        fig = Figure(figsize=style.figsize)
+        FigureCanvasAgg(fig)
+        grid = fig.add_gridspec(2, 1, height_ratios=[6, 1], hspace=0.08)
+        ax = fig.add_subplot(grid[0])
+        ribbon_ax = fig.add_subplot(grid[1], sharex=ax)
+
+        if len(scene_positions) == 1:
+            # A single bucket cannot span an area; widen it to a visible band
+            scene_positions = np.array([scene_positions[0] - 0.5, scene_positions[0] + 0.5])
+            means = np.repeat(means, 2, axis=0)
+        ax.stackplot(scene_positions, means.T, labels=scores.labels, colors=colors, linewidth=0)
+        ax.set_ylim(0, max(1.0, float(means.sum(axis=1).max())))
+        ax.set_xlim(scene_positions[0], scene_positions[-1])
+        ax.set_title(style.title, fontsize=16)
+        ax.set_ylabel(style.ylabel, fontsize=12)
+        ax.legend(loc='upper left', bbox_to_anchor=(1.01, 1.0), fontsize=9, frameon=False)
+        ax.tick_params(labelbottom=False)
+
+        # Dominant-emotion ribbon: one coloured cell per bucket ('unknown' maps to the last colour)
+        ribbon_colors = ListedColormap(colors + [EMOTION_COLORS['unknown']])
+        codes = np.where(modes < 0, len(scores.labels), modes)[None, :]
+        ribbon_ax.imshow(codes, aspect='auto', cmap=ribbon_colors, vmin=0, vmax=len(scores.labels),
+                         interpolation='nearest', extent=(scene_positions[0], scene_positions[-1], 0, 1))
+        ribbon_ax.set_yticks([])
+        ribbon_ax.set_xlabel(style.xlabel, fontsize=12)
+
+        buf = io.BytesIO()
+        fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches='tight')
+        return buf.getvalue()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._cache)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+# Shared renderer used by create_emotion_distribution_graph and create_emotion_timeline_graph
+chart_renderer = ChartRenderer()
+
+
+def create_emotion_distribution_graph(analysis_df: pd.DataFrame,
+                                      fmt: str = "png",
+                                      dpi: int = 100,
+                                      style: ChartStyle = ChartStyle()) -> io.BytesIO | None:
     """
     Creates a bar chart showing the distribution of emotions across the movie.
 
     Args:
         analysis_df: DataFrame containing the emotion analysis results.
+        fmt: Output format, 'png' or 'svg'.
+        dpi: Resolution for raster output.
+        style: Chart appearance.
 
     Returns:
-        A BytesIO buffer containing the PNG image of the plot, or None if error.
+        A BytesIO buffer containing the image of the plot, or None if error.
     """
     if analysis_df.empty or 'Emotion' not in analysis_df.columns:
         logging.warning("Cannot create graph: Analysis data is empty or missing 'Emotion' column.")
         return None
 
     try:
-        plt.figure(figsize=(10, 6)) # Create a new figure
-
-        emotion_counts = analysis_df['Emotion'].value_counts()
+        emotion_counts = get_emotion_scores(analysis_df).counts()
+        # Each caller gets its own buffer over the (possibly cached) bytes
+        buf = io.BytesIO(chart_renderer.render_counts(emotion_counts, style, fmt, dpi))
+        logging.info("Emotion distribution graph created successfully.")
+        return buf
 
-        # Get colors for the emotions present, default to grey if not in map
-        colors = [EMOTION_COLORS.get(emotion, 'grey') for emotion in emotion_counts.index]
+    except Exception as e:
+        logging.error(f"Error creating emotion distribution graph: {e}")
+        return None
 
-        bars = plt.bar(emotion_counts.index, emotion_counts.values, color=colors)
 
-        plt.title('Overall Emotion Distribution in Movie Plot', fontsize=16)
-        plt.xlabel('Emotion', fontsize=12)
-        plt.ylabel('Number of Scenes (Chunks)', fontsize=12)
-        plt.xticks(rotation=45, ha='right') # Rotate labels for better readability
-        plt.grid(axis='y', linestyle='--', alpha=0.7)
-        plt.tight_layout() # Adjust layout to prevent labels overlapping
+def create_emotion_timeline_graph(analysis_df: pd.DataFrame,
+                                  fmt: str = "png",
+                                  dpi: int = 100,
+                                  max_points: int = DEFAULT_TIMELINE_POINTS,
+                                  style: TimelineStyle = TimelineStyle()) -> io.BytesIO | None:
+    """
+    Creates a scene timeline of emotion probabilities (stacked areas plus a dominant-emotion ribbon).
 
-        # Add counts on top of bars (optional)
-        for bar in bars:
-            yval = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2.0, yval, int(yval), va='bottom', ha='center') # Add text labels
+    Long analyses are downsampled to at most `max_points` buckets, so a full
+    screenplay renders as fast and as small as a short plot.
 
-        # Save plot to a BytesIO buffer
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
+    Returns:
+        A BytesIO buffer containing the image, or None if error.
+    """
+    if analysis_df.empty:
+        logging.warning("Cannot create timeline: Analysis data is empty.")
+        return None
 
-        plt.close() # Close the figure to free memory
-        logging.info("Emotion distribution graph created successfully.")
+    try:
+        buf = io.BytesIO(chart_renderer.render_timeline(get_emotion_scores(analysis_df), style, fmt, dpi, max_points))
+        logging.info("Emotion timeline graph created successfully.")
         return buf
 
     except Exception as e:
-        logging.error(f"Error creating emotion distribution graph: {e}")
-        plt.close() # Ensure plot is closed even if error occurs
+        logging.error(f"Error creating emotion timeline graph: {e}")
         return None
 
+
 # Example usage (optional)
 if __name__ == "__main__":
     # Create dummy data for testing
@@ -91,4 +302,8 @@ if __name__ == "__main__":
         #     f.write(plot_buffer.getvalue())
         # print("Saved test_emotion_graph.png")
     else:
-        print("Failed to create graph.") 
\ No newline at end of file
+        print("Failed to create graph.")
+
+    timeline_buffer = create_emotion_timeline_graph(dummy_df)
+    if timeline_buffer:
+        print("Timeline created, buffer size:", len(timeline_buffer.getvalue()))
@@ -1,21 +1,26 @@
 # wiki_fetcher.py
 import wikipedia
 import logging
+import os
+import metrics
+from plot_store import PlotStore, NOT_FOUND
 
 logging.basicConfig(level=logging.INFO)
 
-def fetch_movie_plot(movie_title: str) -> str | None:
-    """
-    Fetches the plot summary of a movie from Wikipedia.
+# Serve plots only from the local store, never touching the network
+OFFLINE = os.environ.get("CINEMOOD_OFFLINE") == "1"
 
-    Args:
-        movie_title: The title of the movie to search for.
 
-    Returns:
-        The plot summary as a string, or None if not found or an error occurs.
-    """
-    logging.info(f"Attempting to fetch plot for: {movie_title}")
-    try:
+class WikipediaBackend:
+    """Fetch backend that talks to the live Wikipedia API through the `wikipedia` library."""
+
+    def resolve_page(self, movie_title: str):
+        """
+        Resolves a movie title to a page object, handling disambiguation.
+
+        Returns:
+            A page with `pageid`, `title`, `summary` and `section(name)`, or None if not found.
+        """
         # Search for the movie page
         search_results = wikipedia.search(movie_title)
         if not search_results:
@@ -24,52 +29,174 @@ def fetch_movie_plot(movie_title: str) -> str | None:
 
         # Try to get the page, handling disambiguation
         try:
-            page = wikipedia.page(search_results[0], auto_suggest=False) # Use first result precisely
+            return wikipedia.page(search_results[0], auto_suggest=False) # Use first result precisely
         except wikipedia.exceptions.DisambiguationError as e:
             logging.warning(f"Disambiguation error for '{movie_title}'. Trying first option: {e.options[0]}")
             try:
                 # Try the first option from the disambiguation page
-                page = wikipedia.page(e.options[0], auto_suggest=False)
-            except Exception as inner_e:
-                 logging.error(f"Could not resolve disambiguation for '{movie_title}': {inner_e}")
-                 return None
+                return wikipedia.page(e.options[0], auto_suggest=False)
+            except (wikipedia.exceptions.PageError, wikipedia.exceptions.DisambiguationError) as inner_e:
+                # Only a definite miss returns None (and gets cached as not found);
+                # network and API errors propagate so the caller does not cache them
+                logging.error(f"Could not resolve disambiguation for '{movie_title}': {inner_e}")
+                return None
         except wikipedia.exceptions.PageError:
             logging.warning(f"Wikipedia page '{search_results[0]}' not found precisely.")
-            # Try searching again with the suggested title if auto_suggest was True initially
             # Or just return None if strict matching is preferred
             return None
 
-        # Try fetching the "Plot" section first, then "Synopsis"
-        plot = None
-        for section_title in ["Plot", "Synopsis"]:
-            try:
-                plot = page.section(section_title)
-                if plot:
-                    logging.info(f"Successfully fetched '{section_title}' section for '{movie_title}'.")
-                    # Basic cleaning (optional: remove == Plot == headers if present)
-                    plot = plot.replace(f"== {section_title} ==", "").strip()
-                    break
-            except Exception:
-                 logging.warning(f"No '{section_title}' section found for '{movie_title}'.")
-                 continue # Try next section title
-
-        if not plot:
-             logging.warning(f"Could not find Plot or Synopsis section for '{movie_title}'. Trying full content summary.")
-             # Fallback: Get page summary or first few paragraphs of content if plot section fails
-             plot = page.summary # Or page.content[:1500] for more text
-             if plot:
-                 logging.info(f"Using page summary as plot fallback for '{movie_title}'.")
-             else:
-                logging.error(f"Failed to get any meaningful content for '{movie_title}'.")
-                return None
 
+class LocalPage:
+    """Minimal stand-in for `wikipedia.WikipediaPage` built from plain data."""
+
+    def __init__(self, pageid, title: str, sections: dict[str, str] | None = None, summary: str = ""):
+        self.pageid = pageid
+        self.title = title
+        self.sections = sections or {}
+        self.summary = summary
+
+    def section(self, section_title: str) -> str | None:
+        return self.sections.get(section_title)
+
+
+class LocalBackend:
+    """
+    Fetch backend serving pages from an in-memory mapping, for tests and offline runs.
+
+    Args:
+        pages: Maps a title to a dict with optional 'pageid', 'sections' and 'summary' keys.
+    """
+
+    def __init__(self, pages: dict[str, dict]):
+        self.pages = {title.casefold(): (title, data) for title, data in pages.items()}
+        self.calls = 0
+
+    def resolve_page(self, movie_title: str):
+        self.calls += 1
+        entry = self.pages.get(movie_title.strip().casefold())
+        if entry is None:
+            logging.warning(f"No local page found for '{movie_title}'.")
+            return None
+        title, data = entry
+        return LocalPage(data.get("pageid", title), title, data.get("sections"), data.get("summary", ""))
+
+
+# Active fetch backend and plot store; swap them with set_fetch_backend / set_plot_store
+_backend = WikipediaBackend()
+try:
+    plot_store = PlotStore()
+except Exception as e:
+    logging.error(f"Failed to open plot store, continuing without it: {e}")
+    plot_store = None
+
+
+def set_fetch_backend(backend) -> None:
+    """Replaces the backend used to resolve pages (any object with `resolve_page(title)`)."""
+    global _backend
+    _backend = backend
+
+
+def set_plot_store(store: PlotStore | None) -> None:
+    """Replaces the plot store (None disables caching)."""
+    global plot_store
+    plot_store = store
+
+
+def extract_plot(page, movie_title: str) -> str | None:
+    """Extracts the Plot section, then Synopsis, then falls back to the page summary."""
+    # Try fetching the "Plot" section first, then "Synopsis"
+    plot = None
+    for section_title in ["Plot", "Synopsis"]:
+        try:
+            plot = page.section(section_title)
+            if plot:
+                logging.info(f"Successfully fetched '{section_title}' section for '{movie_title}'.")
+                # Basic cleaning (optional: remove == Plot == headers if present)
+                plot = plot.replace(f"== {section_title} ==", "").strip()
+                break
+        except Exception:
+             logging.warning(f"No '{section_title}' section found for '{movie_title}'.")
+             continue # Try next section title
+
+    if not plot:
+         logging.warning(f"Could not find Plot or Synopsis section for '{movie_title}'. Trying full content summary.")
+         # Fallback: Get page summary or first few paragraphs of content if plot section fails
+         plot = page.summary # Or page.content[:1500] for more text
+         if plot:
+             logging.info(f"Using page summary as plot fallback for '{movie_title}'.")
+         else:
+            logging.error(f"Failed to get any meaningful content for '{movie_title}'.")
+            return None
+
+    return plot
+
+
+def resolved_title(movie_title: str) -> str:
+    """
+    The Wikipedia page title a fetched movie title resolved to, e.g. 'Inception' for 'inceptoin'.
+
+    Falls back to the title as entered when the plot store does not know it.
+    """
+    page_title = plot_store.page_title(movie_title) if plot_store is not None else None
+    return page_title or movie_title.strip()
+
+def fetch_movie_plot(movie_title: str, offline: bool | None = None) -> str | None:
+    """
+    Fetches the plot summary of a movie from Wikipedia.
+
+    Results (including "not found") are kept in the local plot store and reused
+    until their TTL expires.
+
+    Args:
+        movie_title: The title of the movie to search for.
+        offline: Serve only from the local plot store. Defaults to CINEMOOD_OFFLINE.
+
+    Returns:
+        The plot summary as a string, or None if not found or an error occurs.
+    """
+    if offline is None:
+        offline = OFFLINE
+
+    with metrics.span("wiki_fetch"):
+        return _fetch_movie_plot(movie_title, offline)
+
+def _fetch_movie_plot(movie_title: str, offline: bool) -> str | None:
+    if plot_store is not None:
+        stored = plot_store.lookup(movie_title, allow_stale=offline)
+        if stored is NOT_FOUND:
+            logging.info(f"'{movie_title}' is cached as not found.")
+            metrics.PLOT_FETCHES.inc(1, "store_not_found")
+            return None
+        if stored is not None:
+            logging.info(f"Serving plot for '{movie_title}' from the local plot store.")
+            metrics.PLOT_FETCHES.inc(1, "store")
+            return stored
+    if offline:
+        logging.warning(f"Offline mode: no stored plot for '{movie_title}'.")
+        metrics.PLOT_FETCHES.inc(1, "offline_miss")
+        return None
+
+    logging.info(f"Attempting to fetch plot for: {movie_title}")
+    try:
+        page = _backend.resolve_page(movie_title)
+        plot = extract_plot(page, movie_title) if page is not None else None
+        metrics.PLOT_FETCHES.inc(1, "backend" if plot else "backend_not_found")
+
+        if plot_store is not None:
+            if plot:
+                plot_store.put(movie_title, page.pageid, getattr(page, "title", None), plot)
+            else:
+                plot_store.put_not_found(movie_title)
         return plot
 
     except wikipedia.exceptions.WikipediaException as e:
+        # Transient API errors are not cached as "not found"
         logging.error(f"Wikipedia Exception occurred for '{movie_title}': {e}")
+        metrics.PLOT_FETCHES.inc(1, "error")
         return None
     except Exception as e:
         logging.error(f"An unexpected error occurred while fetching plot for '{movie_title}': {e}")
+        metrics.PLOT_FETCHES.inc(1, "error")
         return None
 
 # Example usage (optional, for testing)
@@ -83,4 +210,4 @@ if __name__ == "__main__":
 
     test_plot_custom = fetch_movie_plot("NonExistent Movie 12345")
     if not test_plot_custom:
-        print("Correctly handled non-existent movie.") 
\ No newline at end of file
+        print("Correctly handled non-existent movie.")
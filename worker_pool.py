@@ -0,0 +1,494 @@
+# worker_pool.py
+import collections
+import gc
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import reduction
+from multiprocessing.connection import Connection, wait
+
+import metrics
+
+logging.basicConfig(level=logging.INFO)
+
+# Inference worker processes; 0 keeps inference in the app process
+DEFAULT_WORKERS = int(os.environ.get("CINEMOOD_WORKERS", "0"))
+# Torch intra-op threads per worker; 0 divides the available cores evenly between workers
+DEFAULT_WORKER_THREADS = int(os.environ.get("CINEMOOD_WORKER_THREADS", "0"))
+# Sentences per task; a long plot is spread over several workers in tasks of this size
+DEFAULT_TASK_SIZE = int(os.environ.get("CINEMOOD_WORKER_TASK_SIZE", "64"))
+# Tasks queued or running before submit() blocks; 0 means 2 per worker
+DEFAULT_MAX_IN_FLIGHT = int(os.environ.get("CINEMOOD_WORKER_MAX_IN_FLIGHT", "0"))
+# Seconds submit() waits for a free slot before raising PoolBusyError
+DEFAULT_SUBMIT_TIMEOUT = float(os.environ.get("CINEMOOD_WORKER_SUBMIT_TIMEOUT", "30"))
+
+
+class PoolBusyError(RuntimeError):
+    """Raised when the pool stays saturated for longer than the submit timeout."""
+
+
+def available_cores() -> int:
+    """CPU cores this process may run on (respects affinity masks and container CPU sets)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def threads_per_worker(workers: int, cores: int | None = None) -> int:
+    """Intra-op threads per worker so that all workers together use each core once."""
+    return max(1, (cores or available_cores()) // max(1, workers))
+
+
+def configure_threads(threads: int) -> None:
+    """Caps the math libraries of the current process at `threads` threads."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def _worker_main(index: int, run_batch, initializer, threads: int, conn) -> None:
+    """
+    Worker process loop: receives (task_id, sentences) on its pipe and sends back
+    ('done' | 'error', task_id, payload, metrics recorded during the task).
+    """
+    configure_threads(threads)
+    if initializer is not None:
+        initializer()
+    metrics.registry.drain() # Drop what was inherited from the parent and the warm-up
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return # The parent went away
+        if task is None:
+            return
+        task_id, sentences = task
+        try:
+            result = ("done", task_id, run_batch(sentences))
+        except Exception as e:
+            result = ("error", task_id, f"{type(e).__name__}: {e}")
+        conn.send((*result, metrics.registry.drain()))
+
+
+def _zygote_main(control, run_batch, initializer, threads: int) -> None:
+    """
+    Fork server for the workers, itself forked from the parent when the pool starts.
+
+    It runs no threads, so every worker it forks, including replacements forked long after
+    the parent started its own threads, begins from a single-threaded copy of the loaded
+    model. Commands on `control`: ('spawn', index) followed by the worker's pipe end
+    (passed as a file descriptor), answered with the worker's pid; ('stop',) to exit.
+    """
+    children = {}
+    while True:
+        # Reap exited workers; the parent notices their death as EOF on their pipe
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            index = children.pop(pid, None)
+            if os.WIFSIGNALED(status) or os.waitstatus_to_exitcode(status) != 0:
+                logging.error(f"Inference worker {index} (pid {pid}) exited with code {os.waitstatus_to_exitcode(status)}.")
+        try:
+            if not control.poll(0.5):
+                continue
+            command = control.recv()
+        except (EOFError, OSError):
+            command = ("stop",)
+        if command[0] == "stop":
+            break
+        index = command[1]
+        fd = reduction.recv_handle(control)
+        gc.collect()
+        gc.freeze() # Keeps the worker's GC passes from writing to (and copying) the inherited pages
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                control.close()
+                _worker_main(index, run_batch, initializer, threads, Connection(fd))
+            except BaseException:
+                logging.exception(f"Inference worker {index} crashed.")
+                code = 1
+            finally:
+                os._exit(code)
+        gc.unfreeze()
+        os.close(fd)
+        children[pid] = index
+        control.send(pid)
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in children:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+
+class _Gather:
+    """Collects the task outputs of one submit() call into a single Future, in input order."""
+
+    def __init__(self, n_tasks: int):
+        self.parts = [None] * n_tasks
+        self.remaining = n_tasks
+        self.future = Future()
+        self._lock = threading.Lock()
+
+    def resolve(self, part: int, future: Future) -> None:
+        with self._lock:
+            if self.future.done():
+                return
+            if future.exception() is not None:
+                self.future.set_exception(future.exception())
+                return
+            self.parts[part] = future.result()
+            self.remaining -= 1
+            if self.remaining == 0:
+                self.future.set_result([output for outputs in self.parts for output in outputs])
+
+
+class WorkerPool:
+    """
+    Inference in forked worker processes sharing the parent's model weights.
+
+    Whatever `run_batch` closes over (the loaded model) is created in the parent
+    and inherited by every worker. Pages stay shared copy-on-write since
+    inference only reads the weights, so RAM grows by each worker's activations
+    and interpreter, not by a copy of the model. The parent must not have run
+    a forward pass before the pool starts (OpenMP thread pools do not survive fork).
+
+    The parent forks once, when the pool starts, into a single-threaded fork
+    server (see _zygote_main) that forks the workers. Workers that die are
+    replaced from there, never by forking the then multi-threaded parent.
+
+    Sentences are split into tasks of `task_size` so one long plot uses every
+    worker. The parent hands each idle worker one task over its own pipe, so it
+    always knows which task a worker holds; if the worker dies, that task fails
+    and its slot is released. At most `max_in_flight` tasks are queued or
+    running; further submit() calls block, and fail with PoolBusyError after
+    `submit_timeout` seconds, so a burst of requests cannot queue unbounded work.
+
+    Args:
+        run_batch: Callable taking a list of sentences and returning one output per sentence.
+        workers: Number of worker processes.
+        threads: Intra-op threads per worker (None divides the available cores between workers).
+        task_size: Sentences per task.
+        max_in_flight: Queued or running tasks before submit() blocks (None means 2 per worker).
+        submit_timeout: Seconds submit() waits for a free slot.
+        initializer: Optional callable run once in each worker after fork (e.g. a warm-up pass).
+    """
+
+    # Seconds between liveness checks of the fork server and the workers
+    CHECK_INTERVAL = 0.5
+
+    def __init__(self, run_batch, workers: int = max(1, DEFAULT_WORKERS),
+                 threads: int | None = DEFAULT_WORKER_THREADS or None,
+                 task_size: int = DEFAULT_TASK_SIZE,
+                 max_in_flight: int | None = DEFAULT_MAX_IN_FLIGHT or None,
+                 submit_timeout: float = DEFAULT_SUBMIT_TIMEOUT,
+                 initializer=None):
+        self.run_batch = run_batch
+        self.workers = max(1, workers)
+        self.threads = threads or threads_per_worker(self.workers)
+        self.task_size = max(1, task_size)
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.submit_timeout = submit_timeout
+        self.initializer = initializer
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._futures = {}  # task_id -> Future, for tasks queued or running
+        self._pending = collections.deque()  # (task_id, sentences) not yet handed to a worker
+        self._assigned = {}  # worker index -> task_id it is running
+        self._conns = [None] * self.workers
+        self._pids = [None] * self.workers
+        self._counts = {"tasks": 0, "sentences": 0, "errors": 0, "rejected": 0, "restarts": 0}
+        self._stopped = threading.Event()
+        # Wakes the collector when the set of worker pipes changes
+        self._wakeup_recv, self._wakeup_send = multiprocessing.Pipe(duplex=False)
+
+        context = multiprocessing.get_context("fork")
+        self._control, zygote_end = context.Pipe()
+        gc.collect()
+        gc.freeze()
+        try:
+            self._zygote = context.Process(target=_zygote_main, name="inference-fork-server", daemon=True,
+                                           args=(zygote_end, run_batch, initializer, self.threads))
+            self._zygote.start()
+        finally:
+            gc.unfreeze()
+        zygote_end.close()
+        self._control_lock = threading.Lock()
+        for index in range(self.workers):
+            self._spawn(index)
+        self._collector = threading.Thread(target=self._collect, name="worker-pool-collector", daemon=True)
+        self._collector.start()
+        logging.info(f"Inference worker pool started: {self.workers} workers x {self.threads} threads "
+                     f"({available_cores()} cores), at most {self.max_in_flight} tasks in flight.")
+
+    def _spawn(self, index: int) -> None:
+        """Has the fork server fork worker `index`, connected to a fresh pipe (no fork happens in this process)."""
+        conn, child_end = multiprocessing.Pipe()
+        try:
+            with self._control_lock:
+                self._control.send(("spawn", index))
+                reduction.send_handle(self._control, child_end.fileno(), self._zygote.pid)
+                pid = self._control.recv()
+        finally:
+            child_end.close()
+        with self._lock:
+            self._conns[index] = conn
+            self._pids[index] = pid
+        self._wakeup_send.send_bytes(b"")
+
+    def submit(self, sentences: list[str], timeout: float | None = None) -> Future:
+        """
+        Queues sentences for classification and returns a Future of their outputs in input order.
+
+        Blocks while the pool is saturated. Raises PoolBusyError if no slot frees up
+        within `timeout` seconds (default: the pool's submit_timeout).
+        """
+        sentences = list(sentences)
+        parts = [sentences[i:i + self.task_size] for i in range(0, len(sentences), self.task_size)]
+        gather = _Gather(len(parts))
+        if not parts:
+            gather.future.set_result([])
+            return gather.future
+        if self._stopped.is_set():
+            raise RuntimeError("Inference worker pool has been stopped.")
+        deadline = time.monotonic() + (self.submit_timeout if timeout is None else timeout)
+        for part, texts in enumerate(parts):
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                with self._lock:
+                    self._counts["rejected"] += 1
+                metrics.POOL_TASKS.inc(1, "rejected")
+                error = PoolBusyError(f"Inference workers busy: {self.max_in_flight} tasks in flight.")
+                gather.future.set_exception(error) # Tasks already queued finish and are discarded
+                raise error
+            task_future = Future()
+            task_future.add_done_callback(lambda f, part=part: gather.resolve(part, f))
+            with self._lock:
+                task_id = next(self._task_ids)
+                self._futures[task_id] = task_future
+                self._pending.append((task_id, texts))
+                in_flight = len(self._futures)
+                self._dispatch()
+            metrics.POOL_IN_FLIGHT.set(in_flight)
+        return gather.future
+
+    def __call__(self, sentences: list[str]) -> list:
+        """Blocking helper: submit and wait for the outputs (usable as an emotion_utils inference runner)."""
+        return self.submit(sentences).result()
+
+    def _dispatch(self) -> None:
+        """Hands pending tasks to idle workers. Called with self._lock held."""
+        for index, conn in enumerate(self._conns):
+            if not self._pending:
+                return
+            if index in self._assigned or conn is None:
+                continue
+            task_id, texts = self._pending.popleft()
+            try:
+                conn.send((task_id, texts))
+            except OSError:
+                self._pending.appendleft((task_id, texts)) # Dead worker; the collector replaces it
+                continue
+            self._assigned[index] = task_id
+
+    def _finish(self, task_id: int, result=None, error: Exception | None = None) -> None:
+        with self._lock:
+            future = self._futures.pop(task_id, None)
+            in_flight = len(self._futures)
+            if future is not None:
+                self._counts["tasks"] += 1
+                if error is None:
+                    self._counts["sentences"] += len(result)
+                else:
+                    self._counts["errors"] += 1
+        if future is None:
+            return
+        self._slots.release()
+        metrics.POOL_IN_FLIGHT.set(in_flight)
+        metrics.POOL_TASKS.inc(1, "ok" if error is None else "error")
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def _collect(self) -> None:
+        next_check = time.monotonic() + self.CHECK_INTERVAL
+        while not self._stopped.is_set():
+            with self._lock:
+                conns = {conn: index for index, conn in enumerate(self._conns) if conn is not None}
+            ready = wait([*conns, self._wakeup_recv], timeout=self.CHECK_INTERVAL)
+            for conn in ready:
+                if conn is self._wakeup_recv:
+                    self._wakeup_recv.recv_bytes()
+                    continue
+                index = conns[conn]
+                try:
+                    kind, task_id, payload, recorded = conn.recv()
+                except (EOFError, OSError):
+                    self._replace(index, "closed its pipe")
+                    continue
+                metrics.registry.merge(recorded)
+                with self._lock:
+                    if self._assigned.get(index) == task_id:
+                        del self._assigned[index]
+                    self._dispatch()
+                if kind == "done":
+                    self._finish(task_id, result=payload)
+                else:
+                    logging.error(f"Inference worker task {task_id} failed: {payload}")
+                    self._finish(task_id, error=RuntimeError(payload))
+            # On a timer, so dead workers are found under steady load too
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + self.CHECK_INTERVAL
+
+    def _check_workers(self) -> None:
+        """Replaces workers whose process is gone (a worker that dies also closes its pipe, see _collect)."""
+        if self._stopped.is_set():
+            return
+        if not self._zygote.is_alive():
+            logging.error("Inference fork server died; failing all tasks and stopping the pool.")
+            self.stop()
+            return
+        for index, pid in enumerate(self._pids):
+            if pid is not None and not _process_running(pid):
+                self._replace(index, "is no longer running")
+
+    def _replace(self, index: int, reason: str) -> None:
+        """Fails the task a dead worker held, then has the fork server start a replacement."""
+        with self._lock:
+            conn = self._conns[index]
+            if conn is None or self._stopped.is_set():
+                return # Workers close their pipes on the way out after stop()
+            self._conns[index] = None
+            task_id = self._assigned.pop(index, None)
+            self._counts["restarts"] += 1
+        conn.close()
+        logging.error(f"Inference worker {index} (pid {self._pids[index]}) {reason}; restarting it.")
+        if task_id is not None:
+            self._finish(task_id, error=RuntimeError(f"Inference worker {index} died."))
+        self._spawn(index)
+        with self._lock:
+            self._dispatch()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stops the workers after their current task; unfinished tasks fail with RuntimeError."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        with self._lock:
+            conns = [conn for conn in self._conns if conn is not None]
+            self._pending.clear()
+        for conn in conns:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        with self._control_lock:
+            try:
+                self._control.send(("stop",))
+            except OSError:
+                pass
+        self._zygote.join(timeout)
+        if self._zygote.is_alive():
+            self._zygote.terminate()
+        if threading.current_thread() is not self._collector:
+            self._collector.join(timeout)
+        with self._lock:
+            pending = list(self._futures)
+        for task_id in pending:
+            self._finish(task_id, error=RuntimeError("Inference worker pool has been stopped."))
+
+    def pids(self) -> list[int]:
+        with self._lock:
+            return list(self._pids)
+
+    def stats(self) -> dict:
+        """Returns worker layout, tasks in flight and completed/failed/rejected task counts."""
+        with self._lock:
+            counts = dict(self._counts)
+            in_flight, running = len(self._futures), len(self._assigned)
+        return {"workers": self.workers, "threads_per_worker": self.threads, "max_in_flight": self.max_in_flight,
+                "in_flight": in_flight, "running": running, **counts}
+
+
+def _process_running(pid: int) -> bool:
+    """True while `pid` exists and is not a zombie (Linux /proc; elsewhere only existence is checked)."""
+    try:
+        with open(f"/proc/{pid}/stat", encoding="ascii") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+    except OSError:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        return True
+
+
+def _warm_worker() -> None:
+    import emotion_utils
+    if emotion_utils.INFERENCE_BACKEND != "torch":
+        # ONNX Runtime sessions own thread pools that do not survive fork, so each worker loads its own
+        from onnx_backend import DEFAULT_ONNX_DIR, OnnxEmotionClassifier
+        emotion_utils.set_emotion_classifier(OnnxEmotionClassifier(
+            DEFAULT_ONNX_DIR, quantized=emotion_utils.INFERENCE_BACKEND == "onnx-int8",
+            intra_op_threads=int(os.environ["OMP_NUM_THREADS"]),
+            model_name=emotion_utils.MODEL_NAME, revision=emotion_utils.MODEL_REVISION))
+    emotion_utils.get_batcher()(["Warm-up sentence."])
+
+
+def _classify_in_worker(sentences: list[str]) -> list:
+    import emotion_utils
+    return emotion_utils.get_batcher()(sentences)
+
+
+def create_emotion_pool(workers: int = max(1, DEFAULT_WORKERS), **kwargs) -> WorkerPool | None:
+    """
+    Loads the emotion model in this process and forks a WorkerPool serving it.
+
+    Call before any forward pass runs here (in particular before warm_up).
+    Returns None if the model cannot be loaded.
+    """
+    import emotion_utils
+    # The Rust tokenizer's thread pool is not fork-safe either
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    if emotion_utils.INFERENCE_BACKEND == "torch" and emotion_utils.get_emotion_classifier() is None:
+        logging.error("Emotion model could not be loaded; inference worker pool not started.")
+        return None
+    return WorkerPool(_classify_in_worker, workers=workers, initializer=_warm_worker, **kwargs)
+
+
+# Example usage (optional)
+if __name__ == "__main__":
+    def fake_model(sentences):
+        time.sleep(0.01 * len(sentences) / 16)
+        return [[{"label": "neutral", "score": 1.0}] for _ in sentences]
+
+    pool = WorkerPool(fake_model, workers=2, task_size=16)
+    started = time.perf_counter()
+    outputs = pool([f"Sentence {i}." for i in range(500)])
+    print(f"{len(outputs)} outputs in {time.perf_counter() - started:.3f}s from workers {pool.pids()}")
+    print("Stats:", pool.stats())
+    pool.stop()